@@ -0,0 +1,26 @@
+"""
+Performance benchmarks of the simulator. Run `python -m lpsim.bench` in the
+root of the repository to run all benchmarks and save results as JSON, and
+compare them with results of other commits.
+"""
+from .benchmarks import (  # noqa: F401
+    BENCH_PHASES,
+    BenchmarkResult,
+    MatchBenchResult,
+    ReplayBenchResult,
+    TimeStat,
+    bench_http_respond,
+    bench_matches,
+    bench_phases,
+    bench_replays,
+    get_bench_decks,
+    get_bench_log_paths,
+    run_benchmarks,
+    time_methods,
+)
+from .report import (  # noqa: F401
+    compare_results,
+    find_regressions,
+    flatten_metrics,
+    format_report,
+)
@@ -0,0 +1,62 @@
+"""
+Run benchmarks and save results as JSON. When base result is given, compare
+with it and exit with code 1 if any metric is slower than threshold.
+
+Usage:
+    python -m lpsim.bench -o result.json
+    python -m lpsim.bench -o result.json --base base_result.json
+"""
+import argparse
+import json
+import logging
+import sys
+
+from .benchmarks import run_benchmarks
+from .report import find_regressions, format_report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m lpsim.bench", description="Run benchmarks of lpsim."
+    )
+    parser.add_argument("-o", "--output", help="path to save result JSON")
+    parser.add_argument("--base", help="path of base result JSON to compare")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown that is regarded as regression",
+    )
+    parser.add_argument("--root", default=".", help="root of the repository")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seeds", type=int, nargs="+", default=None)
+    parser.add_argument("--logs", nargs="*", default=None, help="logs to replay")
+    parser.add_argument("--no-http", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    result = run_benchmarks(
+        root=args.root,
+        repeat=args.repeat,
+        seeds=args.seeds,
+        log_paths=args.logs,
+        http=not args.no_http,
+    )
+    result_json = result.json(indent=2)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf8") as f:
+            f.write(result_json)
+    else:
+        print(result_json)
+    if args.base is not None:
+        with open(args.base, "r", encoding="utf8") as f:
+            base = json.load(f)
+        new = json.loads(result_json)
+        print(format_report(base, new, args.threshold))
+        if len(find_regressions(base, new, args.threshold)) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""
+Benchmarks of the simulator. All results are pydantic models, and the result
+of `run_benchmarks` can be saved as JSON and compared across commits by
+functions in `report.py`.
+"""
+import asyncio
+import contextlib
+import datetime
+import functools
+import glob
+import logging
+import os
+import platform
+import time
+from typing import Callable, Dict, Iterator, List
+
+from ..utils import BaseModel
+from ..server.deck import Deck
+from ..server.match import Match, MatchConfig
+from ..runner import make_tasks, run_match
+from ..tools import read_log
+from ..replay import replay_log
+from ..network.http_server import HTTPServer, ResetData, RespondData
+from .decks import (
+    BENCH_DECK_STRS,
+    BENCH_LOG_MATCH_VERSION,
+    BENCH_LOG_PATTERNS,
+    BENCH_SEEDS,
+)
+
+
+# methods of Match that are timed in phase benchmark
+BENCH_PHASES: List[str] = ["start", "step", "_save_history", "_predict_skill"]
+BENCH_PHASE_MAX_ROUND = 4
+
+
+class TimeStat(BaseModel):
+    """
+    Statistics of time used by repeated calls, in seconds.
+    """
+
+    count: int = 0
+    total: float = 0
+    mean: float = 0
+    min: float = 0
+    max: float = 0
+
+    def add(self, used_time: float) -> None:
+        if self.count == 0 or used_time < self.min:
+            self.min = used_time
+        if used_time > self.max:
+            self.max = used_time
+        self.count += 1
+        self.total += used_time
+        self.mean = self.total / self.count
+
+
+class MatchBenchResult(BaseModel):
+    """
+    Result of running matches with `RandomAgent`.
+
+    Attributes:
+        match_number (int): Number of matches in one repeat.
+        error_number (int): Number of matches that end with error.
+        round_number (int): Total round number of matches.
+        times (List[float]): Time used by each repeat.
+        matches_per_second (float): Matches per second of the fastest repeat.
+    """
+
+    match_number: int = 0
+    error_number: int = 0
+    round_number: int = 0
+    times: List[float] = []
+    matches_per_second: float = 0
+
+
+class ReplayBenchResult(BaseModel):
+    """
+    Result of replaying a log.
+
+    Attributes:
+        path (str): Path of the log.
+        command_number (int): Number of commands in the log.
+        times (List[float]): Time used by each repeat.
+        best_time (float): Time used by the fastest repeat.
+    """
+
+    path: str
+    command_number: int = 0
+    times: List[float] = []
+    best_time: float = 0
+
+
+class BenchmarkResult(BaseModel):
+    """
+    Result of all benchmarks, with information of environment.
+    """
+
+    lpsim_version: str
+    python_version: str
+    platform: str
+    created_at: str
+    repeat: int
+    matches: MatchBenchResult | None = None
+    replays: Dict[str, ReplayBenchResult] = {}
+    phases: Dict[str, TimeStat] = {}
+    http_respond: TimeStat | None = None
+
+
+def get_bench_decks() -> List[List[Deck]]:
+    """
+    Get deck pairs of benchmarks, every deck plays against itself.
+    """
+    decks = [Deck.from_str(deck_str) for deck_str in BENCH_DECK_STRS.values()]
+    return [[deck, deck] for deck in decks]
+
+
+def get_bench_log_paths(root: str = ".") -> List[str]:
+    """
+    Get paths of logs that are replayed in benchmarks.
+
+    Args:
+        root (str): Root of the repository, as logs are not installed with
+            the package.
+    """
+    paths: List[str] = []
+    for pattern in BENCH_LOG_PATTERNS:
+        paths += sorted(glob.glob(os.path.join(root, pattern)))
+    return paths
+
+
+@contextlib.contextmanager
+def time_methods(
+    cls: type, names: List[str], stats: Dict[str, TimeStat]
+) -> Iterator[None]:
+    """
+    Time methods of a class in the context. Only outermost calls are timed,
+    so when a method calls itself through other objects, e.g. `step` of
+    copied match during skill prediction, it is counted once. Time of a method
+    includes time of other timed methods called by it.
+    """
+    originals: Dict[str, Callable] = {}
+    depths: Dict[str, int] = {}
+
+    def wrap(name: str, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if depths[name] > 0:
+                return func(*args, **kwargs)
+            depths[name] += 1
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats[name].add(time.perf_counter() - start_time)
+                depths[name] -= 1
+
+        return wrapper
+
+    for name in names:
+        originals[name] = getattr(cls, name)
+        depths[name] = 0
+        if name not in stats:
+            stats[name] = TimeStat()
+        setattr(cls, name, wrap(name, originals[name]))
+    try:
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(cls, name, func)
+
+
+def bench_matches(
+    decks: List[List[Deck]],
+    seeds: List[int],
+    config: MatchConfig | None = None,
+    repeat: int = 1,
+) -> MatchBenchResult:
+    """
+    Run matches of all deck pairs and seeds with `RandomAgent` in current
+    process, and measure matches per second.
+    """
+    if config is None:
+        config = MatchConfig()
+    tasks = make_tasks(decks, seeds, config=config)
+    result = MatchBenchResult(match_number=len(tasks))
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        match_results = [run_match(task) for task in tasks]
+        result.times.append(time.perf_counter() - start_time)
+    # results of repeats are same, as matches are decided by seeds
+    result.error_number = sum(x.error is not None for x in match_results)
+    result.round_number = sum(x.round_number for x in match_results)
+    result.matches_per_second = len(tasks) / min(result.times)
+    return result
+
+
+def _load_log(path: str) -> str:
+    with open(path, "r", encoding="utf8") as f:
+        return f.read()
+
+
+def bench_replays(
+    paths: List[str],
+    repeat: int = 1,
+    match_version: str = BENCH_LOG_MATCH_VERSION,
+) -> Dict[str, ReplayBenchResult]:
+    """
+    Replay logs by `lpsim.replay.replay_log` and measure time used by each
+    log, which includes time of fingerprints of states. Results are keyed by
+    file name of logs.
+    """
+    results: Dict[str, ReplayBenchResult] = {}
+    for path in paths:
+        log_str = _load_log(path)
+        result = ReplayBenchResult(path=path)
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            replayed = replay_log(log_str, path, match_version)
+            result.times.append(time.perf_counter() - start_time)
+            if replayed.error is not None:
+                raise RuntimeError(f"Replay {path} failed. {replayed.error}")
+            result.command_number = replayed.command_number
+        result.best_time = min(result.times)
+        results[os.path.basename(path)] = result
+    return results
+
+
+def bench_phases(
+    decks: List[List[Deck]], seeds: List[int], config: MatchConfig | None = None
+) -> Dict[str, TimeStat]:
+    """
+    Run matches with history and skill prediction enabled, and measure time
+    used by each phase in `BENCH_PHASES`. As skill prediction is slow, matches
+    end after `BENCH_PHASE_MAX_ROUND` rounds.
+    """
+    if config is None:
+        config = MatchConfig()
+    config = config.copy(deep=True)
+    config.history_level = 10
+    config.make_skill_prediction = True
+    config.max_round_number = min(config.max_round_number, BENCH_PHASE_MAX_ROUND)
+    stats: Dict[str, TimeStat] = {}
+    with time_methods(Match, BENCH_PHASES, stats):
+        for task in make_tasks(decks, seeds, config=config):
+            run_match(task)
+    return stats
+
+
+async def _replay_log_by_http(log_str: str, match_version: str, stat: TimeStat) -> None:
+    """
+    Replay a log by calling `/reset` and `/respond` of `HTTPServer`. The started
+    match of the log is set by `/reset` with `match_state`, so views of players
+    and committed states are made by the server as in a real room.
+    """
+    agents, match = read_log(log_str)
+    match.version = match_version  # type: ignore
+    match.config.history_level = max(match.config.history_level, 10)
+    assert match.start()[0]
+    match.step()
+    server = HTTPServer(match_config=match.config)
+    try:
+        endpoints = {
+            getattr(route, "path", None): getattr(route, "endpoint", None)
+            for route in server.app.routes
+        }
+        await endpoints["/reset"](ResetData(match_state=match))
+        respond = endpoints["/respond"]
+        assert respond is not None
+        commands = [agent.commands for agent in agents]
+        while len(commands[0]) or len(commands[1]):
+            match = server.match
+            player_idx = 0 if match.need_respond(0) else 1
+            assert match.need_respond(player_idx), "No need respond."
+            data = RespondData(
+                player_idx=player_idx,
+                command=commands[player_idx].pop(0),
+                uuid=server.uuid,
+            )
+            start_time = time.perf_counter()
+            await respond(data)
+            stat.add(time.perf_counter() - start_time)
+    finally:
+        # remove the log filter that server adds to uvicorn logger
+        await server.close()
+
+
+def bench_http_respond(
+    paths: List[str], match_version: str = BENCH_LOG_MATCH_VERSION
+) -> TimeStat:
+    """
+    Replay logs by `/respond` of `HTTPServer` and measure time used by each
+    respond. The endpoint is called directly, so time of HTTP transport is not
+    included, but time of making and serializing diffs is included.
+    """
+    stat = TimeStat()
+    for path in paths:
+        asyncio.run(_replay_log_by_http(_load_log(path), match_version, stat))
+    return stat
+
+
+def run_benchmarks(
+    root: str = ".",
+    repeat: int = 3,
+    seeds: List[int] | None = None,
+    log_paths: List[str] | None = None,
+    http: bool = True,
+) -> BenchmarkResult:
+    """
+    Run all benchmarks.
+
+    Args:
+        root (str): Root of the repository, used to find logs.
+        repeat (int): Repeat times of match and replay benchmarks, the fastest
+            one is used when comparing.
+        seeds (List[int] | None): Seeds of matches. If None, use
+            `BENCH_SEEDS`.
+        log_paths (List[str] | None): Logs to replay. If None, use logs found
+            by `BENCH_LOG_PATTERNS`.
+        http (bool): Whether to run benchmark of `/respond`.
+    """
+    from .. import __version__
+
+    if seeds is None:
+        seeds = BENCH_SEEDS
+    if log_paths is None:
+        log_paths = get_bench_log_paths(root)
+    decks = get_bench_decks()
+    result = BenchmarkResult(
+        lpsim_version=__version__,
+        python_version=platform.python_version(),
+        platform=platform.platform(),
+        created_at=datetime.datetime.now().isoformat(),
+        repeat=repeat,
+    )
+    logging.info("benchmark matches")
+    result.matches = bench_matches(decks, seeds, repeat=repeat)
+    logging.info("benchmark replays")
+    result.replays = bench_replays(log_paths, repeat=repeat)
+    logging.info("benchmark phases")
+    result.phases = bench_phases(decks, seeds[:1])
+    if http:
+        logging.info("benchmark http respond")
+        result.http_respond = bench_http_respond(log_paths)
+    return result
@@ -0,0 +1,64 @@
+"""
+Canonical decks, seeds and log corpora used by benchmarks. Do not modify them
+unless necessary, otherwise benchmark results of different commits are not
+comparable.
+"""
+from typing import Dict, List
+
+
+BENCH_DECK_STRS: Dict[str, str] = {
+    "fischl_rhodeia_noelle": """
+        default_version:4.0
+        character:Fischl
+        character:Rhodeia of Loch
+        character:Noelle
+        Stellar Predator*2
+        Paimon*2
+        Liben*2
+        Sweet Madame*2
+        Mondstadt Hash Brown*2
+        Lotus Flower Crisp*2
+        Leave It to Me!*2
+        Strategize*2
+        Changing Shifts*2
+        I Haven't Lost Yet!*2
+        Toss-Up*2
+        Starsigns*2
+        Calx's Arts*2
+        Traveler's Handy Sword*2
+        Gambler's Earrings*2
+    """,
+    "ayaka_nahida_yoimiya": """
+        default_version:4.0
+        character:Kamisato Ayaka
+        character:Nahida
+        character:Yoimiya
+        Kanten Senmyou Blessing*2
+        The Seed of Stored Knowledge*2
+        Naganohara Meteor Swarm*2
+        Paimon*2
+        Liben*2
+        Sweet Madame*2
+        Mondstadt Hash Brown*2
+        Lotus Flower Crisp*2
+        Leave It to Me!*2
+        Strategize*2
+        Changing Shifts*2
+        I Haven't Lost Yet!*2
+        Toss-Up*2
+        Calx's Arts*2
+        Gambler's Earrings*2
+    """,
+}
+
+# each deck pair plays with these seeds
+BENCH_SEEDS: List[int] = [0, 1, 2, 3]
+
+# glob patterns of logs that are replayed, relative to repository root.
+BENCH_LOG_PATTERNS: List[str] = [
+    "tests/server/bugfix/jsons/*.json",
+    "tests/server/supports/kujirai_log.json",
+]
+
+# logs in corpora are recorded with old match version
+BENCH_LOG_MATCH_VERSION = "0.0.4"
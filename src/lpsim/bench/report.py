@@ -0,0 +1,75 @@
+"""
+Compare benchmark results of different commits.
+"""
+from typing import Any, Dict, List, Tuple
+
+
+def flatten_metrics(result: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Get metrics from a benchmark result that is loaded from JSON. All metrics
+    are time in seconds, i.e. lower is better.
+    """
+    metrics: Dict[str, float] = {}
+    matches = result.get("matches")
+    if matches is not None and matches["match_number"] > 0:
+        metrics["matches.seconds_per_match"] = (
+            min(matches["times"]) / matches["match_number"]
+        )
+    for name, replay in result.get("replays", {}).items():
+        metrics[f"replays.{name}"] = replay["best_time"]
+    for name, stat in result.get("phases", {}).items():
+        metrics[f"phases.{name}.mean"] = stat["mean"]
+    http_respond = result.get("http_respond")
+    if http_respond is not None and http_respond["count"] > 0:
+        metrics["http_respond.mean"] = http_respond["mean"]
+    return metrics
+
+
+def compare_results(
+    base: Dict[str, Any], new: Dict[str, Any]
+) -> List[Tuple[str, float, float, float]]:
+    """
+    Compare metrics that exist in both results.
+
+    Returns:
+        List of (metric name, base value, new value, relative change), where
+        relative change is `new / base - 1`, positive means slower.
+    """
+    base_metrics = flatten_metrics(base)
+    new_metrics = flatten_metrics(new)
+    res: List[Tuple[str, float, float, float]] = []
+    for name, base_value in base_metrics.items():
+        if name not in new_metrics or base_value <= 0:
+            continue
+        new_value = new_metrics[name]
+        res.append((name, base_value, new_value, new_value / base_value - 1))
+    return res
+
+
+def find_regressions(
+    base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.1
+) -> List[Tuple[str, float, float, float]]:
+    """
+    Find metrics that are slower than base by more than threshold.
+    """
+    return [x for x in compare_results(base, new) if x[3] > threshold]
+
+
+def format_report(
+    base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.1
+) -> str:
+    """
+    Format comparison of two results into a table. Regressions are marked by
+    `!`.
+    """
+    lines = [
+        f'base: {base.get("lpsim_version")} {base.get("created_at")}',
+        f'new:  {new.get("lpsim_version")} {new.get("created_at")}',
+    ]
+    for name, base_value, new_value, change in compare_results(base, new):
+        mark = "!" if change > threshold else " "
+        lines.append(
+            f"{mark} {name:<60} {base_value:>12.6f} {new_value:>12.6f} "
+            f"{change:>+8.1%}"
+        )
+    return "\n".join(lines)
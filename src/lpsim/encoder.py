@@ -0,0 +1,213 @@
+"""
+Encode matches into fixed-shape NumPy arrays for training. Arrays are
+allocated once by `ObservationEncoder`, and matches are written into them
+directly from match objects, without converting matches into dicts.
+
+Objects are encoded by the index of their names in `names` of the encoder,
+which defaults to names of all registered classes. Index 0 means empty slot,
+and index 1 means the name is not in `names`. Objects exceeding the number of
+slots are ignored.
+
+numpy is needed to use this module.
+"""
+from typing import Any, Dict, List, Sequence
+
+from .server.consts import ElementType
+from .server.match import Match, MatchState
+from .server.struct import DIE_COLOR_NUMBER
+from .utils.class_registry import get_registered_names
+
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+EMPTY_NAME_IDX = 0
+UNKNOWN_NAME_IDX = 1
+
+ELEMENT_IDX: Dict[ElementType, int] = {
+    element: idx for idx, element in enumerate(ElementType)
+}
+MATCH_STATE_IDX: Dict[MatchState, int] = {
+    state: idx for idx, state in enumerate(MatchState)
+}
+
+# names of features in last dimension of arrays
+MATCH_FEATURES = ["round_number", "state", "current_player", "winner"]
+PLAYER_FEATURES = [
+    "active_character_idx",
+    "has_round_ended",
+    "arcane_legend",
+    "charge_satisfied",
+    "plunge_satisfied",
+    "hand_number",
+    "deck_number",
+    "dice_number",
+]
+CHARACTER_FEATURES = ["name", "hp", "max_hp", "charge", "max_charge", "is_alive"]
+OBJECT_FEATURES = ["name", "usage"]
+
+
+class ObservationEncoder:
+    """
+    Encoder that writes matches into preallocated arrays. All arrays are
+    int32, their first dimension is the batch, and the second dimension of
+    arrays except `match` is the player.
+
+    Arrays:
+        match: [B, len(MATCH_FEATURES)], winner is -1 when not decided.
+        players: [B, 2, len(PLAYER_FEATURES)].
+        characters: [B, 2, C, len(CHARACTER_FEATURES)].
+        element_application: [B, 2, C, len(ElementType)], 1 if the element
+            is applied to the character.
+        character_attaches: [B, 2, C, A, len(OBJECT_FEATURES)], character
+            status and equipments of characters.
+        team_status: [B, 2, T, len(OBJECT_FEATURES)].
+        summons: [B, 2, S, len(OBJECT_FEATURES)].
+        supports: [B, 2, S, len(OBJECT_FEATURES)].
+        hands: [B, 2, H], name index of hand cards.
+        dice: [B, 2, DIE_COLOR_NUMBER], number of dice of each color, indexed
+            by `DIE_COLOR_IDX`.
+
+    Args:
+        batch_size (int): Number of matches that can be encoded at once.
+        names (Sequence[str] | None): Names to index objects. If None, use
+            names of all registered classes. The same names should be used
+            when encoded arrays are compared across processes or versions.
+        character_number (int): Slots of characters.
+        attach_number (int): Slots of attaches of a character.
+        team_status_number (int): Slots of team status.
+        summon_number (int): Slots of summons.
+        support_number (int): Slots of supports.
+        hand_number (int): Slots of hand cards.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 1,
+        names: Sequence[str] | None = None,
+        character_number: int = 3,
+        attach_number: int = 8,
+        team_status_number: int = 10,
+        summon_number: int = 4,
+        support_number: int = 4,
+        hand_number: int = 10,
+    ):
+        if np is None:  # pragma: no cover
+            raise ImportError("numpy is not installed, cannot encode matches.")
+        if names is None:
+            names = get_registered_names()
+        self.names: List[str] = list(names)
+        self.name_idx: Dict[str, int] = {
+            name: idx + 2 for idx, name in enumerate(self.names)
+        }
+        self.batch_size = batch_size
+        self.character_number = character_number
+        self.attach_number = attach_number
+        self.team_status_number = team_status_number
+        self.summon_number = summon_number
+        self.support_number = support_number
+        self.hand_number = hand_number
+        object_feature_number = len(OBJECT_FEATURES)
+        shapes = {
+            "match": (len(MATCH_FEATURES),),
+            "players": (2, len(PLAYER_FEATURES)),
+            "characters": (2, character_number, len(CHARACTER_FEATURES)),
+            "element_application": (2, character_number, len(ELEMENT_IDX)),
+            "character_attaches": (
+                2,
+                character_number,
+                attach_number,
+                object_feature_number,
+            ),
+            "team_status": (2, team_status_number, object_feature_number),
+            "summons": (2, summon_number, object_feature_number),
+            "supports": (2, support_number, object_feature_number),
+            "hands": (2, hand_number),
+            "dice": (2, DIE_COLOR_NUMBER),
+        }
+        self.arrays: Dict[str, Any] = {
+            key: np.zeros((batch_size,) + shape, dtype=np.int32)
+            for key, shape in shapes.items()
+        }
+
+    def get_name_idx(self, name: str) -> int:
+        """
+        Get index of a name, 1 if the name is unknown.
+        """
+        return self.name_idx.get(name, UNKNOWN_NAME_IDX)
+
+    def _encode_objects(self, objects: List[Any], out: Any) -> None:
+        """
+        Write name index and usage of objects into `out` of shape [N, 2].
+        """
+        name_idx = self.name_idx
+        for idx, obj in enumerate(objects[: len(out)]):
+            out[idx, 0] = name_idx.get(obj.name, UNKNOWN_NAME_IDX)
+            out[idx, 1] = getattr(obj, "usage", 0)
+
+    def encode(self, match: Match, batch_idx: int = 0) -> None:
+        """
+        Encode a match into `batch_idx` of arrays. Previous values of the
+        batch index are cleared.
+        """
+        arrays = self.arrays
+        for array in arrays.values():
+            array[batch_idx] = 0
+        name_idx = self.name_idx
+        match_array = arrays["match"][batch_idx]
+        match_array[0] = match.round_number
+        match_array[1] = MATCH_STATE_IDX[match.state]
+        match_array[2] = match.current_player
+        match_array[3] = match.winner
+        players = arrays["players"][batch_idx]
+        characters = arrays["characters"][batch_idx]
+        applications = arrays["element_application"][batch_idx]
+        attaches = arrays["character_attaches"][batch_idx]
+        hands = arrays["hands"][batch_idx]
+        dice = arrays["dice"][batch_idx]
+        for pidx, table in enumerate(match.player_tables[:2]):
+            player = players[pidx]
+            player[0] = table.active_character_idx
+            player[1] = table.has_round_ended
+            player[2] = table.arcane_legend
+            player[3] = table.charge_satisfied
+            player[4] = table.plunge_satisfied
+            player[5] = len(table.hands)
+            player[6] = len(table.table_deck)
+            player[7] = len(table.dice.colors)
+            for cidx, character in enumerate(table.characters[: self.character_number]):
+                out = characters[pidx, cidx]
+                out[0] = name_idx.get(character.name, UNKNOWN_NAME_IDX)
+                out[1] = character.hp
+                out[2] = character.max_hp
+                out[3] = character.charge
+                out[4] = character.max_charge
+                out[5] = character.is_alive
+                for element in character.element_application:
+                    applications[pidx, cidx, ELEMENT_IDX[element]] = 1
+                self._encode_objects(character.attaches, attaches[pidx, cidx])
+            self._encode_objects(
+                table.team_status, arrays["team_status"][batch_idx, pidx]
+            )
+            self._encode_objects(table.summons, arrays["summons"][batch_idx, pidx])
+            self._encode_objects(table.supports, arrays["supports"][batch_idx, pidx])
+            for hidx, card in enumerate(table.hands[: self.hand_number]):
+                hands[pidx, hidx] = name_idx.get(card.name, UNKNOWN_NAME_IDX)
+            dice[pidx] = table.dice.counts
+
+    def encode_batch(self, matches: Sequence[Match]) -> Dict[str, Any]:
+        """
+        Encode matches into the first `len(matches)` batch indices, and return
+        views of arrays of these indices. The views are overwritten when
+        encoding next time, copy them if they should be kept.
+        """
+        if len(matches) > self.batch_size:
+            raise ValueError(
+                f"{len(matches)} matches exceed batch size {self.batch_size}."
+            )
+        for batch_idx, match in enumerate(matches):
+            self.encode(match, batch_idx)
+        return {key: array[: len(matches)] for key, array in self.arrays.items()}
@@ -1,3 +1,6 @@
+import asyncio
+import contextlib
+import functools
 import os
 import platform
 import uvicorn
@@ -6,11 +9,15 @@ import time
 import logging
 import random
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.responses import JSONResponse
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import QueryParams
 from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 from multiprocessing import Process, Queue
 
 from .http_server import HTTPServer
@@ -92,6 +99,35 @@ class OneRoomWorker(Process):
                 pass
 
 
+class RoomDispatcher:
+    """
+    ASGI middleware of `HTTPRoomServer` in single process mode. Requests with
+    `room` in query parameters are sent to the app of the room, and POST
+    requests refresh active time of the room. Other requests are sent to the
+    room server.
+    """
+
+    def __init__(self, app: ASGIApp, room_server: "HTTPRoomServer"):
+        self.app = app
+        self.room_server = room_server
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            query_params = QueryParams(scope["query_string"])
+            if "room" in query_params:
+                room_name = query_params["room"]
+                room = self.room_server.rooms.get(room_name)
+                if room is None:
+                    response = JSONResponse(status_code=404, content="Room name wrong")
+                    await response(scope, receive, send)
+                    return
+                if scope["method"] == "POST":
+                    self.room_server.room_active_times_local[room_name] = time.time()
+                await room.app(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
 class HTTPRoomServer:
     """
     HTTP room server that host multiple rooms, each room is a HTTP server.
@@ -101,6 +137,17 @@ class HTTPRoomServer:
     It only starts rooms with same rules now. When running on Linux, it will
     collect deck codes of stopped rooms, but not on Windows.
 
+    In single process mode, rooms are `HTTPServer` objects hosted by the room
+    server on its own port, instead of one process and one port for each room.
+    Requests with query parameter `room`, which is already sent by clients of
+    rooms, are dispatched to the room by `RoomDispatcher`. Rooms are created
+    when needed, and rooms are created and their matches run in a thread pool
+    with at most max_workers threads, so idle rooms only cost their match
+    states. As these threads share the GIL, a room busy in its match does not
+    block requests of other rooms, but all rooms share one CPU core for their
+    matches. For CPU heavy usage, e.g. many rooms with agents, use the default
+    mode which runs each room in its own process.
+
     Args:
         max_rooms (int): Max number of rooms that can be created. All rooms
             will be created at the beginning.
@@ -119,6 +166,12 @@ class HTTPRoomServer:
         init_args (dict): Args for HTTPServer.__init__, e.g. match_config.
         run_args (dict): Args for HTTPServer.run, e.g. HTTPS certificate. But
             not port, which will be chosen randomly from room_port_range.
+        single_process (bool): If True, host rooms in single process mode. Then
+            rooms are not created at the beginning, room_port_range and
+            run_args are not used, and args of `run` are used for all rooms.
+        max_workers (int): Max number of threads to create rooms and run
+            matches of rooms in single process mode. More threads let more
+            rooms wait for the GIL at the same time, but not run faster.
     """
 
     def __init__(
@@ -131,6 +184,8 @@ class HTTPRoomServer:
         allow_origins: List[str] = ["*"],
         init_args: dict = {},
         run_args: dict = {},
+        single_process: bool = False,
+        max_workers: int = 4,
     ):
         self.max_rooms = max_rooms
         self.port = port
@@ -140,19 +195,29 @@ class HTTPRoomServer:
         self.allow_origins = allow_origins
         self.init_args = init_args
         self.run_args = run_args
+        self.single_process = single_process
 
         self.deck_history: List[Tuple[str, str]] = []
 
+        # rooms in single process mode, keyed by room name. Rooms that are
+        # being created are in _creating_rooms.
+        self.rooms: Dict[str, HTTPServer] = {}
+        self.room_active_times_local: Dict[str, float] = {}
+        self._creating_rooms: Dict[str, asyncio.Task] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        if single_process:
+            self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="room")
+
         self._check_time_interval = 5
 
-        if platform.system() == "Windows":
+        if platform.system() == "Windows" and not single_process:
             logging.warning(
                 "Windows system detected, room server will use terminate "
                 "instead of graceful shutdown, and cannot collect uploaded "
                 "deck information."
             )
 
-        self.app = FastAPI()
+        self.app = FastAPI(lifespan=self._lifespan if single_process else None)
         app = self.app
 
         app.add_middleware(
@@ -164,6 +229,10 @@ class HTTPRoomServer:
             allow_headers=["*"],
         )
         app.add_middleware(GZipMiddleware)
+        if single_process:
+            # added last to be the outermost middleware, so requests of rooms
+            # are handled by middlewares of rooms.
+            app.add_middleware(RoomDispatcher, room_server=self)
 
         @app.get("/version")
         async def get_version():
@@ -186,7 +255,7 @@ class HTTPRoomServer:
             }
 
         @app.post("/room/{room_name}")
-        def post_room_name(room_name: str):
+        async def post_room_name(room_name: str):
             """
             Create a new room with given name. If room is already created,
             return its port.
@@ -197,45 +266,15 @@ class HTTPRoomServer:
             Returns:
                 JSONResponse: The response containing the port (if success) and status
                 of the room. When status is exist or created, the corresponding port
-                will be returned. Otherwise, only status will be returned.
+                will be returned. Otherwise, only status will be returned. In single
+                process mode, the port is the port of the room server.
             """
-            if room_name in self.room_names:
-                idx = self.room_names.index(room_name)
-                return JSONResponse({"port": self.room_ports[idx], "status": "exist"})
-            else:
-                if None not in self.room_names:
-                    return JSONResponse({"status": "full"})
-                # create new one
-                idx = self.room_names.index(None)
-                init_args = self.init_args.copy()
-                init_args["room_name"] = room_name
-                cmd_q, resp_q, post_q = self.queues[idx]
-                cmd_q.put((init_args, self.run_args, self.room_port_range))
-                while True:
-                    resp = resp_q.get()
-                    if resp == "server failed to start":
-                        return JSONResponse({"status": "failed"})
-                    else:
-                        # is port, but may start failed, need to check
-                        # whether fail message is sent
-                        if resp_q.empty():
-                            # if is empty, wait a minute and check again
-                            time.sleep(0.1)
-                        if resp_q.empty():
-                            # queue empty, start success
-                            self.room_names[idx] = room_name
-                            self.room_ports[idx] = int(resp)
-                            self.room_active_times[idx] = time.time()
-                            return JSONResponse(
-                                {"port": self.room_ports[idx], "status": "created"}
-                            )
-                        else:
-                            # start failed with message
-                            resp = resp_q.get()
-                            assert resp == "invalid and retry"
+            if self.single_process:
+                return await self._create_room_local(room_name)
+            return await run_in_threadpool(self._create_room_by_worker, room_name)
 
         @app.delete("/room/{room_name}")
-        def delete_room_name(room_name: str, password: str = ""):
+        async def delete_room_name(room_name: str, password: str = ""):
             """
             Delete a room with given name. If room is not created, return
             error.
@@ -250,15 +289,20 @@ class HTTPRoomServer:
             """
             if password != self.admin_password:
                 return JSONResponse(status_code=403, content="wrong password")
+            if self.single_process:
+                if room_name not in self.rooms:
+                    return JSONResponse({"status": "not exist"}, 404)
+                await self._delete_room_local(room_name)
+                return JSONResponse({"status": "deleted"})
             if room_name not in self.room_names:
                 return JSONResponse({"status": "not exist"}, 404)
             else:
                 idx = self.room_names.index(room_name)
-                self._delete_one_room(idx)
+                await run_in_threadpool(self._delete_one_room, idx)
                 return JSONResponse({"status": "deleted"})
 
         @app.get("/rooms")
-        def get_rooms(password: str = ""):
+        async def get_rooms(password: str = ""):
             """
             Get all rooms' name and port.
 
@@ -270,6 +314,19 @@ class HTTPRoomServer:
             """
             if password != self.admin_password:
                 return JSONResponse(status_code=403, content="wrong password")
+            if self.single_process:
+                return JSONResponse(
+                    {
+                        "rooms": [
+                            {
+                                "name": name,
+                                "port": self.port,
+                                "timeout": int(self.room_timeout - time.time() + at),
+                            }
+                            for name, at in self.room_active_times_local.items()
+                        ]
+                    }
+                )
             return JSONResponse(
                 {
                     "rooms": [
@@ -301,6 +358,122 @@ class HTTPRoomServer:
                 return JSONResponse(status_code=403, content="wrong password")
             return JSONResponse(self.deck_history)
 
+    def _create_room_by_worker(self, room_name: str) -> JSONResponse:
+        """
+        Create a room with a free room worker, and wait until it starts.
+        """
+        if room_name in self.room_names:
+            idx = self.room_names.index(room_name)
+            return JSONResponse({"port": self.room_ports[idx], "status": "exist"})
+        else:
+            if None not in self.room_names:
+                return JSONResponse({"status": "full"})
+            # create new one
+            idx = self.room_names.index(None)
+            init_args = self.init_args.copy()
+            init_args["room_name"] = room_name
+            cmd_q, resp_q, post_q = self.queues[idx]
+            cmd_q.put((init_args, self.run_args, self.room_port_range))
+            while True:
+                resp = resp_q.get()
+                if resp == "server failed to start":
+                    return JSONResponse({"status": "failed"})
+                else:
+                    # is port, but may start failed, need to check
+                    # whether fail message is sent
+                    if resp_q.empty():
+                        # if is empty, wait a minute and check again
+                        time.sleep(0.1)
+                    if resp_q.empty():
+                        # queue empty, start success
+                        self.room_names[idx] = room_name
+                        self.room_ports[idx] = int(resp)
+                        self.room_active_times[idx] = time.time()
+                        return JSONResponse(
+                            {"port": self.room_ports[idx], "status": "created"}
+                        )
+                    else:
+                        # start failed with message
+                        resp = resp_q.get()
+                        assert resp == "invalid and retry"
+
+    async def _create_room_local(self, room_name: str) -> JSONResponse:
+        """
+        Create a room in single process mode. If the room is being created by
+        another request, wait for it.
+        """
+        if room_name in self.rooms:
+            return JSONResponse({"port": self.port, "status": "exist"})
+        task = self._creating_rooms.get(room_name)
+        status = "exist"
+        if task is None:
+            if len(self.rooms) + len(self._creating_rooms) >= self.max_rooms:
+                return JSONResponse({"status": "full"})
+            task = asyncio.create_task(self._start_room_local(room_name))
+            self._creating_rooms[room_name] = task
+            status = "created"
+        try:
+            await asyncio.shield(task)
+        except Exception:
+            logging.exception(f"room {room_name} failed to start")
+            return JSONResponse({"status": "failed"})
+        return JSONResponse({"port": self.port, "status": status})
+
+    async def _start_room_local(self, room_name: str) -> None:
+        """
+        Create `HTTPServer` of a room in the thread pool, and add it to rooms.
+        """
+        init_args = self.init_args.copy()
+        init_args["room_name"] = room_name
+        init_args.setdefault("executor", self._executor)
+        try:
+            room = await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(HTTPServer, **init_args)
+            )
+            self.rooms[room_name] = room
+            self.room_active_times_local[room_name] = time.time()
+        finally:
+            del self._creating_rooms[room_name]
+
+    async def _delete_room_local(self, room_name: str) -> None:
+        """
+        Remove a room in single process mode, save its log and collect its
+        uploaded decks.
+        """
+        room = self.rooms.pop(room_name)
+        del self.room_active_times_local[room_name]
+        room.save_log(room.reset_log_save_file)
+        for deck in room.uploaded_deck_codes:
+            self.deck_history.append((room_name, deck))
+        await room.close()
+        logging.warning(f"room {room_name} stopped")
+
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """
+        Lifespan of room server in single process mode. Check timeout of rooms
+        while running, and remove all rooms when it stops.
+        """
+        check_task = asyncio.create_task(self._check_rooms_local())
+        yield
+        check_task.cancel()
+        for room_name in list(self.rooms):
+            await self._delete_room_local(room_name)
+
+    async def _check_rooms_local(self) -> None:
+        """
+        Periodically remove rooms that are not used for a long time in single
+        process mode.
+        """
+        while True:
+            await asyncio.sleep(self._check_time_interval)
+            now = time.time()
+            for room_name, active_time in list(self.room_active_times_local.items()):
+                # room may be deleted when waiting for deleting other rooms
+                if room_name in self.rooms and now - active_time > self.room_timeout:
+                    logging.warning(f"room {room_name} timeout")
+                    await self._delete_room_local(room_name)
+
     def _create_room_workers(self):
         max_rooms = self.max_rooms
         self.workers = []
@@ -323,10 +496,19 @@ class HTTPRoomServer:
         Create room workers, start them and run room server.
         When HTTPRoomServer stopped, stop all workers and stop check interval.
         All args will be passed to uvicorn.run, except port, which is not allowed.
+        In single process mode, only run room server, and rooms are removed
+        when it stops.
         """
         if len(argv):
             raise ValueError("positional arguments not supported")
 
+        if self.single_process:
+            assert "port" not in kwargs
+            uvicorn.run(self.app, **kwargs, port=self.port)
+            assert self._executor is not None
+            self._executor.shutdown()
+            return
+
         # create room workers
         self._create_room_workers()
 
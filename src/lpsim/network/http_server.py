@@ -3,11 +3,11 @@ import logging
 import json
 import uuid
 import os
-import time
 import datetime
-from typing import Literal, List
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Dict, Literal, List, Tuple
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
@@ -16,9 +16,11 @@ import uvicorn
 from ..utils.desc_registry import get_desc_patch
 
 from ..server.match import Match, MatchConfig
+from ..server.interaction import Responses
 from ..server.deck import Deck
 from ..agents import InteractionAgent
 from .utils import get_new_match
+from .player_view import PlayerViewRecorder
 from ..utils.deck_code import deck_code_data
 from .__version__ import __version_tuple__, __version__, __frontend_version__
 
@@ -55,6 +57,36 @@ class EndpointFilter(logging.Filter):
         return False
 
 
+def _dump_json(data: Any) -> bytes:
+    """
+    Encode data into JSON bytes, same as `JSONResponse`.
+    """
+    return json.dumps(
+        data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _json_list_response(items: List[bytes]) -> Response:
+    """
+    Make a JSON list response from encoded items.
+    """
+    return Response(b"[" + b",".join(items) + b"]", media_type="application/json")
+
+
+def _sse_message(
+    data: bytes, idx: int | None = None, event: str | None = None
+) -> bytes:
+    """
+    Format a message of Server-Sent Events.
+    """
+    res = b""
+    if event is not None:
+        res += f"event: {event}\n".encode()
+    if idx is not None:
+        res += f"id: {idx}\n".encode()
+    return res + b"data: " + data + b"\n\n"
+
+
 class ResetData(BaseModel):
     fixed_random_seed: bool = False
     offset: int = 0
@@ -78,9 +110,10 @@ class RespondData(BaseModel):
 
 class HTTPServer:
     """
-    Simple HTTP server based on HTTP API. No safety protocol and data
-    visibility support now, i.e. everyone can get full information of opponent
-    player and system states.
+    Simple HTTP server based on HTTP API. No safety protocol now. States in the
+    view of a player, which hide information of the opponent, can be fetched
+    by `/state` and `/state_stream` with player_idx 0 or 1, but everyone can
+    still get full information of both players and system states.
 
     To check APIs, use /docs or /redoc after run the server.
     """
@@ -95,6 +128,7 @@ class HTTPServer:
         excluded_log_endpoints: List[str] = ["/request", "/state"],
         get_state_timeout: float = 10,
         get_state_sleeptime: float = 0.5,
+        executor: Executor | None = None,
     ):
         """
         Init the HTTPServer instance.
@@ -112,6 +146,13 @@ class HTTPServer:
                 room=room_name will be accepted.
             excluded_log_endpoints (List[str]): endpoints that will not be logged.
                 Default is ['/request', '/state'].
+            get_state_timeout (float): timeout of long polling `/state`, and
+                interval of keep-alive messages of `/state_stream`.
+            get_state_sleeptime (float): not used, as waiting clients are
+                notified when states change. Kept for compatibility.
+            executor (Executor): executor to run the match when responding, so
+                the event loop is not blocked. Default is None, which means the
+                default executor of the event loop.
         """
         self.app = FastAPI()
         self.decks = [
@@ -124,14 +165,41 @@ class HTTPServer:
         # perform long polling, set timeout to less than 0.
         self.get_state_timeout = get_state_timeout
         self.get_state_sleeptime = get_state_sleeptime
-        logging.getLogger("uvicorn.access").addFilter(
-            EndpointFilter(self.excluded_log_endpoints)
-        )
+        self.executor = executor
+        # held when the match is running or replaced, so responds and resets
+        # are handled one by one. Fetching states and requests does not need
+        # it, and only reads states and requests committed by `_commit_states`.
+        self._match_lock = asyncio.Lock()
+        # notified when new states are recorded or match is reset, waited by
+        # long polling and streaming of states.
+        self._state_condition = asyncio.Condition()
+        # encoded states of the match with uuid `_frame_cache_uuid`, keyed by
+        # player_idx, and -1 is full states. States are not changed after
+        # recorded, so each state is encoded only once.
+        self._frame_cache: Dict[int, List[bytes]] = {}
+        self._frame_cache_uuid = ""
+        # views of players of histories of `_player_view_match`. They are
+        # recorded by history hooks of the match, as histories may be
+        # compressed. If `_player_view_match` is not current match, views are
+        # not available.
+        self._player_views: List[PlayerViewRecorder] = []
+        self._player_view_match: Match | None = None
+        # set by `close`, then streams of states end.
+        self._closed = False
+        self._log_filter = EndpointFilter(self.excluded_log_endpoints)
+        logging.getLogger("uvicorn.access").addFilter(self._log_filter)
         if match_config is not None and match_config.history_level < 10:
             raise ValueError("history_level must be at least 10 for HTTPServer")
-        match, random_state = get_new_match(self.decks, match_config=match_config)
+        match, random_state = self._new_match(self.decks, match_config=match_config)
         self.uuid = str(uuid.uuid4())
         self.match = match
+        # number of states and encoded requests of the match that are
+        # committed. When the match is running, states may be appended and
+        # dropped, so they are committed with `_match_lock` held after respond
+        # or reset finishes.
+        self._state_number = 0
+        self._requests: List[Dict[str, Any]] = []
+        self._commit_states()
         self.match_random_state = random_state
         self.agent_0 = InteractionAgent(player_idx=0, only_use_command=True)
         self.agent_1 = InteractionAgent(player_idx=1, only_use_command=True)
@@ -241,62 +309,68 @@ class HTTPServer:
                 match: full match state
                 type: "FULL"
             """
-            self.save_log(self.reset_log_save_file)
-            match = self.match
-            fixed_random_seed = data.fixed_random_seed
-            if fixed_random_seed:
-                raise NotImplementedError("fixed_random_seed not supported")
-            match_config = data.match_config
-            if match_config is None:
-                match_config = match.config
-            rich = data.rich_mode
-            match_state = data.match_state
-            match_state_idx = data.match_state_idx
-            if match_state_idx is not None:
-                try:
-                    match = self.match.new_match_from_history(match_state_idx)
-                except AssertionError as e:
-                    raise HTTPException(status_code=404, detail=str(e))
-                self.match = match
-                # remove command history that after match_state_idx. No need to
-                # change match random state and start deck.
-                current_cmd_hist = self.command_history[:]
-                self.command_history = [[], []]
-                for source, target in zip(current_cmd_hist, self.command_history):
-                    for idx, cmd, order in source:
-                        if idx >= match_state_idx:
-                            break
-                        target.append([idx, cmd, order])
-            elif match_state is not None:
-                match = match_state
-                match._save_history()
-                match_state_idx = len(match._history_diff) - 1
-                # when reset by match_state, cannot record history with only
-                # match random state, set to None to notify that cannot save.
-                self.command_history = [[], []]
-                self.match_random_state = None
-                self.start_deck = [
-                    x.player_deck_information for x in match.player_tables
-                ]
-            else:
-                self.match, self.match_random_state = get_new_match(
-                    decks=self.decks,
-                    rich_mode=rich,
-                    match_config=match_config,
-                )
-                match_state_idx = 0
+            async with self._match_lock:
+                self.save_log(self.reset_log_save_file)
                 match = self.match
-                self.command_history = [[], []]
-                self.start_deck = [
-                    x.player_deck_information for x in match.player_tables
-                ]
-            self.uuid = str(uuid.uuid4())
-            return {
-                "uuid": self.uuid,
-                "idx": match_state_idx,
-                "match": match.dict(),
-                "type": "FULL",
-            }
+                fixed_random_seed = data.fixed_random_seed
+                if fixed_random_seed:
+                    raise NotImplementedError("fixed_random_seed not supported")
+                match_config = data.match_config
+                if match_config is None:
+                    match_config = match.config
+                rich = data.rich_mode
+                match_state = data.match_state
+                match_state_idx = data.match_state_idx
+                if match_state_idx is not None:
+                    try:
+                        match = self.match.new_match_from_history(match_state_idx)
+                    except AssertionError as e:
+                        raise HTTPException(status_code=404, detail=str(e))
+                    self._attach_player_views(match, match_state_idx + 1)
+                    self.match = match
+                    # remove command history that after match_state_idx. No need to
+                    # change match random state and start deck.
+                    current_cmd_hist = self.command_history[:]
+                    self.command_history = [[], []]
+                    for source, target in zip(current_cmd_hist, self.command_history):
+                        for idx, cmd, order in source:
+                            if idx >= match_state_idx:
+                                break
+                            target.append([idx, cmd, order])
+                elif match_state is not None:
+                    match = match_state
+                    self._attach_player_views(match)
+                    self.match = match
+                    match._save_history()
+                    match_state_idx = len(match._history_diff) - 1
+                    # when reset by match_state, cannot record history with only
+                    # match random state, set to None to notify that cannot save.
+                    self.command_history = [[], []]
+                    self.match_random_state = None
+                    self.start_deck = [
+                        x.player_deck_information for x in match.player_tables
+                    ]
+                else:
+                    self.match, self.match_random_state = self._new_match(
+                        decks=self.decks,
+                        rich_mode=rich,
+                        match_config=match_config,
+                    )
+                    match_state_idx = 0
+                    match = self.match
+                    self.command_history = [[], []]
+                    self.start_deck = [
+                        x.player_deck_information for x in match.player_tables
+                    ]
+                self._commit_states()
+                self.uuid = str(uuid.uuid4())
+                await self._notify_state()
+                return {
+                    "uuid": self.uuid,
+                    "idx": match_state_idx,
+                    "match": match.dict(),
+                    "type": "FULL",
+                }
 
         @app.get("/deck/{player_idx}")
         async def get_deck(player_idx: int):
@@ -422,7 +496,9 @@ class HTTPServer:
                     the state
 
                 player_idx (int): -1 means fetch complete data; 0 or 1 means fetch data
-                    for player idx (currently not implemented)
+                    in the view of player idx, i.e. hand cards, deck and requests of
+                    the opponent, random state and skill predictions for the
+                    opponent are hidden. Check `player_view` for details.
 
             Return:
                 list of states. For detail of state dict, refer to `post_reset`.
@@ -430,54 +506,63 @@ class HTTPServer:
             if state_idx > 0 and uuid != self.uuid:
                 # not initial state, but uuid different
                 raise HTTPException(status_code=404, detail="UUID not match")
-            match = self.match
             # player idx check
             if player_idx < -1 or player_idx > 1:
                 raise HTTPException(status_code=404, detail="Player not found")
-            if player_idx != -1:
-                raise HTTPException(
-                    status_code=404, detail="player data fetch not supported"
-                )
+            if player_idx != -1 and self._player_view_match is not self.match:
+                raise HTTPException(status_code=404, detail="Player view not available")
             # state idx check
-            if state_idx < -1 or state_idx > len(match._history_diff):
+            if state_idx < -1 or state_idx > self._state_number:
                 raise HTTPException(status_code=404, detail="State not found")
             if state_idx == -1:
-                state_idx = len(match._history_diff) - 1
-            start_time = time.time()
-            while time.time() - start_time < self.get_state_timeout:
-                if state_idx > 0 and self.uuid != uuid:
-                    # during waiting data change, uuid changed. new match
-                    # started, return empty result
-                    return JSONResponse([])
-                if state_idx == len(match._history_diff):
-                    # ask for the state after the last state, wait until
-                    # timeout to try to get new state
-                    await asyncio.sleep(self.get_state_sleeptime)
-                    continue
-                result = []
-                if state_idx == 0:
-                    # first is 0, add full state and change state_idx to 1
-                    result = [
-                        {
-                            "uuid": self.uuid,
-                            "idx": state_idx,
-                            "match": match._history[0].dict(),
-                            "type": "FULL",
-                        }
-                    ]
-                    state_idx = 1
-                if mode == "after":
-                    result += [
-                        {
-                            "uuid": self.uuid,
-                            "idx": state_idx + idx,
-                            "match_diff": diff,
-                            "type": "DIFF",
-                        }
-                        for idx, diff in enumerate(match._history_diff[state_idx:])
-                    ]
-                return JSONResponse(result)
-            return JSONResponse([])
+                state_idx = self._state_number - 1
+            if not await self._wait_state(
+                state_idx, uuid if state_idx > 0 else None, self.get_state_timeout
+            ):
+                # timeout when waiting new state
+                return JSONResponse([])
+            if state_idx > 0 and self.uuid != uuid:
+                # during waiting data change, uuid changed. new match
+                # started, return empty result
+                return JSONResponse([])
+            if mode == "one":
+                # only the state of state_idx is returned in one mode
+                frames = self._get_frame_bytes(state_idx, 1, player_idx)
+            else:
+                frames = self._get_frame_bytes(state_idx, None, player_idx)
+            return _json_list_response(frames)
+
+        @app.get("/state_stream/{player_idx}")
+        async def get_state_stream(
+            player_idx: int, state_idx: int = 0, uuid: str | None = None
+        ):
+            """
+            Stream states from state_idx with Server-Sent Events. Each message
+            contains one state, its data has same structure as states returned
+            by `/state`, and its id is the index of the state. New states are
+            sent as soon as they are recorded. If no new state is recorded in
+            `get_state_timeout` seconds, a comment is sent to keep the
+            connection alive. When the match is reset, a `reset` message with
+            new uuid is sent and the stream ends.
+
+            Args:
+                player_idx (int): same as `/state`.
+                state_idx (int): index of the first state to send.
+                uuid (str | None): uuid of the match, needed when state_idx is
+                    not 0.
+            """
+            if state_idx > 0 and uuid != self.uuid:
+                raise HTTPException(status_code=404, detail="UUID not match")
+            if player_idx < -1 or player_idx > 1:
+                raise HTTPException(status_code=404, detail="Player not found")
+            if player_idx != -1 and self._player_view_match is not self.match:
+                raise HTTPException(status_code=404, detail="Player view not available")
+            if state_idx < 0 or state_idx > self._state_number:
+                raise HTTPException(status_code=404, detail="State not found")
+            return StreamingResponse(
+                self._stream_states(state_idx, player_idx),
+                media_type="text/event-stream",
+            )
 
         @app.get("/request/{player_idx}")
         async def get_request(player_idx: int):
@@ -489,81 +574,48 @@ class HTTPServer:
             """
             if player_idx < -1 or player_idx > 1:
                 raise HTTPException(status_code=404, detail="Player not found")
-            res = self.match.requests
+            res = self._requests
             if player_idx != -1:
-                res = [x for x in res if x.player_idx == player_idx]
-            return JSONResponse([x.dict() for x in res])
+                res = [x for x in res if x["player_idx"] == player_idx]
+            return JSONResponse(res)
 
         @app.post("/respond")
         async def post_respond(data: RespondData):
             """
             Receives respond to the request. Respond command string will be sent to
-            `InteractionAgent`.
+            `InteractionAgent`. The match runs in `executor`, and responds are
+            handled one by one, so other requests are still served when the match
+            is running.
             """
-            if data.uuid != self.uuid:
-                raise HTTPException(status_code=404, detail="UUID not match")
-            if data.frame_number != -1:
-                # contains frame number, should match with current frame number
-                if data.frame_number + 1 < len(self.match._history_diff):
-                    # old respond, ignore
-                    return JSONResponse([])
-            match = self.match
-            player_idx = data.player_idx
-            command = data.command
-            current_history_length = len(match._history_diff)
-            if not match.need_respond(player_idx):
-                raise HTTPException(status_code=404, detail="Not your turn")
-            if player_idx == 0:
-                agent = self.agent_0
-            elif player_idx == 1:
-                agent = self.agent_1
-            else:
-                raise HTTPException(status_code=404, detail="Player not found")
-            agent.commands = [command]
-            resp = agent.generate_response(match)
-            if resp is None:
-                raise HTTPException(status_code=404, detail="Invalid command")
-            match.respond(resp)
-            match.step()
-            for agent in (self.agent_0, self.agent_1):
-                if (
-                    agent.__class__ != InteractionAgent or len(agent.commands) > 0  # type: ignore  # noqa: E501
-                ):
-                    while match.need_respond(agent.player_idx):
-                        resp = agent.generate_response(match)
-                        assert resp is not None
-                        match.respond(resp)
-                        match.step()
-            # after success respond, save command into command history
-            self.command_history[player_idx].append(
-                [
-                    current_history_length - 1,
-                    command,
-                    len(self.command_history[0] + self.command_history[1]),
-                ]
-            )
-            # generate response
-            ret = []
-            for idx, diff in enumerate(match._history_diff[current_history_length:]):
-                if idx == 0 and current_history_length == 0:
-                    ret.append(
-                        {
-                            "uuid": self.uuid,
-                            "idx": idx + current_history_length,
-                            "match": match._history[0].dict(),
-                            "type": "FULL",
-                        }
-                    )
-                else:
-                    ret.append(
-                        {
-                            "uuid": self.uuid,
-                            "idx": idx + current_history_length,
-                            "match_diff": diff,
-                            "type": "DIFF",
-                        }
+            async with self._match_lock:
+                if data.uuid != self.uuid:
+                    raise HTTPException(status_code=404, detail="UUID not match")
+                if data.frame_number != -1:
+                    # contains frame number, should match with current frame number
+                    if data.frame_number + 1 < len(self.match._history_diff):
+                        # old respond, ignore
+                        return JSONResponse([])
+                player_idx = data.player_idx
+                command = data.command
+                resp = self._make_response(player_idx, command)
+                current_history_length = len(self.match._history_diff)
+                try:
+                    await asyncio.get_running_loop().run_in_executor(
+                        self.executor, self._respond, resp
                     )
-            return JSONResponse(ret)
+                finally:
+                    self._commit_states()
+                # after success respond, save command into command history
+                self.command_history[player_idx].append(
+                    [
+                        current_history_length - 1,
+                        command,
+                        len(self.command_history[0] + self.command_history[1]),
+                    ]
+                )
+            await self._notify_state()
+            # generate response
+            return _json_list_response(self._get_frame_bytes(current_history_length))
 
         @app.get("/log")
         def get_log():
@@ -576,6 +628,223 @@ class HTTPServer:
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
+    def _make_response(self, player_idx: int, command: str) -> Responses:
+        """
+        Make response of player_idx from command. It runs in the event loop
+        with `_match_lock` held, so invalid responds are rejected before the
+        match runs.
+        """
+        if player_idx == 0:
+            agent = self.agent_0
+        elif player_idx == 1:
+            agent = self.agent_1
+        else:
+            raise HTTPException(status_code=404, detail="Player not found")
+        if not self.match.need_respond(player_idx):
+            raise HTTPException(status_code=404, detail="Not your turn")
+        agent.commands = [command]
+        try:
+            resp = agent.generate_response(self.match)
+        except AssertionError:
+            # command of unavailable request
+            resp = None
+        if resp is None:
+            agent.commands = []
+            raise HTTPException(status_code=404, detail="Invalid command")
+        return resp
+
+    def _respond(self, resp: Responses) -> None:
+        """
+        Respond to the match with a response made by `_make_response`, and run
+        the match until it needs respond from players. It runs in `executor`
+        with `_match_lock` held.
+        """
+        match = self.match
+        match.respond(resp)
+        match.step()
+        for agent in (self.agent_0, self.agent_1):
+            if (
+                agent.__class__ != InteractionAgent or len(agent.commands) > 0  # type: ignore  # noqa: E501
+            ):
+                while match.need_respond(agent.player_idx):
+                    resp = agent.generate_response(match)
+                    assert resp is not None
+                    match.respond(resp)
+                    match.step()
+
+    def _commit_states(self) -> None:
+        """
+        Commit states and requests of current match, which are served without
+        `_match_lock`. It should be called when the match is not running.
+        """
+        self._state_number = len(self.match._history_diff)
+        self._requests = [x.dict() for x in self.match.requests]
+
+    def _get_frames(
+        self, start_idx: int, number: int | None = None, player_idx: int = -1
+    ) -> List[Dict[str, Any]]:
+        """
+        Get states of the match from start_idx. State 0 is the full match, and
+        others are diffs from previous states. If number is not None, at most
+        number states are returned. If player_idx is not -1, states are in the
+        view of the player.
+        """
+        match = self.match
+        end_idx = self._state_number
+        if number is not None:
+            end_idx = min(end_idx, start_idx + number)
+        if player_idx == -1:
+            diffs = match._history_diff
+        else:
+            diffs = self._player_views[player_idx].diffs
+        result: List[Dict[str, Any]] = []
+        for idx in range(start_idx, end_idx):
+            if idx == 0:
+                if player_idx == -1:
+                    full = match._history[0].dict()
+                else:
+                    full = self._player_views[player_idx].get_full()
+                result.append(
+                    {
+                        "uuid": self.uuid,
+                        "idx": idx,
+                        "match": full,
+                        "type": "FULL",
+                    }
+                )
+            else:
+                result.append(
+                    {
+                        "uuid": self.uuid,
+                        "idx": idx,
+                        "match_diff": diffs[idx],
+                        "type": "DIFF",
+                    }
+                )
+        return result
+
+    def _get_frame_bytes(
+        self, start_idx: int, number: int | None = None, player_idx: int = -1
+    ) -> List[bytes]:
+        """
+        Same as `_get_frames`, but return encoded states. Committed states are
+        encoded when first requested and cached until uuid changes or states
+        are dropped, and following requests only concatenate cached results.
+        """
+        end_idx = self._state_number
+        if self._frame_cache_uuid != self.uuid or any(
+            len(x) > end_idx for x in self._frame_cache.values()
+        ):
+            self._frame_cache = {}
+            self._frame_cache_uuid = self.uuid
+        cache = self._frame_cache.setdefault(player_idx, [])
+        for frame in self._get_frames(len(cache), end_idx - len(cache), player_idx):
+            cache.append(_dump_json(frame))
+        if number is not None:
+            end_idx = min(end_idx, start_idx + number)
+        return cache[start_idx:end_idx]
+
+    def _new_match(self, decks: List[Deck], **kwargs) -> Tuple[Match, Any]:
+        """
+        Create a new match by `get_new_match`, and record views of players of
+        its histories.
+        """
+        views = [PlayerViewRecorder(idx) for idx in range(2)]
+        match, random_state = get_new_match(decks, history_hooks=views, **kwargs)
+        self._player_views = views
+        self._player_view_match = match
+        return match, random_state
+
+    def _attach_player_views(self, match: Match, keep_number: int = 0) -> None:
+        """
+        Record views of players of histories of match, which will replace
+        current match. If keep_number is positive, match is reset to a history
+        of current match, and views of its first keep_number histories are
+        kept. Otherwise, views of histories already in match are recorded
+        again, and if some of them are compressed, views are not available.
+        """
+        views = self._player_views
+        if (
+            keep_number > 0
+            and self._player_view_match is self.match
+            and keep_number <= len(views[0].diffs)
+        ):
+            for view in views:
+                view.truncate(keep_number, match._history[-1])
+        else:
+            if len(match._history) != len(match._history_diff):
+                self._player_view_match = None
+                return
+            views = [PlayerViewRecorder(idx) for idx in range(2)]
+            for history in match._history:
+                for view in views:
+                    view.record(history)
+        match._history_hooks.extend(views)
+        self._player_views = views
+        self._player_view_match = match
+
+    async def _notify_state(self) -> None:
+        """
+        Wake up clients that are waiting for new states.
+        """
+        async with self._state_condition:
+            self._state_condition.notify_all()
+
+    async def _wait_state(
+        self, state_idx: int, uuid: str | None, timeout: float
+    ) -> bool:
+        """
+        Wait until the state of state_idx is recorded, or uuid is changed by
+        resetting the match. If uuid is None, only wait for the state. Return
+        False if timeout.
+        """
+
+        def ready() -> bool:
+            return (
+                self._closed
+                or state_idx < self._state_number
+                or (uuid is not None and self.uuid != uuid)
+            )
+
+        if ready():
+            return True
+        async with self._state_condition:
+            try:
+                await asyncio.wait_for(
+                    self._state_condition.wait_for(ready), max(timeout, 0)
+                )
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _stream_states(
+        self, state_idx: int, player_idx: int = -1
+    ) -> AsyncIterator[bytes]:
+        """
+        Generate Server-Sent Events messages of states from state_idx, until
+        the match is reset or the server is closed.
+        """
+        uuid = self.uuid
+        while not self._closed:
+            if self.uuid != uuid:
+                yield _sse_message(_dump_json({"uuid": self.uuid}), event="reset")
+                return
+            for frame in self._get_frame_bytes(state_idx, None, player_idx):
+                yield _sse_message(frame, state_idx)
+                state_idx += 1
+            if not await self._wait_state(state_idx, uuid, self.get_state_timeout):
+                yield b": keep-alive\n\n"
+
+    async def close(self) -> None:
+        """
+        Close the server when it is hosted by another server, e.g. rooms of
+        `HTTPRoomServer` in single process mode, and will not be used anymore.
+        Its log filter is removed, and streams of states end.
+        """
+        self._closed = True
+        logging.getLogger("uvicorn.access").removeFilter(self._log_filter)
+        await self._notify_state()
+
     def run(self, *argv, **kwargs):
         """
         A wrapper of uvicorn.run
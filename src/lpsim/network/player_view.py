@@ -0,0 +1,272 @@
+"""
+States of a match seen by one player. In the view of a player, hand cards,
+deck and deck information of the opponent are replaced by placeholders,
+requests of the opponent only keep their names, random state is cleared, and
+skill predictions are only kept when they are made for the player, with
+changes of hidden fields removed from their diffs. Actions and
+events about hand cards and deck of the opponent, in last action and event
+frames, only keep their types, and action info of such last action is cleared.
+Objects of trashbin from hand cards and deck of the opponent are replaced by
+placeholders.
+
+Views are built on snapshots of histories, and objects that are not hidden are
+shared with the snapshot, so diffs between views of two histories only visit
+changed objects, same as diffs between histories.
+"""
+from typing import Any, Dict, List, Tuple
+
+from ..server.action import ActionTypes
+from ..server.consts import ObjectPositionType
+from ..server.match import Match
+from ..server.snapshot import diff_snapshot, snapshot_to_dict
+
+
+# placeholder of hidden cards. The same object is used for all hidden cards,
+# so unchanged hidden cards are skipped when calculating diffs.
+HIDDEN_CARD: Dict[str, Any] = {"name": "HiddenCard"}
+
+
+def _hide_cards(cards: List[Any]) -> List[Dict[str, Any]]:
+    return [HIDDEN_CARD] * len(cards)
+
+
+def _hide_table(table: Any) -> Dict[str, Any]:
+    """
+    View of the table of the opponent.
+    """
+    view = dict(table.__dict__)
+    view["hands"] = _hide_cards(table.hands)
+    view["table_deck"] = _hide_cards(table.table_deck)
+    deck_information = dict(table.player_deck_information.__dict__)
+    deck_information["cards"] = _hide_cards(deck_information["cards"])
+    view["player_deck_information"] = deck_information
+    return view
+
+
+# areas of the opponent that are hidden.
+HIDDEN_AREAS = (ObjectPositionType.HAND, ObjectPositionType.DECK)
+# types of actions that move cards between hands and deck of their player.
+HIDDEN_CARD_ACTIONS = (
+    ActionTypes.DRAW_CARD,
+    ActionTypes.RESTORE_CARD,
+    ActionTypes.SWITCH_CARD,
+)
+# attribute names of positions in actions.
+ACTION_POSITION_NAMES = (
+    "position",
+    "object_position",
+    "target_position",
+    "card_position",
+)
+
+
+def _is_hidden_position(position: Any, player_idx: int) -> bool:
+    return position.player_idx != player_idx and position.area in HIDDEN_AREAS
+
+
+def _is_hidden_action(action: Any, player_idx: int) -> bool:
+    """
+    Whether the action is about hand cards or deck of the opponent, e.g.
+    creating cards in hands of the opponent, or drawing cards by the opponent.
+    """
+    if (
+        action.type in HIDDEN_CARD_ACTIONS
+        and getattr(action, "player_idx", player_idx) != player_idx
+    ):
+        return True
+    for name in ACTION_POSITION_NAMES:
+        position = getattr(action, name, None)
+        if position is not None and _is_hidden_position(position, player_idx):
+            return True
+    return False
+
+
+def _hide_action(action: Any, player_idx: int) -> Any:
+    """
+    View of an action or event arguments. Hidden ones only keep their types.
+    """
+    if action is None:
+        return None
+    target = getattr(action, "action", action)
+    if _is_hidden_action(target, player_idx):
+        return {"type": action.type}
+    return action
+
+
+# fields of the match that are removed from diffs of skill predictions. Random
+# state and requests are hidden in views, and last action, event frames and
+# trashbin may contain hand cards of the opponent.
+HIDDEN_PREDICTION_FIELDS = (
+    "random_state",
+    "requests",
+    "last_action",
+    "event_controller",
+    "trashbin",
+)
+# fields of the table of the opponent that are removed from diffs of skill
+# predictions.
+HIDDEN_PREDICTION_TABLE_FIELDS = ("hands", "table_deck", "player_deck_information")
+
+
+def _is_hidden_path(path: Any, player_idx: int) -> bool:
+    """
+    Whether a path of diff contains or is in hidden fields of the view.
+    """
+    if isinstance(path, str):
+        path = path.split(".") if path else []
+    if len(path) == 0:
+        return True
+    if path[0] in HIDDEN_PREDICTION_FIELDS:
+        return True
+    if path[0] == "player_tables":
+        if len(path) == 1:
+            return True
+        if str(path[1]) != str(player_idx):
+            return len(path) == 2 or path[2] in HIDDEN_PREDICTION_TABLE_FIELDS
+    return False
+
+
+def _hide_prediction_diff(diff: List[Tuple], player_idx: int) -> List[Tuple]:
+    """
+    Remove changes of hidden fields from diff of a skill prediction.
+    """
+    result: List[Tuple] = []
+    for action, path, values in diff:
+        if action == "change":
+            if not _is_hidden_path(path, player_idx):
+                result.append((action, path, values))
+            continue
+        # add and remove, values are list of keys and values under path
+        node = path.split(".") if isinstance(path, str) and path else path
+        values = [
+            x for x in values if not _is_hidden_path(list(node) + [x[0]], player_idx)
+        ]
+        if len(values) > 0:
+            result.append((action, path, values))
+    return result
+
+
+def _hide_event_controller(controller: Any, player_idx: int) -> Any:
+    """
+    View of the event controller. Frames without hidden events and actions are
+    shared with the controller.
+    """
+    frame_list: List[Any] = []
+    changed = False
+    for frame in controller.frame_list:
+        events = [_hide_action(x, player_idx) for x in frame.events]
+        processing_event = _hide_action(frame.processing_event, player_idx)
+        actions = [_hide_action(x, player_idx) for x in frame.triggered_actions]
+        if (
+            processing_event is frame.processing_event
+            and all(x is y for x, y in zip(events, frame.events))
+            and all(x is y for x, y in zip(actions, frame.triggered_actions))
+        ):
+            frame_list.append(frame)
+            continue
+        view = dict(frame.__dict__)
+        view["events"] = events
+        view["processing_event"] = processing_event
+        view["triggered_actions"] = actions
+        frame_list.append(view)
+        changed = True
+    if not changed:
+        return controller
+    view = dict(controller.__dict__)
+    view["frame_list"] = frame_list
+    return view
+
+
+def get_player_view(match: Match, player_idx: int) -> Dict[str, Any]:
+    """
+    Get the view of a player of a match. It is a dict of fields of the match,
+    and objects that are not hidden are shared with the match, so the match
+    should be a snapshot, or not modified while using the view. Use
+    `snapshot_to_dict` to convert it into the same form as `Match.dict()`.
+    """
+    view = dict(match.__dict__)
+    view["random_state"] = []
+    predictions = match.skill_predictions
+    if any(x["player_idx"] != player_idx for x in predictions):
+        view["skill_predictions"] = []
+    else:
+        view["skill_predictions"] = [
+            dict(x, diff=_hide_prediction_diff(x["diff"], player_idx))
+            for x in predictions
+        ]
+    view["requests"] = [
+        x
+        if x.player_idx == player_idx
+        else {"name": x.name, "player_idx": x.player_idx}
+        for x in match.requests
+    ]
+    view["player_tables"] = [
+        table if idx == player_idx else _hide_table(table)
+        for idx, table in enumerate(match.player_tables)
+    ]
+    last_action = _hide_action(match.last_action, player_idx)
+    if last_action is not match.last_action:
+        view["last_action"] = last_action
+        view["action_info"] = {}
+    view["event_controller"] = _hide_event_controller(
+        match.event_controller, player_idx
+    )
+    if any(_is_hidden_position(x.position, player_idx) for x in match.trashbin):
+        view["trashbin"] = [
+            HIDDEN_CARD if _is_hidden_position(x.position, player_idx) else x
+            for x in match.trashbin
+        ]
+    return view
+
+
+class PlayerViewRecorder:
+    """
+    Record views of a player of histories. It should be called with every
+    history when it is recorded, e.g. added into `Match._history_hooks`, as
+    histories may be compressed later.
+
+    Attributes:
+        player_idx (int): index of the player.
+        first (Dict | None): view of the first history.
+        diffs (List): diffs between views of histories, same as
+            `Match._history_diff`, the first one is None.
+    """
+
+    def __init__(self, player_idx: int):
+        self.player_idx = player_idx
+        self.first: Dict[str, Any] | None = None
+        self.diffs: List[List[Tuple] | None] = []
+        self._last: Dict[str, Any] | None = None
+
+    def __call__(self, match: Match, snapshot: Match) -> None:
+        self.record(snapshot)
+
+    def record(self, snapshot: Match) -> None:
+        """
+        Record the view of a new history.
+        """
+        view = get_player_view(snapshot, self.player_idx)
+        if self._last is None:
+            self.first = view
+            self.diffs.append(None)
+        else:
+            self.diffs.append(diff_snapshot(self._last, view))  # type: ignore
+        self._last = view
+
+    def truncate(self, number: int, last_history: Match) -> None:
+        """
+        Only keep views of the first number histories, used when match is
+        reset to a history. last_history is the history of index number - 1.
+        """
+        if number > len(self.diffs) or number <= 0:
+            raise ValueError("History not recorded.")
+        self.diffs = self.diffs[:number]
+        self._last = get_player_view(last_history, self.player_idx)
+
+    def get_full(self) -> Dict[str, Any]:
+        """
+        Get the first view in the same form as `Match.dict()`.
+        """
+        if self.first is None:
+            raise ValueError("No history recorded.")
+        return snapshot_to_dict(self.first)
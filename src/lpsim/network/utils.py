@@ -1,5 +1,5 @@
 import logging
-from typing import Any, List, Tuple
+from typing import Any, Callable, List, Tuple
 from ..server.event_handler import OmnipotentGuideEventHandler_3_3
 from ..server.match import Match, MatchConfig
 from ..server.deck import Deck
@@ -13,6 +13,7 @@ def get_new_match(
     history_level: int = 10,
     make_skill_prediction: bool = True,
     auto_step: bool = True,
+    history_hooks: List[Callable[[Match, Match], None]] = [],
 ) -> Tuple[Match, Any]:
     """
     Generate new match with given conditions.
@@ -32,6 +33,8 @@ def get_new_match(
         make_skill_prediction: If True, make skill prediction. Will have no
             effect when match_config is not None.
         auto_step: If True, auto step the match once.
+        history_hooks: Functions added to `Match._history_hooks` before the
+            match starts, so they are called for all histories.
     Returns:
         The generated match and its initial random state.
         If generate failed or error occurred, raise error.
@@ -52,6 +55,7 @@ def get_new_match(
         match.event_handlers.append(OmnipotentGuideEventHandler_3_3())
 
     random_state = match.random_state
+    match._history_hooks.extend(history_hooks)
 
     if len(decks) > 0:
         match.set_deck(decks)
@@ -0,0 +1,317 @@
+"""
+Replay logs saved by `HTTPServer.save_log` and verify them. After every step
+of the match, a fingerprint of the match state is calculated and rolled into
+a hash chain, so results of different engine versions can be compared and the
+first divergent step of each log can be found. Logs can be replayed across a
+process pool.
+
+Usage:
+    python -m lpsim.replay logs/ -o base.jsonl
+    python -m lpsim.replay logs/ -o new.jsonl --base base.jsonl
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from .utils import BaseModel
+from .server.match import Match, MatchState
+from .tools import read_log
+from .runner import init_worker
+
+
+class ReplayResult(BaseModel):
+    """
+    Result of replaying a log.
+
+    Attributes:
+        path (str): Path of the log.
+        command_number (int): Number of commands in the log.
+        fingerprints (List[str]): Rolling fingerprints after each step. The
+            first one is after the match starts, and others are after each
+            command is responded.
+        error (str | None): Error message when replay fails. Fingerprints
+            before the error are kept.
+        winner (int): Winner of the match, -1 if not decided.
+        round_number (int): Round number when replay ends.
+    """
+
+    path: str
+    command_number: int = 0
+    fingerprints: List[str] = []
+    error: str | None = None
+    winner: int = -1
+    round_number: int = 0
+
+
+def _object_state(obj: Any) -> Tuple[Any, ...]:
+    return (obj.name, getattr(obj, "usage", None))
+
+
+def state_fingerprint(match: Match) -> str:
+    """
+    Get a string that describes the visible state of the match, i.e. round,
+    requests, and characters, status, summons, supports, hand cards, deck size
+    and dice of both players. Ids of objects are not included, as they are
+    decided by time when objects are created.
+    """
+    tables: List[Tuple[Any, ...]] = []
+    for table in match.player_tables:
+        characters = tuple(
+            (
+                character.name,
+                character.hp,
+                character.max_hp,
+                character.charge,
+                character.is_alive,
+                tuple(x.value for x in character.element_application),
+                tuple(_object_state(x) for x in character.attaches),
+            )
+            for character in table.characters
+        )
+        tables.append(
+            (
+                table.active_character_idx,
+                table.has_round_ended,
+                table.arcane_legend,
+                tuple(x.value for x in table.dice.colors),
+                tuple(x.name for x in table.hands),
+                len(table.table_deck),
+                characters,
+                tuple(_object_state(x) for x in table.team_status),
+                tuple(_object_state(x) for x in table.summons),
+                tuple(_object_state(x) for x in table.supports),
+            )
+        )
+    requests = tuple((x.name, x.player_idx) for x in match.requests)
+    return repr(
+        (
+            match.round_number,
+            match.state.value,
+            match.current_player,
+            match.winner,
+            requests,
+            tuple(tables),
+        )
+    )
+
+
+def roll_fingerprint(previous: str, match: Match) -> str:
+    """
+    Roll the fingerprint of current state of the match into the previous
+    fingerprint. Two chains are same until the first different state.
+    """
+    data = (previous + state_fingerprint(match)).encode()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def replay_log(
+    log_str: str, path: str = "", match_version: str | None = None
+) -> ReplayResult:
+    """
+    Replay a log and record fingerprints after each step. Exceptions raised
+    during replay are caught and recorded in the result.
+
+    Args:
+        log_str (str): Log string saved by `HTTPServer.save_log`.
+        path (str): Path of the log, it is recorded in the result.
+        match_version (str | None): If set, use this version of match.
+    """
+    result = ReplayResult(path=path)
+    fingerprint = ""
+    try:
+        agents, match = read_log(log_str)
+        if match_version is not None:
+            match.version = match_version  # type: ignore
+        result.command_number = sum(len(agent.commands) for agent in agents)
+        success, error = match.start()
+        if not success:
+            raise ValueError(f"Match start failed: {error}")
+        match.step()
+        fingerprint = roll_fingerprint(fingerprint, match)
+        result.fingerprints.append(fingerprint)
+        while len(agents[0].commands) > 0 or len(agents[1].commands) > 0:
+            if match.state == MatchState.ERROR:
+                raise AssertionError("Match is in error state.")
+            if match.need_respond(0):
+                agent = agents[0]
+            elif match.need_respond(1):
+                agent = agents[1]
+            else:
+                raise AssertionError("No need respond.")
+            resp = agent.generate_response(match)
+            if resp is None:
+                raise AssertionError(f"Agent {agent.player_idx} gives no response.")
+            match.respond(resp)
+            match.step()
+            fingerprint = roll_fingerprint(fingerprint, match)
+            result.fingerprints.append(fingerprint)
+    except Exception as e:
+        logging.exception(f"Replay {path} failed.")
+        result.error = f"{e.__class__.__name__}: {e}"
+        return result
+    result.winner = match.winner
+    result.round_number = match.round_number
+    return result
+
+
+def replay_log_file(path: str, match_version: str | None = None) -> ReplayResult:
+    """
+    Replay a log file. Check `replay_log` for details.
+    """
+    with open(path, "r", encoding="utf8") as f:
+        log_str = f.read()
+    return replay_log(log_str, path, match_version)
+
+
+def _replay_log_file_args(args: Tuple[str, str | None]) -> ReplayResult:
+    return replay_log_file(*args)
+
+
+def find_log_paths(paths: Iterable[str]) -> List[str]:
+    """
+    Find log files. Files are used directly, and JSON files in directories are
+    found recursively.
+    """
+    result: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            result += sorted(
+                glob.glob(os.path.join(path, "**", "*.json"), recursive=True)
+            )
+        else:
+            result.append(path)
+    return result
+
+
+def replay_logs(
+    paths: Iterable[str],
+    match_version: str | None = None,
+    processes: int | None = 0,
+    chunksize: int = 1,
+    log_level: int = logging.WARNING,
+) -> Iterator[ReplayResult]:
+    """
+    Replay log files and yield their results. Results are yielded as soon as a
+    log is replayed, so their order may be different from paths when running
+    in process pool.
+
+    Args:
+        paths (Iterable[str]): Paths of log files.
+        match_version (str | None): If set, use this version of match.
+        processes (int | None): Number of worker processes. If 0, replay logs
+            in current process one by one. If None, use the number of CPUs.
+        chunksize (int): Number of logs sent to a worker at once.
+        log_level (int): Log level of worker processes.
+    """
+    args = [(path, match_version) for path in paths]
+    if processes == 0:
+        for arg in args:
+            yield _replay_log_file_args(arg)
+        return
+    with multiprocessing.Pool(
+        processes, initializer=init_worker, initargs=(log_level,)
+    ) as pool:
+        yield from pool.imap_unordered(_replay_log_file_args, args, chunksize)
+
+
+def find_divergence(base: ReplayResult, new: ReplayResult) -> int | None:
+    """
+    Find the first step where two results of the same log are different. If
+    one result stops earlier, e.g. by an error, the step after its last
+    fingerprint is divergent. Return None if two results are same.
+    """
+    for step, (x, y) in enumerate(zip(base.fingerprints, new.fingerprints)):
+        if x != y:
+            return step
+    if len(base.fingerprints) != len(new.fingerprints) or base.error != new.error:
+        return min(len(base.fingerprints), len(new.fingerprints))
+    return None
+
+
+def compare_replays(
+    base: Iterable[ReplayResult], new: Iterable[ReplayResult]
+) -> Dict[str, int]:
+    """
+    Compare results of two replays by paths of logs, and return first
+    divergent step of logs that are different. Logs that only exist in one
+    side are ignored.
+    """
+    base_dict = {x.path: x for x in base}
+    result: Dict[str, int] = {}
+    for new_result in new:
+        base_result = base_dict.get(new_result.path)
+        if base_result is None:
+            continue
+        step = find_divergence(base_result, new_result)
+        if step is not None:
+            result[new_result.path] = step
+    return result
+
+
+def load_results(path: str) -> List[ReplayResult]:
+    """
+    Load results saved in JSON lines.
+    """
+    with open(path, "r", encoding="utf8") as f:
+        return [ReplayResult(**json.loads(line)) for line in f if line.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m lpsim.replay",
+        description="Replay logs and compare state fingerprints.",
+    )
+    parser.add_argument("paths", nargs="+", help="log files or directories")
+    parser.add_argument("-o", "--output", help="path to save results in JSON lines")
+    parser.add_argument("--base", help="results of base version to compare")
+    parser.add_argument("--match-version", default=None)
+    parser.add_argument(
+        "--processes", type=int, default=None, help="default is number of CPUs"
+    )
+    parser.add_argument("--chunksize", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    paths = find_log_paths(args.paths)
+    results: List[ReplayResult] = []
+    output = None if args.output is None else open(args.output, "w", encoding="utf8")
+    try:
+        for result in replay_logs(
+            paths,
+            match_version=args.match_version,
+            processes=args.processes,
+            chunksize=args.chunksize,
+            log_level=logging.ERROR,
+        ):
+            results.append(result)
+            if output is not None:
+                output.write(result.json() + "\n")
+    finally:
+        if output is not None:
+            output.close()
+    errors = [x for x in results if x.error is not None]
+    for result in sorted(errors, key=lambda x: x.path):
+        logging.error(
+            f"Replay {result.path} failed at step {len(result.fingerprints)}: "
+            f"{result.error}"
+        )
+    logging.warning(f"{len(results)} logs replayed, {len(errors)} failed.")
+    divergences: Dict[str, int] = {}
+    if args.base is not None:
+        divergences = compare_replays(load_results(args.base), results)
+        for path, step in sorted(divergences.items()):
+            logging.error(f"Replay {path} diverges from base at step {step}.")
+        logging.warning(f"{len(divergences)} logs diverge from base.")
+    if len(errors) > 0 or len(divergences) > 0:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
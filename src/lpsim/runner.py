@@ -0,0 +1,191 @@
+"""
+Run many headless matches with agents, optionally across a process pool.
+Each match is described by a `MatchTask`, and its result is a compact
+`MatchResult`, which is easy to be collected and analyzed in batch.
+"""
+import logging
+import multiprocessing
+import random
+from typing import Any, Iterable, Iterator, List
+
+from .utils import BaseModel
+from .server.deck import Deck
+from .server.match import Match, MatchConfig, MatchState
+from .agents.random_agent import RandomAgent
+
+
+class MatchTask(BaseModel):
+    """
+    A match to run.
+
+    Attributes:
+        decks (List[Deck]): Decks of two players.
+        seed (int): Seed of the match. The random state of the match is
+            created from it, and when agents are not set, it is also used to
+            decide seeds of `RandomAgent`.
+        agents (List[Any] | None): Agents of two players. They should be
+            picklable when running in process pool, and will not be modified
+            as each task runs with its own copy. If None, two `RandomAgent`
+            are used.
+        config (MatchConfig | None): Config of the match. If None, use the
+            default config.
+        task_idx (int): Index of the task, will be returned in the result.
+    """
+
+    decks: List[Deck]
+    seed: int
+    agents: List[Any] | None = None
+    config: MatchConfig | None = None
+    task_idx: int = 0
+
+
+class MatchResult(BaseModel):
+    """
+    Result of a match.
+
+    Attributes:
+        task_idx (int): Index of the task.
+        seed (int): Seed of the match.
+        winner (int): Winner of the match. -1 means draw, and when error occurs,
+            it is also -1.
+        round_number (int): Round number when the match ends.
+        hps (List[List[int]]): Final hp of characters of two players.
+        error (str | None): Error message when the match ends with error.
+    """
+
+    task_idx: int
+    seed: int
+    winner: int = -1
+    round_number: int = 0
+    hps: List[List[int]] = []
+    error: str | None = None
+
+
+def _get_random_state(seed: int) -> List[Any]:
+    """
+    Get random state of match from seed.
+    """
+    state = random.Random(seed).getstate()
+    return [state[0], list(state[1]), state[2]]
+
+
+def run_match(task: MatchTask) -> MatchResult:
+    """
+    Run a match until it ends, and return its result. Exceptions raised during
+    the match are caught and recorded in the result.
+    """
+    result = MatchResult(task_idx=task.task_idx, seed=task.seed)
+    if task.agents is not None:
+        agents = [agent.copy(deep=True) for agent in task.agents]
+    else:
+        agent_seeds = random.Random(task.seed).sample(range(2**31 - 1), 2)
+        agents = [
+            RandomAgent(player_idx=idx, random_seed=agent_seeds[idx])
+            for idx in range(2)
+        ]
+    try:
+        match = Match(random_state=_get_random_state(task.seed))
+        if task.config is not None:
+            match.config = task.config.copy(deep=True)
+        match.set_deck(task.decks)
+        success, error = match.start()
+        if not success:
+            raise ValueError(f"Match start failed: {error}")
+        match.step()
+        while not match.is_game_end():
+            if match.state == MatchState.ERROR:
+                raise AssertionError("Match is in error state.")
+            if match.need_respond(0):
+                agent = agents[0]
+            elif match.need_respond(1):
+                agent = agents[1]
+            else:
+                raise AssertionError("No need respond.")
+            resp = agent.generate_response(match)
+            if resp is None:
+                raise AssertionError(f"Agent {agent.player_idx} gives no response.")
+            match.respond(resp)
+            match.step()
+    except Exception as e:
+        logging.exception(f"Task {task.task_idx} with seed {task.seed} failed.")
+        result.error = f"{e.__class__.__name__}: {e}"
+        return result
+    result.winner = match.winner
+    result.round_number = match.round_number
+    result.hps = [
+        [character.hp for character in table.characters]
+        for table in match.player_tables
+    ]
+    return result
+
+
+def init_worker(log_level: int) -> None:
+    """
+    Initialize a worker process of a process pool, e.g. used by `run_matches`
+    and `lpsim.replay.replay_logs`. All classes are registered when lpsim is
+    imported, and it is done once for each worker.
+    """
+    logging.basicConfig(level=log_level)
+    import lpsim.server  # noqa: F401
+
+
+def run_matches(
+    tasks: Iterable[MatchTask],
+    processes: int | None = 0,
+    chunksize: int = 1,
+    log_level: int = logging.WARNING,
+) -> Iterator[MatchResult]:
+    """
+    Run matches and yield their results. Results are yielded as soon as a match
+    ends, so their order may be different from tasks when running in process
+    pool. Use `task_idx` of results to find the task.
+
+    Args:
+        tasks (Iterable[MatchTask]): Tasks to run.
+        processes (int | None): Number of worker processes. If 0, run matches
+            in current process one by one. If None, use the number of CPUs.
+        chunksize (int): Number of tasks sent to a worker at once.
+        log_level (int): Log level of worker processes.
+    """
+    if processes == 0:
+        for task in tasks:
+            yield run_match(task)
+        return
+    with multiprocessing.Pool(
+        processes, initializer=init_worker, initargs=(log_level,)
+    ) as pool:
+        yield from pool.imap_unordered(run_match, tasks, chunksize)
+
+
+def make_tasks(
+    decks: List[Deck] | List[List[Deck]],
+    seeds: Iterable[int],
+    agents: List[Any] | None = None,
+    config: MatchConfig | None = None,
+) -> List[MatchTask]:
+    """
+    Make tasks of all combinations of deck pairs and seeds.
+
+    Args:
+        decks (List[Deck] | List[List[Deck]]): One deck pair, or a list of
+            deck pairs.
+        seeds (Iterable[int]): Seeds of matches.
+        agents (List[Any] | None): Agents used in all tasks.
+        config (MatchConfig | None): Config used in all tasks.
+    """
+    if len(decks) > 0 and isinstance(decks[0], Deck):
+        decks = [decks]  # type: ignore
+    seeds = list(seeds)
+    tasks: List[MatchTask] = []
+    for deck_pair in decks:
+        for seed in seeds:
+            tasks.append(
+                MatchTask(
+                    decks=deck_pair,  # type: ignore
+                    seed=seed,
+                    agents=agents,
+                    config=config,
+                    task_idx=len(tasks),
+                )
+            )
+    return tasks
@@ -1,6 +1,6 @@
 from enum import Enum
 from ..utils import BaseModel
-from typing import Literal, List, Tuple
+from typing import Dict, Literal, List, Tuple, Type
 from .interaction import (
     ChooseCharacterResponse,
     RerollDiceResponse,
@@ -557,3 +557,48 @@ Actions = (
     | GenerateSwitchCardRequestAction
     | SwitchCardAction
 )
+
+
+# Names of Match methods that act each type of action. `Match._act` finds the
+# method by the class of the action; subclasses of registered actions use the
+# method of their nearest registered parent class. New action classes, or
+# patches that change how an action is acted, should register by
+# `register_action_handler`.
+ACTION_HANDLERS: Dict[Type[ActionBase], str] = {
+    ChooseCharacterAction: "_action_choose_character",
+    CreateDiceAction: "_action_create_dice",
+    RemoveDiceAction: "_action_remove_dice",
+    RestoreCardAction: "_action_restore_card",
+    DrawCardAction: "_action_draw_card",
+    RemoveCardAction: "_action_remove_card",
+    SwitchCardAction: "_action_switch_card",
+    SwitchCharacterAction: "_action_switch_character",
+    DeclareRoundEndAction: "_action_declare_round_end",
+    ActionEndAction: "_action_action_end",
+    MakeDamageAction: "_action_make_damage",
+    ChargeAction: "_action_charge",
+    UseSkillAction: "_action_use_skill",
+    UseCardAction: "_action_use_card",
+    SkillEndAction: "_action_skill_end",
+    CharacterDefeatedAction: "_action_character_defeated",
+    CreateObjectAction: "_action_create_object",
+    CreateRandomObjectAction: "_action_create_random_object",
+    RemoveObjectAction: "_action_remove_object",
+    ChangeObjectUsageAction: "_action_change_object_usage",
+    MoveObjectAction: "_action_move_object",
+    ConsumeArcaneLegendAction: "_action_consume_arcane_legend",
+    GenerateChooseCharacterRequestAction: "_action_generate_choose_character_request",
+    GenerateRerollDiceRequestAction: "_action_generate_reroll_dice_request",
+    SkipPlayerActionAction: "_action_skip_player_action",
+    CharacterReviveAction: "_action_character_revive",
+    GenerateSwitchCardRequestAction: "_action_generate_switch_card_request",
+}
+
+
+def register_action_handler(action_class: Type[ActionBase], method_name: str) -> None:
+    """
+    Register the name of Match method that acts `action_class`. The method
+    receives the action, and returns a list of triggered event arguments.
+    Registering an existing action class will replace its method.
+    """
+    ACTION_HANDLERS[action_class] = method_name
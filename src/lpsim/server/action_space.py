@@ -0,0 +1,320 @@
+"""
+Flat integer action space of a match, for agents that search or learn.
+
+Every legal move of a player is encoded as one integer. Actions are grouped
+into blocks by the name of the request they respond to, and blocks are placed
+one after another in the order of `ACTION_BLOCK_NAMES`, so the encoding of a
+move only depends on the layout decided by `ActionSpace`, not on the current
+state. Dice used to pay costs are not part of the action, they are chosen by
+a dice policy when the action is applied.
+
+Encoding inside each block:
+- `DeclareRoundEndRequest`: one action.
+- `SwitchCharacterRequest`: index of target character.
+- `UseSkillRequest`: index of skill of the active character.
+- `UseCardRequest`: `card_idx * card_target_number + target_idx`, where
+    `target_idx` is the index in `targets` of the request, and is 0 for cards
+    without targets.
+- `ElementalTuningRequest`: index of the tuned card.
+- `ChooseCharacterRequest`: index of the character.
+- `RerollDiceRequest`: bit mask of die colors in the order of `DieColor`, all
+    dice whose colors are in the mask are rerolled.
+- `SwitchCardRequest`: bit mask of indices of cards to switch.
+"""
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..utils import BaseModel
+from .consts import ELEMENT_TO_DIE_COLOR, DieColor
+from .struct import DIE_COLOR_IDX, DIE_COLOR_NUMBER, OMNI_IDX
+from .interaction import (
+    ChooseCharacterRequest,
+    ChooseCharacterResponse,
+    DeclareRoundEndRequest,
+    DeclareRoundEndResponse,
+    ElementalTuningRequest,
+    ElementalTuningResponse,
+    RerollDiceRequest,
+    RerollDiceResponse,
+    Requests,
+    Responses,
+    SwitchCardRequest,
+    SwitchCardResponse,
+    SwitchCharacterRequest,
+    SwitchCharacterResponse,
+    UseCardRequest,
+    UseCardResponse,
+    UseSkillRequest,
+    UseSkillResponse,
+)
+
+
+ACTION_BLOCK_NAMES: List[str] = [
+    "DeclareRoundEndRequest",
+    "SwitchCharacterRequest",
+    "UseSkillRequest",
+    "UseCardRequest",
+    "ElementalTuningRequest",
+    "ChooseCharacterRequest",
+    "RerollDiceRequest",
+    "SwitchCardRequest",
+]
+
+DIE_COLOR_BITS: Dict[DieColor, int] = {
+    color: 1 << idx for color, idx in DIE_COLOR_IDX.items()
+}
+
+# Receives the match and a request with cost, and returns indices of dice to
+# pay the cost. For `ElementalTuningRequest`, returns index of the tuned die.
+DicePolicy = Callable[[Any, Requests], List[int]]
+
+
+def _dice_values(match: Any, player_idx: int) -> List[int]:
+    """
+    Value of dice colors for a player, indexed by `DIE_COLOR_IDX`. Higher
+    value dice are kept as long as possible. Omni is the most valuable, then
+    color of the active character, then colors of other alive characters.
+    """
+    values = [0] * DIE_COLOR_NUMBER
+    values[OMNI_IDX] = 3
+    table = match.player_tables[player_idx]
+    for cidx, character in enumerate(table.characters):
+        if character.is_defeated:
+            continue
+        color_idx = DIE_COLOR_IDX[ELEMENT_TO_DIE_COLOR[character.element]]
+        value = 2 if cidx == table.active_character_idx else 1
+        values[color_idx] = max(values[color_idx], value)
+    return values
+
+
+def default_dice_policy(match: Any, request: Requests) -> List[int]:
+    """
+    Default dice policy. Pay costs with least valuable dice selected by
+    `Cost.select_dice`, and only use omni dice when dice of the needed color
+    are not enough. For elemental tuning, tune the least valuable die.
+    """
+    values = _dice_values(match, request.player_idx)
+    dice = match.player_tables[request.player_idx].dice
+    assert dice.colors == request.dice_colors  # type: ignore
+    if isinstance(request, ElementalTuningRequest):
+        return [
+            min(
+                request.dice_idxs,
+                key=lambda x: (values[DIE_COLOR_IDX[dice.colors[x]]], x),
+            )
+        ]
+    selected = request.cost.select_dice(dice.counts, values)  # type: ignore
+    if selected is None:
+        raise ValueError("Not enough dice to pay the cost.")
+    return dice.counts_to_idx(selected)
+
+
+class ActionSpace(BaseModel):
+    """
+    Layout of the flat integer action space. Matches with the same layout
+    share the same encoding of actions.
+
+    Attributes:
+        hand_size (int): Maximum number of hand cards.
+        character_number (int): Maximum number of characters of a player.
+        skill_number (int): Maximum number of skills of a character.
+        card_target_number (int): Maximum number of targets of a card.
+    """
+
+    hand_size: int = 10
+    character_number: int = 3
+    skill_number: int = 5
+    card_target_number: int = 16
+
+    @staticmethod
+    def from_config(config: Any) -> "ActionSpace":
+        """
+        Create action space from `MatchConfig`.
+        """
+        character_number = config.character_number
+        if character_number is None:
+            character_number = 3
+        return ActionSpace(
+            hand_size=config.max_hand_size, character_number=character_number
+        )
+
+    def block_sizes(self) -> Dict[str, int]:
+        """
+        Return number of actions of each block.
+        """
+        return {
+            "DeclareRoundEndRequest": 1,
+            "SwitchCharacterRequest": self.character_number,
+            "UseSkillRequest": self.skill_number,
+            "UseCardRequest": self.hand_size * self.card_target_number,
+            "ElementalTuningRequest": self.hand_size,
+            "ChooseCharacterRequest": self.character_number,
+            "RerollDiceRequest": 1 << len(DIE_COLOR_BITS),
+            "SwitchCardRequest": 1 << self.hand_size,
+        }
+
+    def block_offsets(self) -> Dict[str, int]:
+        """
+        Return the first action of each block.
+        """
+        offsets: Dict[str, int] = {}
+        offset = 0
+        sizes = self.block_sizes()
+        for name in ACTION_BLOCK_NAMES:
+            offsets[name] = offset
+            offset += sizes[name]
+        return offsets
+
+    @property
+    def size(self) -> int:
+        """
+        Total number of actions.
+        """
+        return sum(self.block_sizes().values())
+
+    def decode(self, action: int) -> Tuple[str, int]:
+        """
+        Decode an action into the request name and the index inside its block.
+        """
+        if action >= 0:
+            sizes = self.block_sizes()
+            for name in ACTION_BLOCK_NAMES:
+                if action < sizes[name]:
+                    return name, action
+                action -= sizes[name]
+        raise ValueError(f"Action {action} out of range.")
+
+    def _check_range(self, value: int, maximum: int, label: str) -> int:
+        if value >= maximum:
+            raise ValueError(f"{label} {value} exceeds action space limit {maximum}.")
+        return value
+
+    def legal_actions(self, requests: List[Requests], player_idx: int) -> List[int]:
+        """
+        Encode all moves that respond to requests of the player, in ascending
+        order.
+        """
+        offsets = self.block_offsets()
+        actions: List[int] = []
+        for req in requests:
+            if req.player_idx != player_idx:
+                continue
+            offset = offsets[req.name]
+            if isinstance(req, DeclareRoundEndRequest):
+                actions.append(offset)
+            elif isinstance(req, SwitchCharacterRequest):
+                idx = self._check_range(
+                    req.target_character_idx, self.character_number, "Character"
+                )
+                actions.append(offset + idx)
+            elif isinstance(req, UseSkillRequest):
+                idx = self._check_range(req.skill_idx, self.skill_number, "Skill")
+                actions.append(offset + idx)
+            elif isinstance(req, UseCardRequest):
+                idx = self._check_range(req.card_idx, self.hand_size, "Card")
+                target_number = self._check_range(
+                    len(req.targets), self.card_target_number + 1, "Target number"
+                )
+                offset += idx * self.card_target_number
+                actions += range(offset, offset + max(target_number, 1))
+            elif isinstance(req, ElementalTuningRequest):
+                for idx in req.card_idxs:
+                    idx = self._check_range(idx, self.hand_size, "Card")
+                    actions.append(offset + idx)
+            elif isinstance(req, ChooseCharacterRequest):
+                for idx in req.available_character_idxs:
+                    idx = self._check_range(idx, self.character_number, "Character")
+                    actions.append(offset + idx)
+            elif isinstance(req, RerollDiceRequest):
+                present = 0
+                for color in req.colors:
+                    present |= DIE_COLOR_BITS[color]
+                # all subsets of colors that player has
+                mask = present
+                while True:
+                    actions.append(offset + mask)
+                    if mask == 0:
+                        break
+                    mask = (mask - 1) & present
+            elif isinstance(req, SwitchCardRequest):
+                number = self._check_range(
+                    len(req.card_names), self.hand_size + 1, "Card number"
+                )
+                for mask in range(1 << number):
+                    if bin(mask).count("1") <= req.maximum_switch_number:
+                        actions.append(offset + mask)
+            else:
+                raise AssertionError(f"Request type {type(req)} not recognized.")
+        actions.sort()
+        return actions
+
+    def make_response(
+        self,
+        match: Any,
+        action: int,
+        player_idx: int,
+        dice_policy: DicePolicy = default_dice_policy,
+    ) -> Responses:
+        """
+        Make the response of an action of the player. The response is created
+        without validation, and if the action is not legal, raise ValueError.
+        """
+        name, idx = self.decode(action)
+        for req in match.requests:
+            if req.player_idx != player_idx or req.name != name:
+                continue
+            if isinstance(req, DeclareRoundEndRequest):
+                return DeclareRoundEndResponse.construct(request=req)
+            elif isinstance(req, SwitchCharacterRequest):
+                if req.target_character_idx == idx:
+                    return SwitchCharacterResponse.construct(
+                        request=req, dice_idxs=dice_policy(match, req)
+                    )
+            elif isinstance(req, UseSkillRequest):
+                if req.skill_idx == idx:
+                    return UseSkillResponse.construct(
+                        request=req, dice_idxs=dice_policy(match, req)
+                    )
+            elif isinstance(req, UseCardRequest):
+                card_idx, target_idx = divmod(idx, self.card_target_number)
+                if req.card_idx != card_idx:
+                    continue
+                if target_idx >= max(len(req.targets), 1):
+                    break
+                target = None
+                if len(req.targets):
+                    target = req.targets[target_idx]
+                return UseCardResponse.construct(
+                    request=req, dice_idxs=dice_policy(match, req), target=target
+                )
+            elif isinstance(req, ElementalTuningRequest):
+                if idx in req.card_idxs:
+                    return ElementalTuningResponse.construct(
+                        request=req, dice_idx=dice_policy(match, req)[0], card_idx=idx
+                    )
+            elif isinstance(req, ChooseCharacterRequest):
+                if idx in req.available_character_idxs:
+                    return ChooseCharacterResponse.construct(
+                        request=req, character_idx=idx
+                    )
+            elif isinstance(req, RerollDiceRequest):
+                dice_idxs: List[int] = []
+                present = 0
+                for didx, color in enumerate(req.colors):
+                    present |= DIE_COLOR_BITS[color]
+                    if idx & DIE_COLOR_BITS[color]:
+                        dice_idxs.append(didx)
+                if idx & ~present == 0:
+                    return RerollDiceResponse.construct(
+                        request=req, reroll_dice_idxs=dice_idxs
+                    )
+            elif isinstance(req, SwitchCardRequest):
+                card_idxs = [
+                    cidx for cidx in range(len(req.card_names)) if idx >> cidx & 1
+                ]
+                if idx < 1 << len(req.card_names) and (
+                    len(card_idxs) <= req.maximum_switch_number
+                ):
+                    return SwitchCardResponse.construct(
+                        request=req, card_idxs=card_idxs
+                    )
+        raise ValueError(f"Action {action} is not legal.")
@@ -0,0 +1,70 @@
+"""
+Counter-based random generator. The n-th random number is decided only by the
+seed and n, so the whole state of the generator is a seed and a counter, which
+is much smaller than states of Mersenne Twister, and is cheap to save, copy
+and compare.
+"""
+from typing import Any, List
+
+
+_MASK = (1 << 64) - 1
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+# first element of random state of match that uses counter-based generator
+COUNTER_RANDOM_STATE_NAME = "COUNTER"
+
+
+def _mix64(z: int) -> int:
+    """
+    Output function of SplitMix64.
+    """
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+class CounterRandom:
+    """
+    Counter-based random generator based on SplitMix64. The n-th output is
+    `mix64(seed + n * gamma)`, and every random number consumes one counter.
+
+    Args:
+        seed (int): Seed of the generator.
+        counter (int): Number of random numbers that have been generated.
+    """
+
+    def __init__(self, seed: int, counter: int = 0):
+        self.seed = seed
+        self.counter = counter
+
+    def _next(self) -> int:
+        self.counter += 1
+        return _mix64((self.seed + self.counter * _GOLDEN_GAMMA) & _MASK)
+
+    def random(self) -> float:
+        """
+        Return a random float in [0, 1).
+        """
+        return (self._next() >> 11) * (1.0 / (1 << 53))
+
+    def shuffle(self, array: List[Any]) -> None:
+        """
+        Shuffle the array in place with Fisher-Yates algorithm.
+        """
+        for i in reversed(range(1, len(array))):
+            j = self._next() % (i + 1)
+            array[i], array[j] = array[j], array[i]
+
+    def get_state(self) -> List[Any]:
+        """
+        Get random state that can be saved in `Match.random_state`.
+        """
+        return [COUNTER_RANDOM_STATE_NAME, self.seed, self.counter]
+
+
+def get_counter_random_state(seed: int) -> List[Any]:
+    """
+    Get initial random state of match that uses counter-based generator with
+    the seed.
+    """
+    return CounterRandom(seed).get_state()
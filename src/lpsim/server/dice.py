@@ -1,6 +1,13 @@
-from typing import List, Literal
+from typing import Any, List, Literal
 
-from .struct import ObjectPosition
+from pydantic import PrivateAttr
+
+from .struct import (
+    DIE_COLOR_IDX,
+    DIE_COLOR_NUMBER,
+    ObjectPosition,
+    count_dice_colors,
+)
 from .consts import DieColor, ObjectPositionType
 from .object_base import ObjectBase, ObjectType
 
@@ -9,6 +16,12 @@ class Dice(ObjectBase):
     """
     Class representing dice.
 
+    Besides the list of colors, dice keep number of dice of each color, which
+    is indexed by `DIE_COLOR_IDX` and used to check and pay costs. Dice should
+    be modified by `add`, `remove`, `clear` and `sort`, which keep the counts
+    updated. When `colors` is modified in other ways, counts are recounted
+    when used, as they also keep the colors they are counted from.
+
     Attributes:
         colors: list of colors of dice.
     """
@@ -22,6 +35,80 @@ class Dice(ObjectBase):
     type: Literal[ObjectType.DICE] = ObjectType.DICE
     colors: List[DieColor] = []
 
+    # number of dice of each color, and a copy of colors that it is counted
+    # from. They are never modified in-place, as they may be shared with copies
+    # and snapshots.
+    _counts: Any = PrivateAttr(None)
+    _counted_colors: Any = PrivateAttr(None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "colors":
+            self._counts = None
+
+    @property
+    def counts(self) -> List[int]:
+        """
+        Number of dice of each color, indexed by `DIE_COLOR_IDX`. The returned
+        list should not be modified.
+        """
+        counts = self._counts
+        if counts is None or self._counted_colors != self.colors:
+            counts = count_dice_colors(self.colors)
+            self._set_counts(counts)
+        return counts
+
+    def _set_counts(self, counts: List[int]) -> None:
+        """
+        Set counts of current colors.
+        """
+        self._counts = counts
+        self._counted_colors = list(self.colors)
+
+    def add(self, colors: List[DieColor]) -> None:
+        """
+        Add dice to the end of dice.
+        """
+        counts = list(self.counts)
+        for color in colors:
+            counts[DIE_COLOR_IDX[color]] += 1
+        self.colors.extend(colors)
+        self._set_counts(counts)
+
+    def remove(self, dice_idxs: List[int]) -> List[DieColor]:
+        """
+        Remove dice by indices, and return removed colors in descending order
+        of indices.
+        """
+        counts = list(self.counts)
+        removed: List[DieColor] = []
+        for idx in sorted(dice_idxs, reverse=True):
+            color = self.colors.pop(idx)
+            counts[DIE_COLOR_IDX[color]] -= 1
+            removed.append(color)
+        self._set_counts(counts)
+        return removed
+
+    def clear(self) -> None:
+        """
+        Remove all dice.
+        """
+        self.colors.clear()
+        self._set_counts([0] * DIE_COLOR_NUMBER)
+
+    def sort(self, order: List[DieColor]) -> None:
+        """
+        Sort dice by the order of colors. As dice of same color are the same,
+        dice are rebuilt from their counts.
+        """
+        counts = self.counts
+        colors: List[DieColor] = []
+        for color in order:
+            colors += [color] * counts[DIE_COLOR_IDX[color]]
+        assert len(colors) == len(self.colors), "Dice color not in order."
+        self.colors[:] = colors
+        self._set_counts(counts)
+
     def colors_to_idx(self, colors: List[DieColor]) -> List[int]:
         """
         Convert colors to idx.
@@ -32,3 +119,18 @@ class Dice(ObjectBase):
             res.append(all_c.index(x))
             all_c[all_c.index(x)] = None
         return res
+
+    def counts_to_idx(self, counts: List[int]) -> List[int]:
+        """
+        Convert number of dice of each color, e.g. result of
+        `Cost.select_dice`, to sorted indices of dice.
+        """
+        remain = list(counts)
+        res: List[int] = []
+        for idx, color in enumerate(self.colors):
+            color_idx = DIE_COLOR_IDX[color]
+            if remain[color_idx] > 0:
+                remain[color_idx] -= 1
+                res.append(idx)
+        assert not any(remain), "Dice are not enough."
+        return res
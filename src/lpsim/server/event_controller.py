@@ -6,6 +6,7 @@ from .event import EventArguments
 from .action import Actions
 from .struct import ObjectPosition
 from ..utils import BaseModel
+from ..utils.class_registry import has_event_handler
 
 
 class EventFrame(BaseModel):
@@ -112,19 +113,19 @@ class EventController(BaseModel):
         """
         event_arg = event_frame.events.pop(0)
         event_frame.processing_event = event_arg
-        object_list = match.get_object_list()
+        event_name = event_arg.type.name
+        # only objects that have the handler are in subscribers
+        object_list = list(match._get_subscribers(f"event_handler_{event_name}"))
         # add object in trashbin to list
         for obj in match.trashbin:
             if event_arg.type in obj.available_handler_in_trashbin:
                 object_list.append(obj)
-        handler_name = f"event_handler_{event_arg.type.name}"
         for obj in object_list:
             # for deck objects, check availability
             if obj.position.area == ObjectPositionType.DECK:
                 if event_arg.type not in obj.available_handler_in_deck:
                     continue
-            func = getattr(obj, handler_name, None)
-            if func is not None:
+            if has_event_handler(obj, event_name):
                 event_frame.triggered_objects.append(obj.position)
 
     def stack_event(self, event_arg: EventArguments) -> EventFrame:
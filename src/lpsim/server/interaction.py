@@ -1,5 +1,5 @@
 from ..utils import BaseModel, list_unique_range_right
-from typing import Literal, List, Any
+from typing import Dict, Literal, List, Any, Type
 from .consts import DieColor
 from .struct import Cost, MultipleObjectPosition, ObjectPosition
 
@@ -277,3 +277,28 @@ Responses = (
     | UseSkillResponse
     | UseCardResponse
 )
+
+# Names of Match methods that deal with each type of response. `Match.respond`
+# finds the method by the class of the response, and subclasses use the method
+# of their nearest registered parent class. New response classes should
+# register by `register_response_handler`.
+RESPONSE_HANDLERS: Dict[Type[ResponseBase], str] = {
+    SwitchCharacterResponse: "_respond_switch_character",
+    ElementalTuningResponse: "_respond_elemental_tuning",
+    DeclareRoundEndResponse: "_respond_declare_round_end",
+    UseSkillResponse: "_respond_use_skill",
+    UseCardResponse: "_respond_use_card",
+    SwitchCardResponse: "_respond_switch_card",
+    ChooseCharacterResponse: "_respond_choose_character",
+    RerollDiceResponse: "_respond_reroll_dice",
+}
+
+
+def register_response_handler(
+    response_class: Type[ResponseBase], method_name: str
+) -> None:
+    """
+    Register the name of Match method that deals with `response_class`.
+    Registering an existing response class will replace its method.
+    """
+    RESPONSE_HANDLERS[response_class] = method_name
@@ -1,8 +1,10 @@
 import os
 import logging
 import copy
+import operator
 import random
-from typing import Literal, List, Any, Dict, Tuple
+import time
+from typing import Callable, Literal, List, Any, Dict, Tuple, Type
 from enum import Enum
 from pydantic import PrivateAttr, validator
 import dictdiffer
@@ -12,9 +14,15 @@ from .summon.base import SummonBase
 from .status.team_status.base import TeamStatusBase
 from .status.character_status.base import CharacterStatusBase
 from ..utils import BaseModel, get_instance
+from ..utils.class_registry import (
+    has_event_handler,
+    has_value_modifier,
+    register_handlers,
+)
 from .deck import Deck
 from .player_table import PlayerTable
 from .action import (
+    ACTION_HANDLERS,
     ActionBase,
     ActionTypes,
     Actions,
@@ -47,6 +55,7 @@ from .action import (
     SwitchCardAction,
 )
 from .interaction import (
+    RESPONSE_HANDLERS,
     Requests,
     Responses,
     SwitchCardRequest,
@@ -130,6 +139,15 @@ from .elemental_reaction import (
     apply_elemental_reaction,
 )
 from .event_handler import SystemEventHandlerBase, SystemEventHandler
+from .snapshot import (
+    Checkpoint,
+    SnapshotCache,
+    collect_models,
+    diff_snapshot,
+    same_snapshot,
+)
+from .counter_random import COUNTER_RANDOM_STATE_NAME, CounterRandom
+from .action_space import ActionSpace, DicePolicy, default_dice_policy
 
 
 try:
@@ -141,6 +159,102 @@ except ImportError:  # pragma: no cover
     pass
 
 
+# Match methods of actions that keep subscriber index updated by themselves, by
+# dropping slots of objects they add, remove or move. Methods of other actions,
+# e.g. registered by `register_action_handler`, may change objects freely, and
+# the whole subscriber index is dropped before they are called.
+INDEX_MAINTAINED_ACTION_METHODS = frozenset(
+    [
+        "_action_choose_character",
+        "_action_create_dice",
+        "_action_remove_dice",
+        "_action_restore_card",
+        "_action_draw_card",
+        "_action_remove_card",
+        "_action_switch_card",
+        "_action_switch_character",
+        "_action_declare_round_end",
+        "_action_action_end",
+        "_action_make_damage",
+        "_action_charge",
+        "_action_use_skill",
+        "_action_use_card",
+        "_action_skill_end",
+        "_action_character_defeated",
+        "_action_create_object",
+        "_action_create_random_object",
+        "_action_remove_object",
+        "_action_change_object_usage",
+        "_action_move_object",
+        "_action_consume_arcane_legend",
+        "_action_generate_choose_character_request",
+        "_action_generate_reroll_dice_request",
+        "_action_skip_player_action",
+        "_action_character_revive",
+        "_action_generate_switch_card_request",
+    ]
+)
+
+
+def _get_handler_name(handlers: Dict[Type, str], obj: Any) -> str | None:
+    """
+    Get handler method name of obj from handler table. When the class of obj is
+    not registered, use the nearest registered parent class.
+    """
+    for cls in type(obj).__mro__:
+        name = handlers.get(cls)
+        if name is not None:
+            return name
+    return None
+
+
+# areas that objects are found by Match._get_indexed_object, and the attribute
+# names of PlayerTable to find objects of the area, in the order of linear scan.
+INDEXED_AREAS = {
+    ObjectPositionType.TEAM_STATUS: ["team_status"],
+    ObjectPositionType.SUMMON: ["summons"],
+    ObjectPositionType.SUPPORT: ["supports"],
+    ObjectPositionType.HAND: ["using_hand", "hands"],
+    ObjectPositionType.DECK: ["table_deck"],
+    ObjectPositionType.SYSTEM: [],
+}
+
+
+# attribute names of PlayerTable of subscriber slots that are not characters,
+# in the order of `PlayerTable.get_object_lists`. Hand slot also contains the
+# using hand, which is before hands.
+SUBSCRIBER_SLOT_ATTRS = {
+    ObjectPositionType.TEAM_STATUS: "team_status",
+    ObjectPositionType.SUMMON: "summons",
+    ObjectPositionType.SUPPORT: "supports",
+    ObjectPositionType.HAND: "hands",
+    ObjectPositionType.DECK: "table_deck",
+}
+
+
+# private attributes of Match that are not copied by Match.copy, and the
+# factories of their values in the copied match.
+COPY_EXCLUDED_PRIVATE: Dict[str, Callable[[], Any]] = {
+    "_snapshot_cache": lambda: None,
+    "_subscriber_index": dict,
+    "_object_index": dict,
+    "_object_index_misses": dict,
+    "_action_hooks": list,
+    "_history_hooks": list,
+    "_skill_prediction_cache": lambda: None,
+}
+
+
+# fields of Match that do not affect skill predictions. Requests are generated
+# from the match before prediction, and predictions are results themselves.
+SKILL_PREDICTION_IGNORED_FIELDS = {"requests", "skill_predictions"}
+
+
+# private attributes of Match that keep histories. Histories are read-only, and
+# they are shared by Match.fast_clone.
+HISTORY_PRIVATE: List[str] = ["_history", "_history_diff", "_history_keyframes"]
+
+
 class MatchState(str, Enum):
     """
     Enum representing the state of a match.
@@ -242,11 +356,18 @@ class MatchConfig(BaseModel):
     recorded. When compressed, it will consume less memory, but it will take
     more time in calling Match.new_match_from_history.
 
+    When compressed, every history_keyframe_interval histories will be kept as
+    keyframes, so Match.new_match_from_history only needs to apply at most
+    history_keyframe_interval - 1 diffs on the nearest keyframe. As histories
+    share unchanged objects, keyframes cost little memory. If it is 0, only
+    the first history is used as keyframe.
+
     NOTE: It is slow to save history, normally should not use it in
     non-frontend tasks.
     """
     history_level: int = 0
     compress_history: bool = True
+    history_keyframe_interval: int = 20
 
     """
     config that used to re-create the match easier. when replay mode is 
@@ -309,6 +430,9 @@ class MatchConfig(BaseModel):
         if self.history_level < 0:
             logging.error("history level should not be less than 0")
             return False
+        if self.history_keyframe_interval < 0:
+            logging.error("history keyframe interval should not be less than 0")
+            return False
         return True
 
 
@@ -333,6 +457,13 @@ class Match(BaseModel):
     """
     _history: List["Match"] = PrivateAttr(default_factory=list)
     _history_diff: List = PrivateAttr(default_factory=list)
+    # when history is compressed, keyframes of histories. key is the index of
+    # history_diff, and value is the history at the index.
+    _history_keyframes: Dict[int, "Match"] = PrivateAttr(default_factory=dict)
+
+    # frozen nodes of last snapshot, used to share unchanged objects between
+    # snapshots. check Match.snapshot for details.
+    _snapshot_cache: SnapshotCache | None = PrivateAttr(None)
     last_action: Actions = ActionBase()
     action_info: Any = {}
 
@@ -342,10 +473,20 @@ class Match(BaseModel):
     # some functions.
     _prediction_mode: bool = PrivateAttr(False)
     skill_predictions: List[Any] = []
-
-    # random state
+    # player idx, snapshot and results of last prediction. When the snapshot is
+    # same as current one, results are reused.
+    _skill_prediction_cache: Any = PrivateAttr(None)
+
+    # random state. It can be states of `random.Random`, `np.random.RandomState`,
+    # or `CounterRandom` which is `["COUNTER", seed, counter]`. It is saved
+    # lazily: after random functions are called, it is only updated when match
+    # is exported, copied or snapshotted, and `_random_state_dirty` marks it is
+    # outdated. As histories are snapshots, they keep the full state of
+    # `random.Random` and `np.random.RandomState` after random calls; use
+    # `CounterRandom` to keep histories and their diffs small.
     random_state: List[Any] = []
     _random_state: Any = PrivateAttr(None)
+    _random_state_dirty: bool = PrivateAttr(False)
 
     # event handlers to implement special rules.
     event_handlers: List[SystemEventHandlerBase] = [
@@ -366,6 +507,52 @@ class Match(BaseModel):
     _debug_save_appeared_object_names: bool = PrivateAttr(False)
     _debug_appeared_object_names_versions: Any = PrivateAttr({})
     _debug_save_file_name: str = PrivateAttr("")
+    # when set, diffs of histories and skill predictions are cross-checked with
+    # dictdiffer results.
+    _debug_check_history_diff: bool = PrivateAttr(False)
+    # when set, object indices are cross-checked with linear scan results. It
+    # can also be enabled by setting environment variable LPSIM_DEBUG_CHECK_INDEX.
+    _debug_check_index: bool = PrivateAttr(
+        default_factory=lambda: os.getenv("LPSIM_DEBUG_CHECK_INDEX") is not None
+    )
+
+    # live index of objects that have event handlers or value modifiers, split
+    # into slots of (player_idx, area, character_idx). Value of a slot is the
+    # objects of the slot when it is built, and a dict from handler name to the
+    # ordered objects of the slot that have the handler. Slots are dropped by
+    # actions that change their objects, and rebuilt when used.
+    # check Match._get_subscribers for details.
+    _subscriber_index: Dict[
+        Tuple[int, ObjectPositionType, int],
+        Tuple[Tuple[ObjectBase, ...], Dict[str, List[ObjectBase]]],
+    ] = PrivateAttr(default_factory=dict)
+
+    # index of objects by (player_idx, area, id), value is the attribute name of
+    # the list that contains the object, its index in the list and the object.
+    # Entries are verified when used, and the index is rebuilt when verification
+    # fails. check Match._get_indexed_object for details.
+    _object_index: Dict[
+        Tuple[int, ObjectPositionType, int], Tuple[str, int, Any]
+    ] = PrivateAttr(default_factory=dict)
+    # keys not found in object index, value is the sizes of object lists of the
+    # area when not found. They are dropped with subscriber slots of the area.
+    _object_index_misses: Dict[
+        Tuple[int, ObjectPositionType, int], Tuple[int, ...]
+    ] = PrivateAttr(default_factory=dict)
+
+    # number of acted actions of each action type.
+    _action_counts: Dict[str, int] = PrivateAttr(default_factory=dict)
+    # functions called after each action is acted, with arguments of the match,
+    # the action and the time used to act it in seconds. They are not copied.
+    _action_hooks: List[Callable[["Match", ActionBase, float], None]] = PrivateAttr(
+        default_factory=list
+    )
+    # functions called after a history is recorded, with arguments of the match
+    # and the snapshot of the history. They are called even if histories are
+    # compressed, and they are not copied.
+    _history_hooks: List[Callable[["Match", "Match"], None]] = PrivateAttr(
+        default_factory=list
+    )
 
     # In event chain, all removed objects will firstly move to the trashbin.
     # If some object explicitly claims that some event handlers will work in
@@ -419,17 +606,26 @@ class Match(BaseModel):
         if len(history_diff) <= history_idx or history_idx < 0:
             raise AssertionError("State not found")
         if self.config.compress_history:
-            # calculate the target history
-            target_history_dict = history[0].dict()
-            for diff in history_diff[1 : history_idx + 1]:
-                diff = copy.deepcopy(diff)
-                dictdiffer.patch(diff, target_history_dict, in_place=True)
-            target_history = Match(**target_history_dict)
+            # find the nearest keyframe, and calculate the target history
+            keyframes = {
+                k: v for k, v in self._history_keyframes.items() if k <= history_idx
+            }
+            keyframe_idx = max(keyframes.keys(), default=0)
+            keyframe = keyframes.get(keyframe_idx, history[0])
+            if keyframe_idx == history_idx:
+                target_history = keyframe
+            else:
+                target_history_dict = keyframe.dict()
+                for diff in history_diff[keyframe_idx + 1 : history_idx + 1]:
+                    diff = copy.deepcopy(diff)
+                    dictdiffer.patch(diff, target_history_dict, in_place=True)
+                target_history = Match(**target_history_dict)
             match = target_history.copy(deep=True)
             match._history = [history[0]]
             if history_idx > 0:
                 match._history.append(target_history)
             match._history_diff = history_diff[: history_idx + 1]
+            match._history_keyframes = keyframes
         else:
             target_history = history[history_idx]
             match = target_history.copy(deep=True)
@@ -439,18 +635,129 @@ class Match(BaseModel):
 
     def copy(self, *argv, **kwargs) -> "Match":
         """
-        Copy the match, and init random state of new match.
-        """
-        ret = super().copy(*argv, **kwargs)
+        Copy the match, and init random state of new match. Private attributes
+        in `COPY_EXCLUDED_PRIVATE`, e.g. snapshot cache and object indices, will
+        not be copied.
+        """
+        not_copied = {name: getattr(self, name) for name in COPY_EXCLUDED_PRIVATE}
+        for name, default_factory in COPY_EXCLUDED_PRIVATE.items():
+            setattr(self, name, default_factory())
+        try:
+            ret = super().copy(*argv, **kwargs)
+        finally:
+            for name, value in not_copied.items():
+                setattr(self, name, value)
         ret._init_random_state()
         return ret
 
+    def fast_clone(self, memo: Dict[int, Any] | None = None) -> "Match":
+        """
+        Clone the match without `copy.deepcopy`, see `BaseModel.fast_clone`,
+        which is much faster than `copy(deep=True)`. Same as `copy`, private
+        attributes in `COPY_EXCLUDED_PRIVATE` are not copied, and random state
+        of new match is inited. Histories are read-only snapshots, so they are
+        shared with the new match instead of being cloned.
+        """
+        not_cloned = {
+            name: getattr(self, name)
+            for name in list(COPY_EXCLUDED_PRIVATE) + HISTORY_PRIVATE
+        }
+        for name in COPY_EXCLUDED_PRIVATE:
+            setattr(self, name, COPY_EXCLUDED_PRIVATE[name]())
+        for name in HISTORY_PRIVATE:
+            setattr(self, name, None)
+        # random state will be re-inited from self.random_state
+        self._flush_random_state()
+        random_state = self._random_state
+        self._random_state = None
+        try:
+            ret = super().fast_clone(memo)
+        finally:
+            for name, value in not_cloned.items():
+                setattr(self, name, value)
+            self._random_state = random_state
+        ret._history = self._history[:]
+        ret._history_diff = self._history_diff[:]
+        ret._history_keyframes = self._history_keyframes.copy()
+        ret._init_random_state()
+        return ret
+
+    def snapshot(self) -> "Match":
+        """
+        Get a read-only snapshot of current match. Objects that are not changed
+        since last snapshot are shared with last snapshot, so taking snapshots
+        repeatedly only copies changed objects, but every snapshot still walks
+        all objects of the match to find them. Private attributes of match,
+        e.g. histories, are not included in the snapshot.
+
+        NOTE: The snapshot and its objects should never be modified, as they may
+        be shared with other snapshots. To get a modifiable match, use
+        `snapshot.copy(deep=True)`.
+        """
+        return self._get_snapshot_cache().snapshot(self)
+
+    def _get_snapshot_cache(self) -> SnapshotCache:
+        """
+        Save random state before snapshotting, and create snapshot cache if
+        not exists.
+        """
+        self._flush_random_state()
+        if self._snapshot_cache is None:
+            self._snapshot_cache = SnapshotCache(
+                exclude_private=set(Match.__private_attributes__.keys())
+            )
+        return self._snapshot_cache
+
+    def checkpoint(self) -> Checkpoint:
+        """
+        Get a checkpoint of current match, which can be restored by `rollback`
+        without copying the match. It is a snapshot of the match, so its cost
+        is same as `snapshot`, and `checkpoint.root` is the snapshot.
+        """
+        checkpoint = self._get_snapshot_cache().checkpoint(self)
+        checkpoint.private = {
+            "_history": self._history[:],
+            "_history_diff": self._history_diff[:],
+            "_history_keyframes": self._history_keyframes.copy(),
+        }
+        return checkpoint
+
+    def rollback(self, checkpoint: Checkpoint) -> None:
+        """
+        Restore the match in place to a checkpoint got by `checkpoint`. Changed
+        objects are found by a snapshot, and only objects changed after the
+        checkpoint are restored, so trying an action and rolling back allocates
+        much less than copying the match before it.
+        Objects are restored as the same instances as when the checkpoint was
+        got, and histories and random state are restored as well. A checkpoint
+        can be used to roll back multiple times.
+        """
+        if self._snapshot_cache is None:
+            raise ValueError("Checkpoint is not taken from this match.")
+        self._snapshot_cache.rollback(self, checkpoint)
+        for name, value in checkpoint.private.items():
+            setattr(self, name, copy.copy(value))
+        self._init_random_state()
+        self._invalidate_subscriber_index()
+        self._object_index = {}
+
+    def _iter(self, *argv, **kwargs):
+        # all fields are exported by _iter, including dict, json and copy. Save
+        # random state before exporting.
+        self._flush_random_state()
+        return super()._iter(*argv, **kwargs)
+
     def _init_random_state(self):
+        self._random_state_dirty = False
         if self.config.recreate_mode:
             # no need to init random state
             return
         if self.random_state:
-            if self.random_state[0] == "MT19937":
+            if self.random_state[0] == COUNTER_RANDOM_STATE_NAME:
+                self._random_state = CounterRandom(
+                    self.random_state[1], self.random_state[2]
+                )
+            elif self.random_state[0] == "MT19937":
                 assert "np" in globals(), (
                     "numpy is not installed, cannot set random state with numpy "
                     "version states."
@@ -479,39 +786,52 @@ class Match(BaseModel):
         if self._prediction_mode:
             # do not save history in prediction mode
             return
-        hist = self._history[:]
-        hist_diff = self._history_diff[:]
-        self._history.clear()
-        self._history_diff.clear()
-        copy = self.copy(deep=True)
-        self._history += hist
-        self._history_diff += hist_diff
-        self._history.append(copy)
+        self._history.append(self.snapshot())
+        recorded = True
         if len(self._history) == 1:
             self._history_diff.append(None)
         else:
-            self._history_diff.append(
-                list(
-                    dictdiffer.diff(self._history[-2].dict(), self._history[-1].dict())
-                )
-            )
-            # remove prev values of 'remove' in diff
-            diff = self._history_diff[-1]
-            for d in diff:
-                if d[0] == "remove":
-                    for i in range(len(d[2])):
-                        d[2][i] = (d[2][i][0], None)
+            # objects not changed are shared by snapshots, and will be skipped
+            # when calculating diff. prev values of 'remove' are set to None.
+            diff = diff_snapshot(self._history[-2], self._history[-1])
+            if self._debug_check_history_diff:
+                self._debug_check_diff(self._history[-2], self._history[-1], diff)
+            self._history_diff.append(diff)
             if len(diff) == 0:
                 # no different, drop the last history
                 self._history.pop()
                 self._history_diff.pop()
+                recorded = False
+        if recorded:
+            for hook in self._history_hooks:
+                hook(self, self._history[-1])
         if self.config.compress_history:
-            # If compress history, only save the first and last history.
+            # If compress history, only save the first and last history, and
+            # keyframes.
             # When self._history length larger than 2, only keep the first and
             # last history.
+            history_idx = len(self._history_diff) - 1
+            interval = self.config.history_keyframe_interval
+            if history_idx > 0 and interval > 0 and history_idx % interval == 0:
+                self._history_keyframes[history_idx] = self._history[-1]
             if len(self._history) > 2:
                 self._history = [self._history[0], self._history[-1]]
 
+    @staticmethod
+    def _debug_check_diff(prev: "Match", current: "Match", diff: List) -> None:
+        """
+        Check whether diff is same as the result of dictdiffer on full dicts.
+        """
+        target = list(dictdiffer.diff(prev.dict(), current.dict()))
+        for d in target:
+            if d[0] == "remove":
+                for i in range(len(d[2])):
+                    d[2][i] = (d[2][i][0], None)
+        if diff != target:
+            raise AssertionError(
+                f"History diff is not consistent with dictdiffer: {diff} != {target}"
+            )
+
     def record_last_action_history(self):
         """
         Record history based on last action.
@@ -607,7 +927,10 @@ class Match(BaseModel):
         """
         Save the random state.
         """
-        if isinstance(self._random_state, random.Random):
+        self._random_state_dirty = False
+        if isinstance(self._random_state, CounterRandom):
+            self.random_state = self._random_state.get_state()
+        elif isinstance(self._random_state, random.Random):
             self.random_state = list(self._random_state.getstate())
             self.random_state[1] = list(self.random_state[1])
             return
@@ -619,17 +942,23 @@ class Match(BaseModel):
                 f"Random state type {type(self._random_state)} not recognized."
             )
 
+    def _flush_random_state(self):
+        """
+        Save the random state if it is outdated.
+        """
+        if self._random_state_dirty:
+            self._save_random_state()
+
     def _random(self):
         """
-        Return a random number ranges 0-1 based on random_state, and save new
-        random state.
+        Return a random number ranges 0-1 based on random_state. New random
+        state is saved lazily.
         """
         assert (
             not self.config.recreate_mode
         ), "In recreate mode, random functions should not be called."
-        ret = self._random_state.random()
-        self._save_random_state()
-        return ret
+        self._random_state_dirty = True
+        return self._random_state.random()
 
     def _random_shuffle(self, array: List):
         """
@@ -639,7 +968,7 @@ class Match(BaseModel):
             not self.config.recreate_mode
         ), "In recreate mode, random functions should not be called."
         self._random_state.shuffle(array)
-        self._save_random_state()
+        self._random_state_dirty = True
 
     def _set_match_state(self, new_state: MatchState):
         logging.info(f"Match state change from {self.state} to " f"{new_state}.")
@@ -685,6 +1014,7 @@ class Match(BaseModel):
                 return False, error_message
 
         self._set_match_state(MatchState.STARTING)
+        self._invalidate_subscriber_index()
 
         # choose first player
         if self.config.random_first_player and not self.config.recreate_mode:
@@ -774,6 +1104,8 @@ class Match(BaseModel):
         Returns:
             bool: True if success, False if error occurs.
         """
+        # objects may be modified outside of match
+        self._check_subscriber_index()
         while True:
             # check if game reaches end condition
             if self.is_game_end():
@@ -845,6 +1177,14 @@ class Match(BaseModel):
         """
         Check if the request is valid.
         """
+        for req in self.requests:
+            # most responses are made from requests of the match or their
+            # copies, compare fields first to avoid converting requests into
+            # dicts.
+            if req is request or (
+                req.__class__ is request.__class__ and req.__dict__ == request.__dict__
+            ):
+                return True
         for req in self.requests:
             if req == request:
                 return True
@@ -870,27 +1210,73 @@ class Match(BaseModel):
         # check if the request exist
         if not self.check_request_exist(response.request):
             raise ValueError("Request does not exist.")
+        self._respond(response)
+
+    def _respond(self, response: Responses) -> None:
+        """
+        Deal with a response that has been checked to be valid.
+        """
         # clear prediction after receiving response
         self.skill_predictions.clear()
+        self._check_subscriber_index()
         # call different respond functions based on the type of response
-        if isinstance(response, SwitchCharacterResponse):
-            self._respond_switch_character(response)
-        elif isinstance(response, ElementalTuningResponse):
-            self._respond_elemental_tuning(response)
-        elif isinstance(response, DeclareRoundEndResponse):
-            self._respond_declare_round_end(response)
-        elif isinstance(response, UseSkillResponse):
-            self._respond_use_skill(response)
-        elif isinstance(response, UseCardResponse):
-            self._respond_use_card(response)
-        elif isinstance(response, SwitchCardResponse):
-            self._respond_switch_card(response)
-        elif isinstance(response, ChooseCharacterResponse):
-            self._respond_choose_character(response)
-        elif isinstance(response, RerollDiceResponse):
-            self._respond_reroll_dice(response)
-        else:
+        method_name = _get_handler_name(RESPONSE_HANDLERS, response)
+        if method_name is None:
             raise AssertionError(f"Response type {type(response)} not recognized.")
+        getattr(self, method_name)(response)
+
+    def _get_action_player_idx(self, player_idx: int | None) -> int:
+        """
+        Get the player who makes action. If player_idx is None, it is the
+        first player that needs to respond.
+        """
+        if len(self.requests) == 0:
+            raise ValueError("Match is not waiting for response.")
+        if player_idx is None:
+            player_idx = self.requests[0].player_idx
+            for request in self.requests:
+                player_idx = min(player_idx, request.player_idx)
+        elif not self.need_respond(player_idx):
+            raise ValueError(f"Player {player_idx} does not need to respond.")
+        return player_idx
+
+    def legal_actions(
+        self, player_idx: int | None = None, action_space: ActionSpace | None = None
+    ) -> List[int]:
+        """
+        Return all legal actions of the player encoded as integers in
+        ascending order. The encoding is decided by `action_space`, and when
+        it is None, it is created from the config of the match. Dice used to
+        pay costs are not part of actions, they are decided when applying.
+
+        Args:
+            player_idx (int | None): The player who makes action. If None,
+                use the first player that needs to respond.
+            action_space (ActionSpace | None): Layout of the action space.
+        """
+        player_idx = self._get_action_player_idx(player_idx)
+        if action_space is None:
+            action_space = ActionSpace.from_config(self.config)
+        return action_space.legal_actions(self.requests, player_idx)
+
+    def apply_action(
+        self,
+        action: int,
+        player_idx: int | None = None,
+        dice_policy: DicePolicy = default_dice_policy,
+        action_space: ActionSpace | None = None,
+    ) -> None:
+        """
+        Respond with an action returned by `legal_actions`. Dice to pay the
+        cost are chosen by `dice_policy`. The response is made without
+        validation, so the dice policy should always return valid dice. Like
+        `respond`, call `self.step()` to continue simulation.
+        """
+        player_idx = self._get_action_player_idx(player_idx)
+        if action_space is None:
+            action_space = ActionSpace.from_config(self.config)
+        response = action_space.make_response(self, action, player_idx, dice_policy)
+        self._respond(response)
 
     def is_game_end(self) -> bool:
         """
@@ -935,7 +1321,7 @@ class Match(BaseModel):
         for table in self.player_tables:
             table.has_round_ended = False
         for pnum, player_table in enumerate(self.player_tables):
-            player_table.dice.colors.clear()
+            player_table.dice.clear()
         # generate new dice
         event_args: List[EventArguments] = []
         for pnum, player_table in enumerate(self.player_tables):
@@ -1081,12 +1467,12 @@ class Match(BaseModel):
         can handle the action.
         """
         assert position.area != ObjectPositionType.INVALID, "Invalid area."
-        if position.area == ObjectPositionType.SYSTEM:
-            for object in self.event_handlers:
-                if object.id == position.id:
-                    return object
-            raise NotImplementedError("Currently should not be None")
-        res = self.player_tables[position.player_idx].get_object(position)
+        if position.area in INDEXED_AREAS:
+            res = self._get_indexed_object(position)
+            if position.area == ObjectPositionType.SYSTEM and res is None:
+                raise NotImplementedError("Currently should not be None")
+        else:
+            res = self.player_tables[position.player_idx].get_object(position)
         if res is None and action is not None:
             # not found, try to find in trashbin
             for object in self.trashbin:
@@ -1097,6 +1483,103 @@ class Match(BaseModel):
                     return object
         return res
 
+    def _build_object_index(self) -> None:
+        """
+        Build object index from object lists. The order is same as linear scan
+        in `get_object`, so when ids are duplicated, the first one is kept.
+        """
+        index = self._object_index
+        index.clear()
+        for idx, obj in enumerate(self.event_handlers):
+            index.setdefault((-1, ObjectPositionType.SYSTEM, obj.id), ("", idx, obj))
+        for player_idx, table in enumerate(self.player_tables):
+            for area, attr_names in INDEXED_AREAS.items():
+                for attr_name in attr_names:
+                    if attr_name == "using_hand":
+                        if table.using_hand is not None:
+                            key = (player_idx, area, table.using_hand.id)
+                            index.setdefault(key, (attr_name, 0, table.using_hand))
+                        continue
+                    for idx, obj in enumerate(getattr(table, attr_name)):
+                        index.setdefault(
+                            (player_idx, area, obj.id), (attr_name, idx, obj)
+                        )
+
+    def _verify_object_index(
+        self, key: Tuple[int, ObjectPositionType, int]
+    ) -> ObjectBase | None:
+        """
+        Get object from index and check whether it is still at the recorded
+        place. If not found or not at the place, return None.
+        """
+        value = self._object_index.get(key)
+        if value is None:
+            return None
+        attr_name, idx, obj = value
+        if key[1] == ObjectPositionType.SYSTEM:
+            objects = self.event_handlers
+        elif attr_name == "using_hand":
+            if self.player_tables[key[0]].using_hand is obj:
+                return obj
+            return None
+        else:
+            objects = getattr(self.player_tables[key[0]], attr_name)
+        if idx < len(objects) and objects[idx] is obj and obj.id == key[2]:
+            return obj
+        return None
+
+    def _object_area_sizes(
+        self, player_idx: int, area: ObjectPositionType
+    ) -> Tuple[int, ...]:
+        """
+        Get sizes of object lists of an indexed area, using hand is represented
+        by its id. Used to find object lists modified outside of actions.
+        """
+        if area == ObjectPositionType.SYSTEM:
+            return (len(self.event_handlers),)
+        table = self.player_tables[player_idx]
+        return tuple(
+            id(table.using_hand) if name == "using_hand" else len(getattr(table, name))
+            for name in INDEXED_AREAS[area]
+        )
+
+    def _get_indexed_object(self, position: ObjectPosition) -> ObjectBase | None:
+        """
+        Get object in team status, summon, support, hand, deck and system event
+        handlers by index. Objects are not tracked when they are added, removed
+        or moved; instead, every entry records where the object was, and when
+        the object is no longer there or not found, the index is rebuilt once.
+        Keys that are still not found are recorded as misses, and later lookups
+        of them do not rebuild the index until objects of the area are changed
+        by actions, or sizes of its object lists are changed.
+        """
+        player_idx = position.player_idx
+        if position.area == ObjectPositionType.SYSTEM:
+            player_idx = -1
+        key = (player_idx, position.area, position.id)
+        res = self._verify_object_index(key)
+        if res is None:
+            sizes = self._object_area_sizes(player_idx, position.area)
+            if self._object_index_misses.get(key) != sizes:
+                self._build_object_index()
+                res = self._verify_object_index(key)
+                if res is None:
+                    self._object_index_misses[key] = sizes
+        if self._debug_check_index:
+            if position.area == ObjectPositionType.SYSTEM:
+                scan_res = None
+                for obj in self.event_handlers:
+                    if obj.id == position.id:
+                        scan_res = obj
+                        break
+            else:
+                scan_res = self.player_tables[player_idx].get_object(position)
+            if scan_res is not res:
+                raise AssertionError(
+                    f"Object index of {position} is not consistent with object list."
+                )
+        return res
+
     def get_object_list(self) -> List[ObjectBase]:
         """
         Get all objects in the match by `self.table.get_object_lists`.
@@ -1122,6 +1605,151 @@ class Match(BaseModel):
             + self.event_handlers
         )
 
+    def _subscriber_slot_objects(
+        self, slot: Tuple[int, ObjectPositionType, int]
+    ) -> List[ObjectBase]:
+        """
+        Get objects of a subscriber slot, ordered same as `get_object_list`.
+        """
+        player_idx, area, character_idx = slot
+        if area == ObjectPositionType.SYSTEM:
+            return self.event_handlers
+        table = self.player_tables[player_idx]
+        if area == ObjectPositionType.CHARACTER:
+            return table.characters[character_idx].get_object_lists()
+        if area == ObjectPositionType.HAND and table.using_hand is not None:
+            return [table.using_hand] + table.hands
+        return getattr(table, SUBSCRIBER_SLOT_ATTRS[area])
+
+    def _get_subscriber_slot(
+        self, player_idx: int, area: ObjectPositionType, character_idx: int = -1
+    ) -> Dict[str, List[ObjectBase]]:
+        """
+        Get handler names of a subscriber slot to its objects that have the
+        handler. If the slot is not in the index, it is built from objects of
+        the slot.
+        """
+        slot = (player_idx, area, character_idx)
+        cached = self._subscriber_index.get(slot)
+        if cached is not None:
+            return cached[1]
+        objects = tuple(self._subscriber_slot_objects(slot))
+        handlers: Dict[str, List[ObjectBase]] = {}
+        for obj in objects:
+            cls = type(obj)
+            register_handlers(cls)
+            for name in cls._event_handler_names:  # type: ignore
+                handlers.setdefault(f"event_handler_{name}", []).append(obj)
+            for name in cls._value_modifier_names:  # type: ignore
+                handlers.setdefault(f"value_modifier_{name}", []).append(obj)
+        self._subscriber_index[slot] = (objects, handlers)
+        return handlers
+
+    def _drop_subscriber_slot(
+        self, player_idx: int, area: ObjectPositionType, character_idx: int = -1
+    ) -> None:
+        """
+        Drop a subscriber slot from the index. Should be called by actions
+        after objects of the slot are added, removed or moved. Skills and
+        character status are in the slot of their character, and using hand
+        is in the slot of hands. Misses of object index in the area are dropped
+        as well.
+        """
+        if area in (ObjectPositionType.SKILL, ObjectPositionType.CHARACTER_STATUS):
+            area = ObjectPositionType.CHARACTER
+        if area == ObjectPositionType.SYSTEM:
+            player_idx = -1
+        if area != ObjectPositionType.CHARACTER:
+            character_idx = -1
+        self._subscriber_index.pop((player_idx, area, character_idx), None)
+        if self._object_index_misses:
+            self._object_index_misses = {
+                key: value
+                for key, value in self._object_index_misses.items()
+                if key[0] != player_idx or key[1] != area
+            }
+
+    def _invalidate_subscriber_index(self) -> None:
+        """
+        Drop all slots of subscriber index. Should be called when object lists
+        may be changed without dropping their slots, e.g. on start, rollback
+        and actions that do not maintain the index. Misses of object index are
+        dropped as well.
+        """
+        self._subscriber_index = {}
+        self._object_index_misses = {}
+
+    def _check_subscriber_index(self) -> None:
+        """
+        Drop subscriber slots whose objects are no longer same as when they
+        were built, i.e. object lists are modified outside of actions. It only
+        compares object identities, and no handler is checked. Misses of object
+        index cannot be checked in this way, and are all dropped.
+        """
+        self._object_index_misses = {}
+        for slot, (objects, _) in list(self._subscriber_index.items()):
+            current = self._subscriber_slot_objects(slot)
+            if len(current) != len(objects) or not all(
+                map(operator.is_, current, objects)
+            ):
+                del self._subscriber_index[slot]
+
+    def _get_subscribers(self, handler_name: str) -> List[ObjectBase]:
+        """
+        Get objects that have `handler_name`, i.e. `event_handler_{type}` or
+        `value_modifier_{type}`, ordered same as `get_object_list`. Objects are
+        collected from subscriber slots in the order of `get_object_list`, so
+        current player, active characters and alive characters are read on
+        every call, and only slots changed by actions are rebuilt.
+        """
+        result: List[ObjectBase] = []
+        for player_idx in (self.current_player, 1 - self.current_player):
+            table = self.player_tables[player_idx]
+            characters = table.characters
+            start_character_idx = table.active_character_idx
+            if start_character_idx == -1:
+                start_character_idx = 0
+            for i in range(len(characters)):
+                target = (start_character_idx + i) % len(characters)
+                if characters[target].is_alive:
+                    objects = self._get_subscriber_slot(
+                        player_idx, ObjectPositionType.CHARACTER, target
+                    ).get(handler_name)
+                    if objects is not None:
+                        result += objects
+                if i == 0:
+                    objects = self._get_subscriber_slot(
+                        player_idx, ObjectPositionType.TEAM_STATUS
+                    ).get(handler_name)
+                    if objects is not None:
+                        result += objects
+            for area in SUBSCRIBER_SLOT_ATTRS:
+                if area == ObjectPositionType.TEAM_STATUS:
+                    continue
+                objects = self._get_subscriber_slot(player_idx, area).get(handler_name)
+                if objects is not None:
+                    result += objects
+        objects = self._get_subscriber_slot(-1, ObjectPositionType.SYSTEM).get(
+            handler_name
+        )
+        if objects is not None:
+            result += objects
+        if self._debug_check_index:
+            if handler_name[:14] == "event_handler_":
+                check_func, name = has_event_handler, handler_name[14:]
+            else:
+                assert handler_name[:15] == "value_modifier_"
+                check_func, name = has_value_modifier, handler_name[15:]
+            scan_result = [x for x in self.get_object_list() if check_func(x, name)]
+            if len(result) != len(scan_result) or any(
+                x is not y for x, y in zip(result, scan_result)
+            ):
+                raise AssertionError(
+                    f"Subscriber index of {handler_name} is not consistent with "
+                    "object list."
+                )
+        return result
+
     def _modify_value(
         self,
         value: ModifiableValueBase,
@@ -1145,16 +1773,14 @@ class Match(BaseModel):
                 ModifiableValueTypes.COST,
                 ModifiableValueTypes.FULL_COST,
             ], "Only costs can be modified in test mode."
-        object_list = self.get_object_list()
         modifier_name = f"value_modifier_{value.type.name}"
-        for obj in object_list:
+        for obj in self._get_subscribers(modifier_name):
             name = obj.__class__.__name__
             if hasattr(obj, "name"):  # pragma: no cover
                 name = obj.name  # type: ignore
-            func = getattr(obj, modifier_name, None)
-            if func is not None:
-                logging.debug(f"Modify value {value.type.name} for {name}.")
-                value = func(value, self, mode)
+            func = getattr(obj, modifier_name)
+            logging.debug(f"Modify value {value.type.name} for {name}.")
+            value = func(value, self, mode)
 
     def _modify_cost_value(
         self,
@@ -1179,16 +1805,27 @@ class Match(BaseModel):
         if not self.config.make_skill_prediction or self._prediction_mode:
             # do not predict
             return
-        # get copy of current match, but except histories.
-        history = self._history[:]
-        history_diff = self._history_diff[:]
-        self._history.clear()
-        self._history_diff.clear()
-        copy = self.copy(deep=True, exclude={"_history", "_history_diff"})
-        self._history += history
-        self._history_diff += history_diff
+        snapshot = self.snapshot()
+        cache = self._skill_prediction_cache
+        if (
+            cache is not None
+            and cache[0] == player_idx
+            and same_snapshot(cache[1], snapshot, SKILL_PREDICTION_IGNORED_FIELDS)
+        ):
+            # state not changed since last prediction, reuse results
+            self.skill_predictions = [dict(x) for x in cache[2]]
+            return
+        # get copy of current match, but except histories. As snapshot is
+        # read-only and only the copy will be marked, use a shallow copy of it.
+        copy = snapshot.copy()
         # disable history logging and skill prediction for copy
         copy._prediction_mode = True
+        # objects of snapshot, used to make clones share unchanged objects with
+        # the snapshot when taking their snapshots, so diffs only visit changed
+        # objects. The shallow copy has same fields as the snapshot.
+        exclude_private = set(Match.__private_attributes__.keys())
+        frozen_models = collect_models(snapshot, exclude_private)
+        frozen_models[id(copy)] = snapshot
         table = copy.player_tables[player_idx]
         character = table.characters[table.active_character_idx]
         skills = character.skills
@@ -1196,7 +1833,8 @@ class Match(BaseModel):
             if not skill.is_valid(self):
                 continue
             # a valid skill, try to use it
-            one_copy = copy.copy(deep=True)
+            memo: Dict[int, Any] = {}
+            one_copy = copy.fast_clone(memo)
             one_copy._respond_use_skill(
                 UseSkillResponse(
                     request=UseSkillRequest(
@@ -1210,13 +1848,14 @@ class Match(BaseModel):
                 )
             )
             one_copy.step()
-            # get diff after prediction
-            diff = list(dictdiffer.diff(copy.dict(), one_copy.dict()))
-            # remove prev values of 'remove' in diff
-            for d in diff:
-                if d[0] == "remove":
-                    for i in range(len(d[2])):
-                        d[2][i] = (d[2][i][0], None)
+            # get diff after prediction. prev values of 'remove' are set to None.
+            one_copy._flush_random_state()
+            one_snapshot = SnapshotCache.from_clone(
+                frozen_models, memo, exclude_private
+            ).snapshot(one_copy)
+            diff = diff_snapshot(snapshot, one_snapshot)
+            if self._debug_check_history_diff:
+                self._debug_check_diff(snapshot, one_snapshot, diff)
             self.skill_predictions.append(
                 {
                     "player_idx": player_idx,
@@ -1225,6 +1864,11 @@ class Match(BaseModel):
                     "diff": diff,
                 }
             )
+        self._skill_prediction_cache = (
+            player_idx,
+            snapshot,
+            [dict(x) for x in self.skill_predictions],
+        )
 
     """
     Request functions. To generate specific requests.
@@ -1277,6 +1921,8 @@ class Match(BaseModel):
         """
         table = self.player_tables[player_idx]
         active_character = table.characters[table.active_character_idx]
+        dice_counts = table.dice.counts
+        charge, arcane_legend = table.get_charge_and_arcane_legend()
         for cidx, character in enumerate(table.characters):
             if cidx == table.active_character_idx or character.is_defeated:
                 continue
@@ -1288,16 +1934,17 @@ class Match(BaseModel):
                 target_position=character.position,
             )
             dice_cost_value = self._modify_cost_value(dice_cost_value, mode="TEST")
-            charge, arcane_legend = table.get_charge_and_arcane_legend()
-            if not dice_cost_value.cost.is_valid(
-                dice_colors=table.dice.colors,
+            if not dice_cost_value.cost.is_valid_counts(
+                counts=dice_counts,
                 charge=charge,
                 arcane_legend=arcane_legend,
                 strict=False,
             ):
                 continue
+            # requests are made from validated values, and each request has its
+            # own copy of dice colors.
             self.requests.append(
-                SwitchCharacterRequest(
+                SwitchCharacterRequest.construct(
                     player_idx=player_idx,
                     active_character_idx=table.active_character_idx,
                     target_character_idx=cidx,
@@ -1322,7 +1969,7 @@ class Match(BaseModel):
         available_card_idxs = list(range(len(table.hands)))
         if len(available_dice_idx) and len(available_card_idxs):
             self.requests.append(
-                ElementalTuningRequest(
+                ElementalTuningRequest.construct(
                     player_idx=player_idx,
                     dice_colors=table.dice.colors.copy(),
                     dice_idxs=available_dice_idx,
@@ -1344,6 +1991,7 @@ class Match(BaseModel):
         if front_character.is_stunned:
             # stunned, cannot use skill.
             return
+        dice_counts = table.dice.counts
         for sid, skill in enumerate(front_character.skills):
             if skill.is_valid(self):
                 cost = skill.cost.copy()
@@ -1363,19 +2011,18 @@ class Match(BaseModel):
                     cost=cost, position=skill.position, target_position=None
                 )
                 cost_value = self._modify_cost_value(cost_value, "TEST")
-                dice_colors = table.dice.colors
-                if cost_value.cost.is_valid(
-                    dice_colors=dice_colors,
+                if cost_value.cost.is_valid_counts(
+                    counts=dice_counts,
                     charge=front_character.charge,
                     arcane_legend=table.arcane_legend,
                     strict=False,
                 ):
                     self.requests.append(
-                        UseSkillRequest(
+                        UseSkillRequest.construct(
                             player_idx=player_idx,
                             character_idx=table.active_character_idx,
                             skill_idx=sid,
-                            dice_colors=dice_colors.copy(),
+                            dice_colors=table.dice.colors.copy(),
                             cost=cost_value.cost,
                         )
                     )
@@ -1383,6 +2030,8 @@ class Match(BaseModel):
     def _request_use_card(self, player_idx: int):
         table = self.player_tables[player_idx]
         cards = table.hands
+        dice_counts = table.dice.counts
+        charge, arcane_legend = table.get_charge_and_arcane_legend()
         for cid, card in enumerate(cards):
             if card.is_valid(self):
                 cost = card.cost.copy()
@@ -1390,19 +2039,17 @@ class Match(BaseModel):
                     cost=cost, position=card.position, target_position=None
                 )
                 cost_value = self._modify_cost_value(cost_value, "TEST")
-                dice_colors = table.dice.colors
-                charge, arcane_legend = table.get_charge_and_arcane_legend()
-                if cost_value.cost.is_valid(
-                    dice_colors=dice_colors,
+                if cost_value.cost.is_valid_counts(
+                    counts=dice_counts,
                     charge=charge,
                     arcane_legend=arcane_legend,
                     strict=False,
                 ):
                     self.requests.append(
-                        UseCardRequest(
+                        UseCardRequest.construct(
                             player_idx=player_idx,
                             card_idx=cid,
-                            dice_colors=dice_colors.copy(),
+                            dice_colors=table.dice.colors.copy(),
                             cost=cost_value.cost,
                             targets=list(card.get_targets(self)),
                         )
@@ -1687,8 +2334,8 @@ class Match(BaseModel):
 
     def _act(self, action: ActionBase) -> List[EventArguments]:
         """
-        Act an action. It will call corresponding action function based on
-        the type of the action.
+        Act an action. It will call corresponding action function registered
+        in `ACTION_HANDLERS` based on the type of the action.
 
         Action functions take Action as input, do
         changes of the game table, and return a list of triggered events.
@@ -1701,63 +2348,23 @@ class Match(BaseModel):
         """
         self.last_action = action
         self.action_info = {}
-        if isinstance(action, ChooseCharacterAction):
-            return list(self._action_choose_character(action))
-        elif isinstance(action, CreateDiceAction):
-            return list(self._action_create_dice(action))
-        elif isinstance(action, RemoveDiceAction):
-            return list(self._action_remove_dice(action))
-        elif isinstance(action, RestoreCardAction):
-            return list(self._action_restore_card(action))
-        elif isinstance(action, DrawCardAction):
-            return list(self._action_draw_card(action))
-        elif isinstance(action, RemoveCardAction):
-            return list(self._action_remove_card(action))
-        elif isinstance(action, SwitchCardAction):
-            return list(self._action_switch_card(action))
-        elif isinstance(action, SwitchCharacterAction):
-            return list(self._action_switch_character(action))
-        elif isinstance(action, DeclareRoundEndAction):
-            return list(self._action_declare_round_end(action))
-        elif isinstance(action, ActionEndAction):
-            return list(self._action_action_end(action))
-        elif isinstance(action, MakeDamageAction):
-            return list(self._action_make_damage(action))
-        elif isinstance(action, ChargeAction):
-            return list(self._action_charge(action))
-        elif isinstance(action, UseSkillAction):
-            return list(self._action_use_skill(action))
-        elif isinstance(action, UseCardAction):
-            return list(self._action_use_card(action))
-        elif isinstance(action, SkillEndAction):
-            return list(self._action_skill_end(action))
-        elif isinstance(action, CharacterDefeatedAction):
-            return list(self._action_character_defeated(action))
-        elif isinstance(action, CreateObjectAction):
-            return list(self._action_create_object(action))
-        elif isinstance(action, CreateRandomObjectAction):
-            return list(self._action_create_random_object(action))
-        elif isinstance(action, RemoveObjectAction):
-            return list(self._action_remove_object(action))
-        elif isinstance(action, ChangeObjectUsageAction):
-            return list(self._action_change_object_usage(action))
-        elif isinstance(action, MoveObjectAction):
-            return list(self._action_move_object(action))
-        elif isinstance(action, ConsumeArcaneLegendAction):
-            return list(self._action_consume_arcane_legend(action))
-        elif isinstance(action, GenerateChooseCharacterRequestAction):
-            return list(self._action_generate_choose_character_request(action))
-        elif isinstance(action, GenerateRerollDiceRequestAction):
-            return list(self._action_generate_reroll_dice_request(action))
-        elif isinstance(action, SkipPlayerActionAction):
-            return list(self._action_skip_player_action(action))
-        elif isinstance(action, CharacterReviveAction):
-            return list(self._action_character_revive(action))
-        elif isinstance(action, GenerateSwitchCardRequestAction):
-            return list(self._action_generate_switch_card_request(action))
-        else:
+        method_name = _get_handler_name(ACTION_HANDLERS, action)
+        if method_name is None:
             self._set_match_state(MatchState.ERROR)  # pragma no cover
             raise AssertionError(f"Unknown action {action}.")
+        if method_name not in INDEX_MAINTAINED_ACTION_METHODS:
+            # action may add, remove or move objects without updating index
+            self._invalidate_subscriber_index()
+        type_name = action.type.name
+        self._action_counts[type_name] = self._action_counts.get(type_name, 0) + 1
+        if len(self._action_hooks) == 0:
+            return list(getattr(self, method_name)(action))
+        start_time = time.perf_counter()
+        event_args = list(getattr(self, method_name)(action))
+        used_time = time.perf_counter() - start_time
+        for hook in self._action_hooks:
+            hook(self, action, used_time)
+        return event_args
 
     def _action_draw_card(self, action: DrawCardAction) -> List[DrawCardEventArguments]:
         """
@@ -1769,6 +2376,9 @@ class Match(BaseModel):
         and if draw_if_not_enough is set True, randomly draw cards until
         number is reached or deck is empty.
         """
+        # cards are moved between hands and deck
+        self._drop_subscriber_slot(action.player_idx, ObjectPositionType.HAND)
+        self._drop_subscriber_slot(action.player_idx, ObjectPositionType.DECK)
         if self.version <= "0.0.4":
             return self._action_draw_card_004(action)
         return self._action_draw_card_005(action)
@@ -1992,6 +2602,9 @@ class Match(BaseModel):
         Before 0.0.5, the order of original cards may be changed after restore, after
         0.0.5, the order of original cards will not change.
         """
+        # cards are moved between hands and deck
+        self._drop_subscriber_slot(action.player_idx, ObjectPositionType.HAND)
+        self._drop_subscriber_slot(action.player_idx, ObjectPositionType.DECK)
         if self.version <= "0.0.4":
             return self._action_restore_card_004(action)
         return self._action_restore_card_005(action)
@@ -2144,6 +2757,7 @@ class Match(BaseModel):
             f"card name {card.name}, "
             f"remove type {remove_type}."
         )
+        self._drop_subscriber_slot(player_idx, ObjectPositionType.HAND)
         event_arg = RemoveCardEventArguments(action=action, card_name=card.name)
         return [event_arg]
 
@@ -2224,7 +2838,7 @@ class Match(BaseModel):
                 dice.append(color)
         # if there are more dice than the maximum, discard the rest
         max_obtainable_dice = self.config.max_dice_number - len(table.dice.colors)
-        table.dice.colors += dice[:max_obtainable_dice]
+        table.dice.add(dice[:max_obtainable_dice])
         # sort dice by color
         table.sort_dice()
         logging.info(
@@ -2249,10 +2863,8 @@ class Match(BaseModel):
         player_idx = action.player_idx
         dice_idxs = action.dice_idxs
         table = self.player_tables[player_idx]
-        removed_dice: List[DieColor] = []
-        dice_idxs.sort(reverse=True)  # reverse order to avoid index error
-        for idx in dice_idxs:
-            removed_dice.append(table.dice.colors.pop(idx))
+        dice_idxs.sort(reverse=True)
+        removed_dice = table.dice.remove(dice_idxs)
         # sort dice by color
         table.sort_dice()
         logging.info(
@@ -2576,6 +3188,9 @@ class Match(BaseModel):
             )
             self.trashbin.append(obj)
         character.attaches = []
+        self._drop_subscriber_slot(
+            player_idx, ObjectPositionType.CHARACTER, character_idx
+        )
         character.element_application = []
         character.is_alive = False
         character.charge = 0
@@ -2715,6 +3330,11 @@ class Match(BaseModel):
             f"player {player_idx} " f"created new {target_name} {action.object_name}."
         )
         target_list.append(target_object)  # type: ignore
+        self._drop_subscriber_slot(
+            player_idx,
+            action.object_position.area,
+            action.object_position.character_idx,
+        )
         return [
             CreateObjectEventArguments(
                 action=action,
@@ -2812,6 +3432,11 @@ class Match(BaseModel):
                     f"{action.object_position.id}."
                 )
             removed_equip = character.remove_equip(target_type)
+            self._drop_subscriber_slot(
+                player_idx,
+                ObjectPositionType.CHARACTER,
+                action.object_position.character_idx,
+            )
             self.trashbin.append(removed_equip)  # type: ignore
             return [
                 RemoveObjectEventArguments(
@@ -2829,6 +3454,11 @@ class Match(BaseModel):
             if current_object.id == action.object_position.id:
                 # have same status, only update status usage
                 removed_object = target_list.pop(csnum)
+                self._drop_subscriber_slot(
+                    player_idx,
+                    action.object_position.area,
+                    action.object_position.character_idx,
+                )
                 logging.info(
                     f"player {player_idx} "
                     f"removed {target_name} {current_object.name}."
@@ -2916,6 +3546,15 @@ class Match(BaseModel):
             "Move object action should have same object id in both "
             "object position and target position."
         )
+        # objects of both source and target slots are changed
+        self._drop_subscriber_slot(
+            player_idx, action.object_position.area, character_idx
+        )
+        self._drop_subscriber_slot(
+            action.target_position.player_idx,
+            action.target_position.area,
+            action.target_position.character_idx,
+        )
         # character_idx = action.object_position.character_id
         if action.object_position.area == ObjectPositionType.HAND:
             assert table.using_hand is not None
@@ -3075,6 +3714,9 @@ class Match(BaseModel):
             if c.id == action.card_position.id:
                 table.using_hand = c
                 table.hands.pop(idx)
+                self._drop_subscriber_slot(
+                    action.card_position.player_idx, ObjectPositionType.HAND
+                )
                 break
         else:  # pragma: no cover
             self._set_match_state(MatchState.ERROR)
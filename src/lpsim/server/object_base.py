@@ -10,7 +10,7 @@ import random
 
 from .query import query, query_one
 
-from ..utils.class_registry import register_base_class
+from ..utils.class_registry import register_base_class, register_handlers
 
 from .event import GameStartEventArguments, UseCardEventArguments
 from ..utils import BaseModel, accept_same_or_higher_version
@@ -18,7 +18,7 @@ from typing import List, Literal, Any, Tuple
 from pydantic import validator
 from .action import Actions, ActionTypes, CreateObjectAction, RemoveCardAction
 from .consts import ObjectType, ObjectPositionType, CostLabels, PlayerActionLabels
-from .modifiable_values import CostValue, ModifiableValueTypes
+from .modifiable_values import CostValue
 from .struct import DeckRestriction, MultipleObjectPosition, ObjectPosition, Cost
 
 
@@ -57,20 +57,9 @@ class ObjectBase(BaseModel):
 
     def __init__(self, *argv, **kwargs):
         super().__init__(*argv, **kwargs)
-        # check event handler name valid
-        for k in dir(self):
-            if k[:14] == "event_handler_":
-                k = k[14:]
-                try:
-                    k = ActionTypes(k)
-                except ValueError:
-                    raise ValueError(f"Invalid event handler name: {k}")
-            if k[:15] == "value_modifier_":
-                k = k[15:]
-                try:
-                    k = ModifiableValueTypes(k)
-                except ValueError:
-                    raise ValueError(f"Invalid value modifier name: {k}")
+        # check event handler name valid. It is done when class is registered,
+        # and for classes not registered, it is done once on first init.
+        register_handlers(self.__class__)
         # if id is -1, generate a new id
         if self.id == -1:
             self.renew_id()
@@ -93,6 +93,12 @@ class PlayerTable(BaseModel):
     def parse_cards(cls, v):
         return get_instance(CardBase, v)
 
+    @validator("using_hand", pre=True)
+    def parse_using_hand(cls, v):
+        if v is None:
+            return v
+        return get_instance(CardBase, v)
+
     def __init__(self, *argv, **kwargs):
         super().__init__(*argv, **kwargs)
         if self.dice.position.area == ObjectPositionType.INVALID:
@@ -148,8 +154,7 @@ class PlayerTable(BaseModel):
         """
         Sort the dice on the table.
         """
-        order = self.dice_color_order()
-        self.dice.colors.sort(key=lambda x: order.index(x))
+        self.dice.sort(self.dice_color_order())
 
     def get_object(self, position: ObjectPosition) -> ObjectBase | None:
         """
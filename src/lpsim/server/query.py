@@ -1,80 +1,166 @@
+"""
+Query objects from match and check object positions with command strings.
+Command strings are compiled into plans once and cached, so repeated commands
+do not need to be parsed again. Errors in commands are raised when the
+corresponding part of the plan is run, which keeps same behavior as parsing
+and running commands token by token.
+"""
 import shlex
-from typing import Any, List
+from functools import lru_cache
+from typing import Any, Callable, List, Tuple
 
 from .consts import ObjectPositionType, ObjectType
 
 
-def _query(object_position: Any, match: Any, command: List[str]) -> List[Any]:
+# max number of compiled command strings kept in cache
+QUERY_CACHE_SIZE = 4096
+
+_TABLE_COMMANDS = [
+    "active",
+    "prev",
+    "next",
+    "deck",
+    "hand",
+    "character",
+    "team_status",
+    "summon",
+    "support",
+]
+# commands that select object lists from player tables, and their attributes
+_TABLE_LIST_ATTRS = {
+    "deck": "table_deck",
+    "hand": "hands",
+    "character": "characters",
+    "team_status": "team_status",
+    "summon": "summons",
+    "support": "supports",
+}
+_CHARACTER_COMMANDS = ["weapon", "artifact", "talent", "status", "skill"]
+# commands that select object lists from characters, and their attributes
+_CHARACTER_LIST_ATTRS = {
+    "status": "status",
+    "skill": "skills",
+}
+
+QueryStep = Callable[[List[Any]], List[Any]]
+QuerySelect = Callable[[Any, Any], List[Any]]
+
+
+def _split_and(tokens: List[str]) -> List[List[str]]:
     """
-    Function to deal with a query. `and` should not contain in command when calling,
-    split it before calling this function.
+    Split tokens by `and`.
     """
-    assert len(command) > 0, "command is empty"
-    current_objs = []
-    if command[0] == "self":
-        assert object_position.area in [
-            ObjectPositionType.CHARACTER,
-            ObjectPositionType.CHARACTER_STATUS,
-            ObjectPositionType.SKILL,
-        ], "self can only be used for objects in character skill or character_status"
-        current_objs = [
-            match.player_tables[object_position.player_idx].characters[
-                object_position.character_idx
+    results = []
+    while "and" in tokens:
+        and_index = tokens.index("and")
+        results.append(tokens[:and_index])
+        tokens = tokens[and_index + 1 :]
+    results.append(tokens)
+    return results
+
+
+def _raise_step(error_type: type, *error_args: Any) -> Callable[..., Any]:
+    """
+    Make a step that raises error when running.
+    """
+
+    def step(*argv: Any) -> Any:
+        raise error_type(*error_args)
+
+    return step
+
+
+def _compile_select(first: str) -> QuerySelect:
+    """
+    Compile first token of a query command.
+    """
+    if first == "self":
+
+        def select(object_position: Any, match: Any) -> List[Any]:
+            assert object_position.area in [
+                ObjectPositionType.CHARACTER,
+                ObjectPositionType.CHARACTER_STATUS,
+                ObjectPositionType.SKILL,
+            ], (
+                "self can only be used for objects in character skill or "
+                "character_status"
+            )
+            return [
+                match.player_tables[object_position.player_idx].characters[
+                    object_position.character_idx
+                ]
             ]
-        ]
-    elif command[0] == "both":
-        current_objs = [match.player_tables[0], match.player_tables[1]]
-    elif command[0] == "our":
-        current_objs = [match.player_tables[object_position.player_idx]]
-    elif command[0] == "opponent":
-        current_objs = [match.player_tables[1 - object_position.player_idx]]
+
+    elif first == "both":
+
+        def select(object_position: Any, match: Any) -> List[Any]:
+            return [match.player_tables[0], match.player_tables[1]]
+
+    elif first == "our":
+
+        def select(object_position: Any, match: Any) -> List[Any]:
+            return [match.player_tables[object_position.player_idx]]
+
+    elif first == "opponent":
+
+        def select(object_position: Any, match: Any) -> List[Any]:
+            return [match.player_tables[1 - object_position.player_idx]]
+
     else:
-        raise ValueError(
-            f"first token must be both, our, opponent, or self. input is {command[0]}"
+        return _raise_step(
+            ValueError,
+            f"first token must be both, our, opponent, or self. input is {first}",
         )
-    for cmd in command[1:]:
-        if cmd in [
-            "active",
-            "prev",
-            "next",
-            "deck",
-            "hand",
-            "character",
-            "team_status",
-            "summon",
-            "support",
-        ]:
+    return select
+
+
+def _compile_step(cmd: str) -> QueryStep:
+    """
+    Compile one token after first token of a query command.
+    """
+    if cmd in _TABLE_COMMANDS:
+
+        def check(current_objs: List[Any]) -> None:
             for obj in current_objs:
                 assert obj.__class__.__name__ == "PlayerTable", (
                     f"object must be a player_table with command {cmd}, "
                     f"current object is {obj.__class__.__name__}"
                 )
-            if cmd == "active":
-                current_objs = [x.get_active_character() for x in current_objs]
-            elif cmd == "prev":
+
+        if cmd == "active":
+
+            def step(current_objs: List[Any]) -> List[Any]:
+                check(current_objs)
+                return [x.get_active_character() for x in current_objs]
+
+        elif cmd == "prev":
+
+            def step(current_objs: List[Any]) -> List[Any]:
+                check(current_objs)
                 current_objs = [
                     x.characters[x.previous_character_idx()] for x in current_objs
                 ]
-                current_objs = [x for x in current_objs if x is not None]
-            elif cmd == "next":
+                return [x for x in current_objs if x is not None]
+
+        elif cmd == "next":
+
+            def step(current_objs: List[Any]) -> List[Any]:
+                check(current_objs)
                 current_objs = [
                     x.characters[x.next_character_idx()] for x in current_objs
                 ]
-                current_objs = [x for x in current_objs if x is not None]
-            elif cmd == "deck":
-                current_objs = sum([x.table_deck for x in current_objs], [])
-            elif cmd == "hand":
-                current_objs = sum([x.hands for x in current_objs], [])
-            elif cmd == "character":
-                current_objs = sum([x.characters for x in current_objs], [])
-            elif cmd == "team_status":
-                current_objs = sum([x.team_status for x in current_objs], [])
-            elif cmd == "summon":
-                current_objs = sum([x.summons for x in current_objs], [])
-            else:
-                assert cmd == "support"
-                current_objs = sum([x.supports for x in current_objs], [])
-        elif cmd in ["weapon", "artifact", "talent", "status", "skill"]:
+                return [x for x in current_objs if x is not None]
+
+        else:
+            attr = _TABLE_LIST_ATTRS[cmd]
+
+            def step(current_objs: List[Any]) -> List[Any]:
+                check(current_objs)
+                return [y for x in current_objs for y in getattr(x, attr)]
+
+    elif cmd in _CHARACTER_COMMANDS:
+
+        def check(current_objs: List[Any]) -> None:
             for obj in current_objs:
                 assert (
                     obj.__class__.__name__ != "PlayerTable"
@@ -83,24 +169,53 @@ def _query(object_position: Any, match: Any, command: List[str]) -> List[Any]:
                     f"object must be a character with command {cmd}, "
                     f"current object is {obj.__class__.__name__}"
                 )
-            if cmd in ["weapon", "artifact", "talent"]:
+
+        if cmd in _CHARACTER_LIST_ATTRS:
+            attr = _CHARACTER_LIST_ATTRS[cmd]
+
+            def step(current_objs: List[Any]) -> List[Any]:
+                check(current_objs)
+                return [y for x in current_objs for y in getattr(x, attr)]
+
+        else:
+
+            def step(current_objs: List[Any]) -> List[Any]:
+                check(current_objs)
                 current_objs = [getattr(x, cmd) for x in current_objs]
-                current_objs = [x for x in current_objs if x is not None]
-            elif cmd == "status":
-                current_objs = sum([x.status for x in current_objs], [])
-            else:
-                assert cmd == "skill"
-                current_objs = sum([x.skills for x in current_objs], [])
-        elif "=" in cmd:
+                return [x for x in current_objs if x is not None]
+
+    elif "=" in cmd:
+        try:
             key, value = cmd.split("=")
-            current_objs = [
-                x
-                for x in current_objs
-                if str(getattr(x, key, None)).lower() == value.lower()
+        except ValueError as e:
+            return _raise_step(type(e), *e.args)
+        value = value.lower()
+
+        def step(current_objs: List[Any]) -> List[Any]:
+            return [
+                x for x in current_objs if str(getattr(x, key, None)).lower() == value
             ]
+
+    else:
+        return _raise_step(ValueError, f"unknown command {cmd}")
+    return step
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _compile_query(command: str) -> Tuple[Tuple[QuerySelect, Tuple[QueryStep, ...]]]:
+    """
+    Compile query command into plan. The plan contains one part for each
+    command split by `and`, and each part contains a select function for the
+    first token and step functions for other tokens.
+    """
+    plan = []
+    for tokens in _split_and(shlex.split(command)):
+        if len(tokens) == 0:
+            select = _raise_step(AssertionError, "command is empty")
         else:
-            raise ValueError(f"unknown command {cmd}")
-    return current_objs
+            select = _compile_select(tokens[0])
+        plan.append((select, tuple(_compile_step(cmd) for cmd in tokens[1:])))
+    return tuple(plan)  # type: ignore
 
 
 def query(object_position: Any, match: Any, command: str) -> List[Any]:
@@ -129,18 +244,12 @@ def query(object_position: Any, match: Any, command: str) -> List[Any]:
     - `both summon` to get all summons on field
     - `self and our active and our next` to select characters
     """
-    tokens = shlex.split(command)
     results = []
-    while True:
-        and_index = -1
-        if "and" in tokens:
-            and_index = tokens.index("and")
-        if and_index == -1:
-            results.extend(_query(object_position, match, tokens))
-            break
-        else:
-            results.extend(_query(object_position, match, tokens[:and_index]))
-            tokens = tokens[and_index + 1 :]
+    for select, steps in _compile_query(command):
+        current_objs = select(object_position, match)
+        for step in steps:
+            current_objs = step(current_objs)
+        results.extend(current_objs)
     return results
 
 
@@ -159,32 +268,39 @@ def query_one(
     return result[0]
 
 
-def _satisfy_single_position(
-    object_position: Any, command: List[str], match: Any | None
-) -> bool:
+SatisfyCheck = Callable[[Any, Any, Any], bool]
+
+
+def _compile_single_position(cmd: str) -> Callable[[Any, Any], bool]:
     """
-    deal with one object position and command, return if the object position satisfies
-    the command. match is optional. if not provided, some command will raise error.
+    Compile one check of one object position. Returned function receives object
+    position and match, and returns if the position satisfies the check.
     """
-    for cmd in command:
-        if "=" not in cmd:
-            raise ValueError(f"command {cmd} is not valid")
+    if "=" not in cmd:
+        return _raise_step(ValueError, f"command {cmd} is not valid")
+    try:
         key, value = cmd.split("=")
+    except ValueError as e:
+        return _raise_step(type(e), *e.args)
+    if key in ["pidx", "player", "cidx", "character", "id"]:
+        try:
+            int_value = int(value)
+        except ValueError as e:
+            return _raise_step(type(e), *e.args)
         if key == "pidx" or key == "player":
-            if object_position.player_idx != int(value):
-                return False
+            return lambda position, match: position.player_idx == int_value
         elif key == "cidx" or key == "character":
-            if object_position.character_idx != int(value):
-                return False
-        elif key == "area":
-            if object_position.area.name.lower() != value.lower():
-                return False
-        elif key == "id":
-            if object_position.id != int(value):
-                return False
-        elif key == "active":
-            value = value.lower()
-            if object_position.character_idx == -1:
+            return lambda position, match: position.character_idx == int_value
+        else:
+            return lambda position, match: position.id == int_value
+    elif key == "area":
+        value = value.lower()
+        return lambda position, match: position.area.name.lower() == value
+    elif key == "active":
+        value = value.lower()
+
+        def check(position: Any, match: Any) -> bool:
+            if position.character_idx == -1:
                 raise ValueError("active can only be used with valid character index")
             if match is None:
                 raise AssertionError(
@@ -194,62 +310,93 @@ def _satisfy_single_position(
                 raise ValueError(
                     f"active value {value} is not valid, should be true or false"
                 )
-            table = match.player_tables[object_position.player_idx]
+            table = match.player_tables[position.player_idx]
             active_idx = table.active_character_idx
-            value = value == "true"
-            if (active_idx == object_position.character_idx) != value:
-                return False
-        else:
-            raise ValueError(f"unknown command {cmd}")
-    return True
+            return (active_idx == position.character_idx) == (value == "true")
+
+        return check
+    else:
+        return _raise_step(ValueError, f"unknown command {cmd}")
 
 
-def _satisfy_between_position(source: Any, target: Any, command: List[str]) -> bool:
+def _compile_between_position(cmd: str) -> Callable[[Any, Any], bool]:
     """
-    deal with two object positions and command, return if the two object positions
-    satisfy the command.
+    Compile one check between two object positions. Returned function receives
+    source and target position, and returns if they satisfy the check.
     """
-    for cmd in command:
-        if "=" not in cmd:
-            raise ValueError(f"command {cmd} is not valid")
+    if "=" not in cmd:
+        return _raise_step(ValueError, f"command {cmd} is not valid")
+    try:
         key, value = cmd.split("=")
-        if value not in ["same", "diff"]:
-            raise ValueError(f"value {value} is not valid, should be same or diff")
-        value = value == "same"
-        if key == "pidx" or key == "player":
-            if (source.player_idx == target.player_idx) != value:
-                return False
-        elif key == "cidx" or key == "character":
-            if (source.character_idx == target.character_idx) != value:
-                return False
-        elif key == "area":
-            if (source.area == target.area) != value:
-                return False
-        elif key == "id":
-            if (source.id == target.id) != value:
-                return False
-        else:
-            raise ValueError(f"unknown command {cmd}")
-    return True
+    except ValueError as e:
+        return _raise_step(type(e), *e.args)
+    if value not in ["same", "diff"]:
+        return _raise_step(
+            ValueError, f"value {value} is not valid, should be same or diff"
+        )
+    same = value == "same"
+    if key == "pidx" or key == "player":
+        attr = "player_idx"
+    elif key == "cidx" or key == "character":
+        attr = "character_idx"
+    elif key == "area":
+        attr = "area"
+    elif key == "id":
+        attr = "id"
+    else:
+        return _raise_step(ValueError, f"unknown command {cmd}")
+    return (
+        lambda source, target: (getattr(source, attr) == getattr(target, attr)) == same
+    )
 
 
-def _satisfy_one(
-    source: Any, target: Any | None, command: List[str], match: Any | None
-) -> bool:
+def _compile_satisfy_one(command: List[str]) -> SatisfyCheck:
     """
-    deal with one command without and.
+    Compile one command without and. Returned function receives source, target
+    and match, and returns if they satisfy the command.
     """
-    assert command != "and", "command should not contain and"
+    if len(command) == 0:
+        # same as indexing first token of an empty command
+        return _raise_step(IndexError, "list index out of range")
     if command[0] == "both":
-        assert target is not None, "target is not provided"
-        return _satisfy_between_position(source, target, command[1:])
-    elif command[0] == "source":
-        return _satisfy_single_position(source, command[1:], match)
-    elif command[0] == "target":
-        assert target is not None, "target is not provided"
-        return _satisfy_single_position(target, command[1:], match)
+        checks = [_compile_between_position(cmd) for cmd in command[1:]]
+
+        def satisfy_one(source: Any, target: Any, match: Any) -> bool:
+            assert target is not None, "target is not provided"
+            for check in checks:
+                if not check(source, target):
+                    return False
+            return True
+
+    elif command[0] == "source" or command[0] == "target":
+        is_source = command[0] == "source"
+        checks = [_compile_single_position(cmd) for cmd in command[1:]]
+
+        def satisfy_one(source: Any, target: Any, match: Any) -> bool:
+            if is_source:
+                position = source
+            else:
+                assert target is not None, "target is not provided"
+                position = target
+            for check in checks:
+                if not check(position, match):
+                    return False
+            return True
+
     else:
-        raise ValueError(f"unknown command {command[0]}")
+        return _raise_step(ValueError, f"unknown command {command[0]}")
+    return satisfy_one
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _compile_satisfy(command: str) -> Tuple[SatisfyCheck, ...]:
+    """
+    Compile satisfy command into plan, which contains one check function for
+    each command split by `and`.
+    """
+    return tuple(
+        _compile_satisfy_one(tokens) for tokens in _split_and(shlex.split(command))
+    )
 
 
 def satisfy(
@@ -277,14 +424,7 @@ def satisfy(
     - `both pidx=same and source area=hand and target area=skill` self in hand and
         target is this player use skill
     """
-    tokens = shlex.split(command)
-    while True:
-        and_index = -1
-        if "and" in tokens:
-            and_index = tokens.index("and")
-        if and_index == -1:
-            return _satisfy_one(source, target, tokens, match)
-        else:
-            if not _satisfy_one(source, target, tokens[:and_index], match):
-                return False
-            tokens = tokens[and_index + 1 :]
+    for check in _compile_satisfy(command):
+        if not check(source, target, match):
+            return False
+    return True
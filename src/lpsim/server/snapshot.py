@@ -0,0 +1,393 @@
+"""
+Structural sharing snapshots of pydantic model trees.
+
+A snapshot is a read-only copy of a model tree. When taking snapshots of the same
+live tree repeatedly, nodes that have not changed since the last snapshot are shared
+between snapshots instead of being copied again. There is no dirty tracking on
+live nodes, so every snapshot still walks the whole live tree, and unchanged nodes
+are found by a shallow compare of field values against the previous frozen node.
+Only changed nodes and their ancestors are newly created, so memory of histories
+is decided by the number of changed nodes, while time of a snapshot is decided by
+the size of the tree.
+
+As shared nodes are known to be the same, difference between two snapshots can
+be calculated by `diff_snapshot` without visiting shared nodes.
+
+A snapshot taken by `SnapshotCache.checkpoint` also keeps which live node each
+frozen node is taken from, so the live tree can be rolled back to it in place by
+`SnapshotCache.rollback`. Rolling back takes a new snapshot to find changed
+nodes, and only changed nodes are restored.
+
+Frozen nodes MUST NOT be modified, as they may be referenced by multiple snapshots.
+To get a modifiable object from a snapshot, use `copy(deep=True)` on it.
+"""
+
+
+import copy
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from dictdiffer.utils import EPSILON, are_different
+from pydantic import BaseModel
+
+
+_PRIMITIVE_TYPES = (str, int, float, bool, type(None), Enum)
+
+
+def _same(a: Any, b: Any) -> bool:
+    """
+    Check whether frozen value a can be replaced by previous frozen value b.
+    """
+    if a is b:
+        return True
+    if isinstance(a, _PRIMITIVE_TYPES) and type(a) is type(b):
+        return a == b
+    return False
+
+
+class Checkpoint:
+    """
+    A snapshot that the live tree can be rolled back to.
+
+    Attributes:
+        root: The snapshot, it should not be modified.
+        nodes: Live nodes and their frozen nodes in the snapshot, keyed by id of
+            live nodes.
+        private: Values of private attributes of the root that are saved and
+            restored by the owner of the tree, as they are not in snapshots.
+    """
+
+    def __init__(
+        self,
+        root: BaseModel,
+        nodes: Dict[int, Tuple[BaseModel, BaseModel]],
+        private: Dict[str, Any] | None = None,
+    ):
+        self.root = root
+        self.nodes = nodes
+        self.private = {} if private is None else private
+
+
+class SnapshotCache:
+    """
+    Keeps frozen nodes of the last snapshot, keyed by the identity of live nodes.
+    One cache should only be used to take snapshots of one live tree.
+
+    Args:
+        exclude_private (Set[str]): Names of private attributes that will not be
+            copied into frozen nodes, they will use their default values.
+    """
+
+    def __init__(self, exclude_private: Set[str] = set()):
+        self.exclude_private = exclude_private
+        self._nodes: Dict[int, Tuple[BaseModel, BaseModel]] = {}
+
+    def clear(self) -> None:
+        self._nodes = {}
+
+    @classmethod
+    def from_clone(
+        cls,
+        frozen_models: Dict[int, BaseModel],
+        memo: Dict[int, Any],
+        exclude_private: Set[str] = set(),
+    ) -> "SnapshotCache":
+        """
+        Create a cache for a live tree that is cloned from a snapshot by
+        `fast_clone`, so snapshots of the cloned tree share unchanged nodes with
+        the original snapshot.
+
+        Args:
+            frozen_models: Nodes of the original snapshot, keyed by id, can be
+                get by `collect_models`.
+            memo: The memo used by `fast_clone`, which maps id of original nodes
+                to cloned nodes.
+            exclude_private: Same as `SnapshotCache`.
+        """
+        cache = cls(exclude_private)
+        for key, clone in memo.items():
+            frozen = frozen_models.get(key)
+            if frozen is not None:
+                cache._nodes[id(clone)] = (clone, frozen)
+        return cache
+
+    def snapshot(self, root: BaseModel) -> Any:
+        """
+        Take a snapshot of the live tree. Nodes that are not reachable from root
+        anymore are dropped from the cache.
+        """
+        new_nodes: Dict[int, Tuple[BaseModel, BaseModel]] = {}
+        result = self._freeze_model(root, new_nodes)
+        self._nodes = new_nodes
+        return result
+
+    def checkpoint(self, root: BaseModel) -> Checkpoint:
+        """
+        Take a snapshot of the live tree that it can be rolled back to.
+        """
+        frozen = self.snapshot(root)
+        # _nodes is replaced instead of modified by later snapshots, so it is
+        # safe to keep it in the checkpoint.
+        return Checkpoint(frozen, self._nodes)
+
+    def rollback(self, root: BaseModel, checkpoint: Checkpoint) -> None:
+        """
+        Restore the live tree in place to the state of a checkpoint taken by
+        this cache. Nodes are found by taking a new snapshot, which walks the
+        whole live tree, and only nodes whose frozen nodes are different from the checkpoint are restored from
+        the checkpoint. Restored nodes are the same objects as when the
+        checkpoint was taken, and nodes created after it are dropped from the
+        tree. A checkpoint can be rolled back to multiple times, and
+        checkpoints taken later stay valid after rolling back to an earlier one.
+        """
+        nodes = checkpoint.nodes
+        root_node = nodes.get(id(root))
+        if root_node is None or root_node[0] is not root:
+            raise ValueError("Checkpoint is not taken from this tree.")
+        self.snapshot(root)
+        current = self._nodes
+        live_nodes = {id(frozen): live for live, frozen in nodes.values()}
+        for key, (live, frozen) in nodes.items():
+            node = current.get(key)
+            if node is not None and node[0] is live and node[1] is frozen:
+                continue
+            self._restore_model(live, frozen, live_nodes)
+        # live nodes are same as the checkpoint now, share its frozen nodes.
+        self._nodes = nodes
+
+    def _thaw(self, value: Any, live_nodes: Dict[int, BaseModel]) -> Any:
+        """
+        Convert a frozen value back into a live value. Frozen models are
+        replaced by their live nodes, and containers are re-created as frozen
+        ones may be shared.
+        """
+        if isinstance(value, _PRIMITIVE_TYPES):
+            return value
+        if isinstance(value, BaseModel):
+            return live_nodes[id(value)]
+        if isinstance(value, list):
+            return [self._thaw(v, live_nodes) for v in value]
+        if isinstance(value, tuple):
+            return tuple(self._thaw(v, live_nodes) for v in value)
+        if isinstance(value, dict):
+            return {k: self._thaw(v, live_nodes) for k, v in value.items()}
+        return copy.deepcopy(value)
+
+    def _restore_model(
+        self, live: BaseModel, frozen: BaseModel, live_nodes: Dict[int, BaseModel]
+    ) -> None:
+        values = {
+            name: self._thaw(value, live_nodes)
+            for name, value in frozen.__dict__.items()
+        }
+        object.__setattr__(live, "__dict__", values)
+        object.__setattr__(live, "__fields_set__", set(frozen.__fields_set__))
+        for name in frozen.__private_attributes__:
+            if name in self.exclude_private or not hasattr(frozen, name):
+                continue
+            value = self._thaw(getattr(frozen, name), live_nodes)
+            object.__setattr__(live, name, value)
+
+    def _freeze(self, value: Any, prev: Any, new_nodes: Dict) -> Any:
+        """
+        Freeze one value. prev is the frozen value at the same place in the last
+        snapshot, and will be returned when nothing is changed.
+        """
+        if isinstance(value, _PRIMITIVE_TYPES):
+            return value
+        if isinstance(value, BaseModel):
+            return self._freeze_model(value, new_nodes)
+        if isinstance(value, (list, tuple)):
+            if type(prev) is not type(value) or len(prev) != len(value):
+                prev = None
+            items = [
+                self._freeze(v, None if prev is None else prev[i], new_nodes)
+                for i, v in enumerate(value)
+            ]
+            if prev is not None and all(_same(a, b) for a, b in zip(items, prev)):
+                return prev
+            return items if isinstance(value, list) else tuple(items)
+        if isinstance(value, dict):
+            if not isinstance(prev, dict) or prev.keys() != value.keys():
+                prev = None
+            items = {
+                k: self._freeze(v, None if prev is None else prev[k], new_nodes)
+                for k, v in value.items()
+            }
+            if prev is not None and all(_same(v, prev[k]) for k, v in items.items()):
+                return prev
+            return items
+        # unknown types, always copy
+        return copy.deepcopy(value)
+
+    def _freeze_model(self, model: BaseModel, new_nodes: Dict) -> BaseModel:
+        """
+        Freeze one live node. All fields of the node are visited and compared
+        with its frozen node in the last snapshot, and the previous frozen node
+        is returned if nothing is changed, so only changed nodes are created.
+        """
+        key = id(model)
+        if key in new_nodes:
+            # referenced multiple times in one tree, keep the sharing
+            return new_nodes[key][1]
+        cached = self._nodes.get(key)
+        prev = cached[1] if cached is not None and cached[0] is model else None
+        prev_values: Dict[str, Any] = {} if prev is None else prev.__dict__
+        changed = prev is None or len(prev_values) != len(model.__dict__)
+        values: Dict[str, Any] = {}
+        for name, value in model.__dict__.items():
+            prev_value = prev_values.get(name)
+            frozen_value = self._freeze(value, prev_value, new_nodes)
+            values[name] = frozen_value
+            if not changed and not _same(frozen_value, prev_value):
+                changed = True
+        private_values: Dict[str, Any] = {}
+        for name in model.__private_attributes__:
+            if name in self.exclude_private or not hasattr(model, name):
+                continue
+            prev_value = None if prev is None else getattr(prev, name, None)
+            frozen_value = self._freeze(getattr(model, name), prev_value, new_nodes)
+            private_values[name] = frozen_value
+            if not changed and not _same(frozen_value, prev_value):
+                changed = True
+        if changed:
+            frozen = model.__class__.__new__(model.__class__)
+            object.__setattr__(frozen, "__dict__", values)
+            object.__setattr__(frozen, "__fields_set__", set(model.__fields_set__))
+            frozen._init_private_attributes()
+            for name, value in private_values.items():
+                object.__setattr__(frozen, name, value)
+        else:
+            assert prev is not None
+            frozen = prev
+        new_nodes[key] = (model, frozen)
+        return frozen
+
+
+def _dict_value(value: Any) -> Any:
+    """
+    Convert a frozen value into the same form as `BaseModel.dict()`.
+    """
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, (list, tuple)):
+        return value.__class__(_dict_value(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _dict_value(v) for k, v in value.items()}
+    return copy.deepcopy(value)
+
+
+def snapshot_to_dict(value: Any) -> Any:
+    """
+    Convert a snapshot, or dicts and lists that contain snapshots, into the
+    same form as `BaseModel.dict()`.
+    """
+    return _dict_value(value)
+
+
+def _dotted(node: List[Any]) -> str | List[Any]:
+    if all(isinstance(x, str) and "." not in x for x in node):
+        return ".".join(node)
+    return list(node)
+
+
+def _diff_recursive(first: Any, second: Any, node: List[Any]) -> Iterator[Tuple]:
+    if first is second:
+        # shared node, no difference
+        return
+    first_is_dict = isinstance(first, (dict, BaseModel))
+    second_is_dict = isinstance(second, (dict, BaseModel))
+    if first_is_dict and second_is_dict:
+        first_dict = first.__dict__ if isinstance(first, BaseModel) else first
+        second_dict = second.__dict__ if isinstance(second, BaseModel) else second
+        for key in first_dict:
+            if key in second_dict:
+                yield from _diff_recursive(
+                    first_dict[key], second_dict[key], node + [key]
+                )
+        addition = [k for k in second_dict if k not in first_dict]
+        deletion = [k for k in first_dict if k not in second_dict]
+    elif isinstance(first, list) and isinstance(second, list):
+        common = min(len(first), len(second))
+        for key in range(common):
+            yield from _diff_recursive(first[key], second[key], node + [key])
+        second_dict = second
+        addition = list(range(common, len(second)))
+        deletion = list(reversed(range(common, len(first))))
+    else:
+        first_value = _dict_value(first)
+        second_value = _dict_value(second)
+        if are_different(first_value, second_value, EPSILON):
+            yield "change", _dotted(node), (first_value, second_value)
+        return
+    if addition:
+        yield (
+            "add",
+            _dotted(node),
+            [(key, _dict_value(second_dict[key])) for key in addition],
+        )
+    if deletion:
+        # values of removed items are not recorded
+        yield "remove", _dotted(node), [(key, None) for key in deletion]
+
+
+def collect_models(root: BaseModel, exclude_private: Set[str] = set()) -> Dict:
+    """
+    Get all models in a tree including root, keyed by id.
+    """
+    res: Dict[int, BaseModel] = {}
+
+    def collect(value: Any) -> None:
+        if isinstance(value, BaseModel):
+            if id(value) in res:
+                return
+            res[id(value)] = value
+            for v in value.__dict__.values():
+                collect(v)
+            for name in value.__private_attributes__:
+                if name not in exclude_private and hasattr(value, name):
+                    collect(getattr(value, name))
+        elif isinstance(value, (list, tuple)):
+            for v in value:
+                collect(v)
+        elif isinstance(value, dict):
+            for v in value.values():
+                collect(v)
+
+    collect(root)
+    return res
+
+
+def same_snapshot(
+    first: BaseModel, second: BaseModel, exclude_fields: Set[str] = set()
+) -> bool:
+    """
+    Check whether two snapshots have no difference, except excluded fields of
+    root. Same as `diff_snapshot`, nodes shared by two snapshots are skipped,
+    and it returns when the first difference is found.
+    """
+    if first is second:
+        return True
+    first_dict = first.__dict__
+    second_dict = second.__dict__
+    if first_dict.keys() != second_dict.keys():
+        return False
+    for key, value in first_dict.items():
+        if key in exclude_fields:
+            continue
+        if next(_diff_recursive(value, second_dict[key], [key]), None) is not None:
+            return False
+    return True
+
+
+def diff_snapshot(first: BaseModel, second: BaseModel) -> List[Tuple]:
+    """
+    Get difference between two snapshots in the format of
+    `dictdiffer.diff(first.dict(), second.dict())`, except that values of
+    `remove` are set to None. Nodes shared by two snapshots are skipped, so when
+    they are taken from the same cache, the cost is decided by changed nodes
+    instead of the whole tree.
+    It also works for models that are not snapshots, but they should not be
+    modified during diff.
+    """
+    return list(_diff_recursive(first, second, []))
@@ -1,4 +1,4 @@
-from typing import List, Any, Literal
+from typing import Dict, List, Any, Literal, Tuple
 
 from .query import satisfy
 
@@ -213,6 +213,22 @@ class MultipleObjectPosition(BaseModel):
     positions: List[ObjectPosition]
 
 
+# index of die colors in count vectors of dice
+DIE_COLOR_IDX: Dict[DieColor, int] = {color: idx for idx, color in enumerate(DieColor)}
+DIE_COLOR_NUMBER = len(DIE_COLOR_IDX)
+OMNI_IDX = DIE_COLOR_IDX[DieColor.OMNI]
+
+
+def count_dice_colors(colors: List[DieColor]) -> List[int]:
+    """
+    Count dice of each color. The result is indexed by `DIE_COLOR_IDX`.
+    """
+    counts = [0] * DIE_COLOR_NUMBER
+    for color in colors:
+        counts[DIE_COLOR_IDX[color]] += 1
+    return counts
+
+
 class Cost(BaseModel):
     """
     The cost, which is used to define original costs of objects.
@@ -232,13 +248,14 @@ class Cost(BaseModel):
     def copy(self, *argv, **kwargs) -> "Cost":
         """
         Do not support extra args. When perform copy, create new
-        instance instead of copy.
+        instance instead of copy. As all fields are already validated, the
+        new instance is created without validation.
         """
         assert len(argv) == 0 and len(kwargs) == 0, "Do not support extra args"
         ori_copy = None
         if self.original_value is not None:  # pragma: no cover
             ori_copy = self.original_value.copy()
-        return Cost(
+        return Cost.construct(
             label=self.label,
             elemental_dice_number=self.elemental_dice_number,
             elemental_dice_color=self.elemental_dice_color,
@@ -305,6 +322,17 @@ class Cost(BaseModel):
                 value strictly. If False, the dice colors can be more than the
                 cost. Note charges always match unstictly.
         """
+        return self.is_valid_counts(
+            count_dice_colors(dice_colors), charge, arcane_legend, strict
+        )
+
+    def is_valid_counts(
+        self, counts: List[int], charge: int, arcane_legend: bool, strict=True
+    ) -> bool:
+        """
+        Same as `is_valid`, but dice are given by number of each color, which
+        is indexed by `DIE_COLOR_IDX`.
+        """
         # first charge check
         if charge < self.charge:
             return False
@@ -327,45 +355,86 @@ class Cost(BaseModel):
         assert not (
             self.elemental_dice_number > 0 and self.elemental_dice_color is None
         ), "Elemental dice number and color should be both set."
+        dice_number = sum(counts)
         if strict:
-            if len(dice_colors) != (
-                self.elemental_dice_number
-                + self.same_dice_number
-                + self.any_dice_number
-                + self.omni_dice_number
-            ):
+            if dice_number != self.total_dice_cost:
                 return False  # dice number not match
         else:
-            if len(dice_colors) < (
-                self.elemental_dice_number
-                + self.same_dice_number
-                + self.any_dice_number
-                + self.omni_dice_number
-            ):
+            if dice_number < self.total_dice_cost:
                 return False  # dice number not enough
-        d = {}
-        for color in dice_colors:
-            d[color] = d.get(color, 0) + 1
-        omni_num = d.get(DieColor.OMNI, 0)
+        omni_num = counts[OMNI_IDX]
         if self.elemental_dice_number > 0:
-            ele_num = d.get(self.elemental_dice_color, 0)
+            ele_num = counts[DIE_COLOR_IDX[self.elemental_dice_color]]  # type: ignore
             if ele_num + omni_num < self.elemental_dice_number:
                 return False  # elemental dice not enough
         if self.same_dice_number > 0:
-            if DieColor.OMNI not in d:
-                d[DieColor.OMNI] = 0
-            if d[DieColor.OMNI] >= self.same_dice_number:
+            if omni_num >= self.same_dice_number:
                 return True
-            success = False
-            for color, same_num in d.items():
-                if color == DieColor.OMNI:
-                    continue
-                if same_num + omni_num >= self.same_dice_number:
-                    success = True
-                    break
-            return success
+            for idx, same_num in enumerate(counts):
+                if idx != OMNI_IDX and same_num + omni_num >= self.same_dice_number:
+                    return True
+            return False
         return True
 
+    def select_dice(
+        self, counts: List[int], values: List[int] | None = None
+    ) -> List[int] | None:
+        """
+        Select dice to pay the cost. Dice with lower values are used first,
+        and omni dice are only used when dice of needed color are not enough.
+        Charge and arcane legend are not checked.
+
+        Args:
+            counts (List[int]): Number of dice of each color.
+            values (List[int] | None): Value of each color, dice of lower
+                value are used first. If None, omni dice have higher value
+                than other colors.
+
+        Returns:
+            Number of selected dice of each color, or None if dice are not
+            enough.
+        """
+        if values is None:
+            values = [0] * DIE_COLOR_NUMBER
+            values[OMNI_IDX] = 1
+        remain = list(counts)
+        selected = [0] * DIE_COLOR_NUMBER
+
+        def use(idx: int, number: int) -> int:
+            number = min(number, remain[idx])
+            remain[idx] -= number
+            selected[idx] += number
+            return number
+
+        if self.elemental_dice_number > 0:
+            idx = DIE_COLOR_IDX[self.elemental_dice_color]  # type: ignore
+            number = self.elemental_dice_number - use(idx, self.elemental_dice_number)
+            if use(OMNI_IDX, number) < number:
+                return None
+        if self.same_dice_number > 0:
+            number = self.same_dice_number
+            best: Tuple[int, int, int] | None = None
+            for idx, same_num in enumerate(remain):
+                if idx == OMNI_IDX or same_num == 0:
+                    continue
+                if same_num + remain[OMNI_IDX] < number:
+                    continue
+                # prefer the color that uses least omni dice, then lower value
+                key = (max(number - same_num, 0), values[idx], idx)
+                if best is None or key < best:
+                    best = key
+            if best is not None:
+                number -= use(best[2], number)
+            if use(OMNI_IDX, number) < number:
+                return None
+        if self.any_dice_number > 0:
+            number = self.any_dice_number
+            for idx in sorted(range(DIE_COLOR_NUMBER), key=lambda x: (values[x], x)):
+                number -= use(idx, number)
+            if number > 0:
+                return None
+        return selected
+
 
 class DeckRestriction(BaseModel):
     """
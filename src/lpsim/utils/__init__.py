@@ -1,7 +1,9 @@
+import copy
 import pydantic
 import os
 import importlib
-from typing import List, Literal, get_origin, get_type_hints
+from enum import Enum
+from typing import Any, Dict, List, Literal, get_origin, get_type_hints
 from .class_registry import (  # noqa: F401
     register_class,
     get_instance,
@@ -18,12 +20,72 @@ from .deck_code import (  # noqa: F401
     deck_code_to_deck_str,
     deck_str_to_deck_code,
 )
+from .registry_manifest import lazy_import_enabled
+
+
+_IMMUTABLE_TYPES = (str, int, float, bool, type(None), Enum, type)
+
+
+def _fast_clone_value(value: Any, memo: Dict[int, Any]) -> Any:
+    """
+    Clone a value for `BaseModel.fast_clone`. Models are cloned by
+    `fast_clone` and kept in memo, so one model referenced multiple times is
+    still shared in the cloned tree. Lists, tuples and dicts are cloned
+    recursively, and other unknown types are deep copied.
+    """
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return value
+    if isinstance(value, pydantic.BaseModel):
+        res = memo.get(id(value))
+        if res is None:
+            if isinstance(value, BaseModel):
+                res = value.fast_clone(memo)
+            else:
+                res = value.copy(deep=True)
+                memo[id(value)] = res
+        return res
+    if isinstance(value, list):
+        return [_fast_clone_value(v, memo) for v in value]
+    if isinstance(value, dict):
+        return {k: _fast_clone_value(v, memo) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_fast_clone_value(v, memo) for v in value)
+    return copy.deepcopy(value)
 
 
 class BaseModel(pydantic.BaseModel):
     class Config:
         extra = pydantic.Extra.forbid  # default forbid extra fields
 
+    def fast_clone(self, memo: Dict[int, Any] | None = None) -> Any:
+        """
+        Clone the model and all its fields and private attributes. Different
+        from `copy(deep=True)`, it does not go through `copy.deepcopy`, and
+        same as it, no validators or `__init__` are called, so ids of objects
+        are not renewed. The clone is semantically identical to the original.
+
+        Args:
+            memo: Models that already cloned, keyed by id of original models.
+                It is used when cloning from a parent model, and should be None
+                when called outside.
+        """
+        if memo is None:
+            memo = {}
+        cls = self.__class__
+        res = cls.__new__(cls)
+        memo[id(self)] = res
+        object.__setattr__(
+            res,
+            "__dict__",
+            {k: _fast_clone_value(v, memo) for k, v in self.__dict__.items()},
+        )
+        object.__setattr__(res, "__fields_set__", set(self.__fields_set__))
+        for name in self.__private_attributes__:
+            if hasattr(self, name):
+                value = _fast_clone_value(getattr(self, name), memo)
+                object.__setattr__(res, name, value)
+        return res
+
 
 def list_unique_range_right(data: List[int], minn: int, maxn: int) -> bool:
     """
@@ -43,7 +105,12 @@ def import_all_modules(py_file: str, name: str, exceptions: set[str] = set()) ->
     and they can do default actions, i.e. register themselves to the class
     registry. To expose inner modules and classes, cannot use this function,
     import manually instead.
+
+    When lazy import is enabled, modules are not imported here, and they will
+    be imported when their classes are used. Check `registry_manifest.py`.
     """
+    if lazy_import_enabled():
+        return
     for file in os.listdir(os.path.dirname(py_file)):
         if file[0] == "_" or file[0] == ".":
             continue
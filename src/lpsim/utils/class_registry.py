@@ -14,6 +14,9 @@ from .desc_registry import DescDictType, update_desc
 
 instance_factory = InstanceFactory()
 
+# classes whose event handlers and value modifiers are registered
+_handler_registered_classes: Set[type] = set()
+
 
 def _is_union_type(t) -> bool:
     return (
@@ -32,18 +35,78 @@ def register_base_class(base_class: Any):
     return
 
 
+def register_handlers(cls: type) -> None:
+    """
+    Register event handlers and value modifiers of a class. A class is only
+    scanned once, and names of its handlers are validated and saved into
+    `cls._event_handler_names` and `cls._value_modifier_names`.
+    If any handler name is not a valid action type or value type, ValueError
+    will be raised and the class will not be registered.
+    """
+    if cls in _handler_registered_classes:
+        return
+    # import here to avoid circular import
+    from ..server.action import ActionTypes
+    from ..server.modifiable_values import ModifiableValueTypes
+
+    event_names: Set[str] = set()
+    value_names: Set[str] = set()
+    for key in dir(cls):
+        if key[:14] == "event_handler_":
+            name = key[14:]
+            if name not in ActionTypes.__members__:
+                raise ValueError(f"Invalid event handler name: {name}")
+            if callable(getattr(cls, key, None)):
+                event_names.add(name)
+        elif key[:15] == "value_modifier_":
+            name = key[15:]
+            if name not in ModifiableValueTypes.__members__:
+                raise ValueError(f"Invalid value modifier name: {name}")
+            if callable(getattr(cls, key, None)):
+                value_names.add(name)
+    setattr(cls, "_event_handler_names", frozenset(event_names))
+    setattr(cls, "_value_modifier_names", frozenset(value_names))
+    _handler_registered_classes.add(cls)
+
+
+def has_event_handler(obj: Any, name: str) -> bool:
+    """
+    Check whether the object has event handler `event_handler_{name}`. Classes
+    that are not registered will be registered when first checked.
+    """
+    cls = obj.__class__
+    if cls not in _handler_registered_classes:
+        register_handlers(cls)
+    return name in cls._event_handler_names  # type: ignore
+
+
+def has_value_modifier(obj: Any, name: str) -> bool:
+    """
+    Check whether the object has value modifier `value_modifier_{name}`. Classes
+    that are not registered will be registered when first checked.
+    """
+    cls = obj.__class__
+    if cls not in _handler_registered_classes:
+        register_handlers(cls)
+    return name in cls._value_modifier_names  # type: ignore
+
+
 def register_class(classes: Any, descs: Dict[str, DescDictType] | None = None):
     """
     Register classes with their descriptions. If classes is a Union, register
     all classes in the union. Otherwise, register the class itself.
-    Before registering, descs will be updated first.
+    Before registering, descs will be updated first. Event handlers and value
+    modifiers of classes are validated and registered before classes are
+    registered.
     """
     if descs is not None:
         update_desc(descs)
     if _is_union_type(classes):
         for class_type in classes.__args__:  # type: ignore
+            register_handlers(class_type)
             instance_factory.register_instance(class_type)
     else:
+        register_handlers(classes)
         instance_factory.register_instance(classes)
 
 
@@ -88,21 +151,38 @@ def get_class_list_by_base_class(
     if _is_union_type(base_class):
         # is union type, try each class sequentially
         base_class_list = base_class.__args__  # type: ignore
+    keys = list(instance_factory.instance_register.keys())
+    keys += list(instance_factory.lazy_register.keys())
     for type in base_class_list:
-        for key in instance_factory.instance_register.keys():
+        for key in keys:
             card_name = key.split("+")[1]
             card_version = key.split("+")[2]
             if card_name in exclude:
                 continue
-            if issubclass(instance_factory.instance_register[key], type):
+            if instance_factory.is_subclass(key, type):
                 if card_version <= version:
                     result_set.add(card_name)
     return sorted(list(result_set))
 
 
+def get_registered_names() -> List[str]:
+    """
+    Get sorted names of all registered classes, including classes that are
+    registered lazily and not imported yet. Names of different versions and
+    types are merged.
+    """
+    keys = list(instance_factory.instance_register.keys())
+    keys += list(instance_factory.lazy_register.keys())
+    return sorted(set(key.split("+")[1] for key in keys))
+
+
 __all__ = (
     "register_base_class",
     "register_class",
+    "register_handlers",
+    "has_event_handler",
+    "has_value_modifier",
     "get_instance",
     "get_class_list_by_base_class",
+    "get_registered_names",
 )
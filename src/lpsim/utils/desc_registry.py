@@ -3,7 +3,7 @@ Collect descriptions.
 """
 import json
 import logging
-from typing import Any, Dict, Literal, TypedDict
+from typing import Any, Dict, List, Literal, TypedDict
 
 
 ExpectedLanguageType = Literal["zh-CN", "en-US"]
@@ -30,6 +30,17 @@ _default_json_path = __file__[: -len("desc_registry.py")] + "default_desc.json"
 _desc_dict: Dict[str, DescDictType] = json.load(
     open(_default_json_path, "r", encoding="utf-8")
 )
+# full descriptions loaded from registry manifest when classes are lazily
+# imported. Descriptions of classes that are not imported yet are only in it.
+_manifest_desc_dict: Dict[str, DescDictType] | None = None
+
+
+def _find_value(root: Any, keys: List[str], value: str) -> Any:
+    for key in keys:
+        if key not in root:
+            raise ValueError(f'in "{value}": key "{key}" not found')
+        root = root[key]
+    return root
 
 
 def _parse_value(value: Any):
@@ -37,16 +48,18 @@ def _parse_value(value: Any):
     If value is str and starts with $: it is a reference to current desc,
     return its referenced result. Reference key format is:
     $key1|key2|key3 ...
+    When the referenced desc is not registered yet and descs of registry
+    manifest is loaded, find it in manifest descs.
     """
     if isinstance(value, str) and value.startswith("$"):
         # return referenced result
         keys = value[1:].split("|")
-        root = _desc_dict
-        for key in keys:
-            if key not in root:
-                raise ValueError(f'in "{value}": key "{key}" not found')
-            root = root[key]
-        return root
+        try:
+            return _find_value(_desc_dict, keys, value)
+        except ValueError:
+            if _manifest_desc_dict is None:
+                raise
+            return _find_value(_manifest_desc_dict, keys, value)
     return value
 
 
@@ -126,11 +139,22 @@ def desc_exist(
 
 def get_desc_patch() -> Dict[str, DescDictType]:
     """
-    Get desc patch.
+    Get desc patch. When descs of registry manifest is loaded, return it, as
+    it contains descs of all classes including not imported ones.
     """
+    if _manifest_desc_dict is not None:
+        return _manifest_desc_dict
     return _desc_dict
 
 
+def set_manifest_desc(desc_dict: Dict[str, DescDictType] | None) -> None:
+    """
+    Set descs loaded from registry manifest. Set None to remove them.
+    """
+    global _manifest_desc_dict
+    _manifest_desc_dict = desc_dict
+
+
 def update_cost(type: str, name: str, version: str, cost: Any) -> None:
     """
     update cost into desc dict.
@@ -151,4 +175,5 @@ __all__ = [
     "desc_exist",
     "get_desc_patch",
     "update_cost",
+    "set_manifest_desc",
 ]
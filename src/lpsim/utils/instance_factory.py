@@ -1,6 +1,7 @@
 import bisect
+import importlib
 import logging
-from typing import Any, Dict, get_args, get_type_hints
+from typing import Any, Dict, List, get_args, get_type_hints
 
 from .desc_registry import desc_exist, update_cost
 
@@ -135,6 +136,44 @@ class InstanceFactory:
     def __init__(self):
         self._instance_list = []
         self._instance_list_sorted = False
+        # classes that are known from registry manifest but not imported yet.
+        # key is same as instance_register, value is (module name, names of
+        # classes in MRO). Check `registry_manifest.py` for details.
+        self.lazy_register: Dict[str, Any] = {}
+
+    def register_lazy_instance(self, key: str, module: str, mro: List[str]):
+        """
+        Register a class that will be imported when it is first used.
+        """
+        if key in self.instance_register or key in self.lazy_register:
+            return
+        self.lazy_register[key] = (module, mro)
+        self._instance_list.append(key)
+        self._instance_list_sorted = False
+
+    def _import_lazy_instance(self, key: str) -> Any:
+        """
+        Import module of a lazy registered class, which registers the class,
+        and return the class.
+        """
+        module = self.lazy_register[key][0]
+        importlib.import_module(module)
+        if key not in self.instance_register:
+            raise AssertionError(
+                f"Class {key} is not registered after importing {module}, "
+                "registry manifest may be outdated"
+            )
+        return self.instance_register[key]
+
+    def is_subclass(self, key: str, base_class: Any) -> bool:
+        """
+        Check whether the registered class of key is subclass of base class.
+        For lazy registered class, it is checked by MRO names in manifest.
+        """
+        if key in self.instance_register:
+            return issubclass(self.instance_register[key], base_class)
+        base_name = f"{base_class.__module__}.{base_class.__qualname__}"
+        return base_name in self.lazy_register[key][1]
 
     def register_instance(self, cls: Any):
         """
@@ -159,6 +198,10 @@ class InstanceFactory:
                         "same version and name"
                     )
             self.instance_register[key] = cls
+            if key in self.lazy_register:
+                # already in instance list
+                del self.lazy_register[key]
+                continue
             self._instance_list.append(key)
             self._instance_list_sorted = False
 
@@ -182,7 +225,10 @@ class InstanceFactory:
                 cls_key_idx -= 1
             cls_key = instance_list[cls_key_idx]
             if self._is_same_instance(key, cls_key):
-                cls = self.instance_register[cls_key]
+                if cls_key in self.lazy_register:
+                    cls = self._import_lazy_instance(cls_key)
+                else:
+                    cls = self.instance_register[cls_key]
                 exact_version = cls_key.split("+")[2]
                 args["version"] = exact_version
                 return cls(**args)
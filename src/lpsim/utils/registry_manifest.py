@@ -0,0 +1,160 @@
+"""
+Registry manifest records module and MRO of all registered classes, and all
+descriptions including costs, which are generated when classes are registered.
+With a valid manifest, modules of characters, cards, summons, status and
+patches are not imported when lpsim is imported, and they are imported when
+the class is first used by `get_instance`.
+
+Lazy import is enabled by setting environment variable `LPSIM_LAZY_IMPORT` to
+1, and manifest path can be changed by `LPSIM_REGISTRY_MANIFEST`. The manifest
+is generated by `save_manifest` after all modules are imported, e.g. by
+`python -c "from lpsim.utils.registry_manifest import save_manifest;
+save_manifest()"`. It is valid only when source files of lpsim are not changed
+after generation, otherwise it is ignored and all modules are imported. To check
+it cheaply, modification times and sizes of source files are compared first,
+and source files are read and hashed only when they are different.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .class_registry import instance_factory
+from .desc_registry import get_desc_patch, set_manifest_desc
+
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_PATH = os.path.join(
+    os.path.dirname(__file__), "registry_manifest.json"
+)
+
+# None means not decided, it is decided when `import_all_modules` is first
+# called.
+_lazy_import: bool | None = None
+
+
+def _iter_source_files() -> Iterator[Tuple[str, str]]:
+    """
+    Yield relative and full paths of all source files of lpsim in sorted order,
+    except the manifest and generated version file.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(x for x in dirnames if x != "__pycache__")
+        for filename in sorted(filenames):
+            if not filename.endswith((".py", ".json")):
+                continue
+            if filename in ["registry_manifest.json", "_version.py"]:
+                continue
+            path = os.path.join(dirpath, filename)
+            yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+def get_source_stats() -> Dict[str, List[int]]:
+    """
+    Get modification time in nanoseconds and size of all source files of lpsim,
+    keyed by relative path. Files are not read.
+    """
+    stats: Dict[str, List[int]] = {}
+    for relpath, path in _iter_source_files():
+        stat = os.stat(path)
+        stats[relpath] = [stat.st_mtime_ns, stat.st_size]
+    return stats
+
+
+def get_source_hash() -> str:
+    """
+    Get hash of all source files of lpsim, except the manifest and generated
+    version file.
+    """
+    sha = hashlib.sha256()
+    for relpath, path in _iter_source_files():
+        sha.update(relpath.encode())
+        with open(path, "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def build_manifest() -> Dict[str, Any]:
+    """
+    Build manifest from current registered classes. All modules should have
+    been imported, i.e. lazy import should not be enabled. Only classes
+    defined in lpsim are recorded.
+    """
+    if _lazy_import:
+        raise RuntimeError("cannot build manifest when lazy import is enabled")
+    classes: Dict[str, Dict[str, Any]] = {}
+    for key, cls in sorted(instance_factory.instance_register.items()):
+        if not cls.__module__.startswith("lpsim."):
+            continue
+        classes[key] = {
+            "module": cls.__module__,
+            "class": cls.__name__,
+            "mro": [f"{x.__module__}.{x.__qualname__}" for x in cls.__mro__],
+        }
+    return {
+        "version": MANIFEST_VERSION,
+        "source_hash": get_source_hash(),
+        "source_stats": get_source_stats(),
+        "classes": classes,
+        "descs": get_desc_patch(),
+    }
+
+
+def save_manifest(path: str = DEFAULT_MANIFEST_PATH) -> None:
+    """
+    Build manifest and save it to path.
+    """
+    manifest = build_manifest()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+
+def load_manifest(path: str = DEFAULT_MANIFEST_PATH) -> Dict[str, Any] | None:
+    """
+    Load manifest from path. If the file not exists, or its version does not
+    match, return None. Source files are checked by their modification times
+    and sizes, and only when they are different, by the source hash; if the
+    hash does not match either, return None.
+    """
+    if not os.path.exists(path):
+        logging.warning(f"registry manifest {path} not found")
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        logging.warning(f"registry manifest {path} version not match")
+        return None
+    if (
+        manifest.get("source_stats") != get_source_stats()
+        and manifest.get("source_hash") != get_source_hash()
+    ):
+        logging.warning(f"registry manifest {path} is outdated")
+        return None
+    return manifest
+
+
+def lazy_import_enabled() -> bool:
+    """
+    Check whether lazy import is enabled. When first called and
+    `LPSIM_LAZY_IMPORT` is set, load the manifest, and register all classes
+    in it as lazy classes. If the manifest is not valid, lazy import is
+    disabled.
+    """
+    global _lazy_import
+    if _lazy_import is None:
+        _lazy_import = False
+        if os.getenv("LPSIM_LAZY_IMPORT", "0") not in ["", "0"]:
+            path = os.getenv("LPSIM_REGISTRY_MANIFEST", DEFAULT_MANIFEST_PATH)
+            manifest = load_manifest(path)
+            if manifest is None:
+                logging.warning("lazy import disabled, import all modules")
+            else:
+                for key, value in manifest["classes"].items():
+                    instance_factory.register_lazy_instance(
+                        key, value["module"], value["mro"]
+                    )
+                set_manifest_desc(manifest["descs"])
+                _lazy_import = True
+    return _lazy_import
@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from lpsim.bench import get_bench_decks
+from lpsim.runner import _get_random_state
+from lpsim.server.action_space import (
+    ACTION_BLOCK_NAMES,
+    ActionSpace,
+    default_dice_policy,
+)
+from lpsim.server.interaction import UseCardRequest
+from lpsim.server.match import Match, MatchConfig, MatchState
+
+
+def play_with_actions(seed: int, max_round_number: int = 15) -> Match:
+    """
+    Play a match by randomly choosing legal integer actions, and check every
+    legal action makes a valid response.
+    """
+    rand = random.Random(seed)
+    match = Match(random_state=_get_random_state(seed))
+    match.config = MatchConfig(max_round_number=max_round_number)
+    match.set_deck(get_bench_decks()[seed % 2])
+    assert match.start()[0]
+    match.step()
+    space = ActionSpace.from_config(match.config)
+    while not match.is_game_end():
+        assert match.state != MatchState.ERROR
+        player_idx = 0 if match.need_respond(0) else 1
+        actions = match.legal_actions(player_idx)
+        assert len(actions) > 0
+        assert len(set(actions)) == len(actions)
+        assert all(0 <= x < space.size for x in actions)
+        # every request is covered by legal actions
+        names = set(space.decode(x)[0] for x in actions)
+        assert names == set(
+            x.name for x in match.requests if x.player_idx == player_idx
+        )
+        for action in actions:
+            resp = space.make_response(match, action, player_idx)
+            assert resp.is_valid(match)
+            assert match.check_request_exist(resp.request)
+        match.apply_action(rand.choice(actions), player_idx)
+        match.step()
+    return match
+
+
+def test_action_space_layout():
+    space = ActionSpace()
+    offsets = space.block_offsets()
+    assert list(offsets) == ACTION_BLOCK_NAMES
+    assert offsets["DeclareRoundEndRequest"] == 0
+    assert offsets["SwitchCharacterRequest"] == 1
+    assert space.size == sum(space.block_sizes().values())
+    for name, offset in offsets.items():
+        assert space.decode(offset) == (name, 0)
+    assert space.decode(space.size - 1)[0] == "SwitchCardRequest"
+    with pytest.raises(ValueError):
+        space.decode(space.size)
+    with pytest.raises(ValueError):
+        space.decode(-1)
+    config = MatchConfig(max_hand_size=5, character_number=None)
+    space = ActionSpace.from_config(config)
+    assert space.hand_size == 5 and space.character_number == 3
+
+
+def test_apply_action():
+    for seed in range(2):
+        match = play_with_actions(seed, max_round_number=4)
+        assert match.is_game_end()
+    match = Match(random_state=_get_random_state(0))
+    match.set_deck(get_bench_decks()[0])
+    with pytest.raises(ValueError, match="not waiting"):
+        match.apply_action(0)
+    assert match.start()[0]
+    match.step()
+    # switch card, both players need respond
+    assert match.legal_actions(0) == match.legal_actions(1)
+    assert match.legal_actions() == match.legal_actions(0)
+    space = ActionSpace.from_config(match.config)
+    with pytest.raises(ValueError, match="not legal"):
+        match.apply_action(0, 0)
+    match.apply_action(space.block_offsets()["SwitchCardRequest"] + 0b101, 1)
+    assert not match.need_respond(1)
+    assert match.need_respond(0)
+    with pytest.raises(ValueError, match="not need"):
+        match.legal_actions(1)
+    match.apply_action(space.block_offsets()["SwitchCardRequest"], 0)
+    assert len(match.requests) == 0
+
+
+def test_default_dice_policy():
+    match = Match(random_state=_get_random_state(3))
+    match.set_deck(get_bench_decks()[1])
+    assert match.start()[0]
+    match.step()
+    rand = random.Random(3)
+    checked = 0
+    while match.round_number < 3 and not match.is_game_end():
+        player_idx = 0 if match.need_respond(0) else 1
+        for req in match.requests:
+            if req.player_idx != player_idx or not isinstance(req, UseCardRequest):
+                continue
+            idxs = default_dice_policy(match, req)
+            assert idxs == sorted(set(idxs))
+            assert len(idxs) == req.cost.total_dice_cost
+            colors = [req.dice_colors[x] for x in idxs]
+            assert req.cost.is_valid(colors, 999, True)
+            checked += 1
+        match.apply_action(rand.choice(match.legal_actions(player_idx)), player_idx)
+        match.step()
+    assert checked > 0
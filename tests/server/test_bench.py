@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+
+from lpsim.bench import (
+    BenchmarkResult,
+    TimeStat,
+    bench_http_respond,
+    bench_matches,
+    bench_replays,
+    find_regressions,
+    flatten_metrics,
+    format_report,
+    get_bench_decks,
+    get_bench_log_paths,
+    time_methods,
+)
+from lpsim.replay import replay_log
+from lpsim.server.match import MatchConfig
+
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+LOG_PATH = os.path.join(
+    os.path.dirname(__file__), "bugfix", "jsons", "test_issue_82.json"
+)
+
+
+def test_time_methods():
+    class Counter:
+        def count(self, n):
+            if n > 0:
+                self.count(n - 1)
+            return n
+
+    stats = {"count": TimeStat(count=1, total=1, mean=1, min=1, max=1)}
+    with time_methods(Counter, ["count"], stats):
+        assert Counter().count(3) == 3
+        Counter().count(0)
+    # nested calls are not timed, and existing stat is updated
+    assert stats["count"].count == 3
+    assert stats["count"].max == 1
+    assert stats["count"].min < 1
+    assert stats["count"].mean == stats["count"].total / 3
+    # methods are restored
+    assert "wrapper" not in Counter.count.__qualname__
+
+
+def test_bench_logs():
+    paths = get_bench_log_paths(ROOT)
+    assert len(paths) > 1
+    assert any(x.endswith("kujirai_log.json") for x in paths)
+    result = replay_log(open(LOG_PATH, encoding="utf8").read(), LOG_PATH, "0.0.4")
+    assert result.error is None
+    replays = bench_replays([LOG_PATH], repeat=2)
+    assert len(replays["test_issue_82.json"].times) == 2
+    assert replays["test_issue_82.json"].command_number > 0
+    filter_number = len(logging.getLogger("uvicorn.access").filters)
+    stat = bench_http_respond([LOG_PATH, LOG_PATH])
+    assert stat.count == replays["test_issue_82.json"].command_number * 2
+    # log filters of servers are removed after replay
+    assert len(logging.getLogger("uvicorn.access").filters) == filter_number
+
+
+def test_bench_result_compare():
+    decks = get_bench_decks()
+    assert len(decks) > 1
+    matches = bench_matches(
+        decks[:1], [0], config=MatchConfig(max_round_number=2), repeat=2
+    )
+    assert matches.error_number == 0
+    assert matches.match_number == 1
+    assert len(matches.times) == 2
+    result = BenchmarkResult(
+        lpsim_version="test",
+        python_version="3",
+        platform="test",
+        created_at="now",
+        repeat=2,
+        matches=matches,
+        phases={"step": TimeStat(count=1, total=1, mean=1, min=1, max=1)},
+    )
+    base = json.loads(result.json())
+    assert set(flatten_metrics(base)) == {
+        "matches.seconds_per_match",
+        "phases.step.mean",
+    }
+    new = json.loads(result.json())
+    new["phases"]["step"]["mean"] = 1.05
+    assert find_regressions(base, new) == []
+    new["phases"]["step"]["mean"] = 2
+    regressions = find_regressions(base, new)
+    assert len(regressions) == 1
+    assert regressions[0][0] == "phases.step.mean"
+    assert regressions[0][3] == 1
+    assert "! phases.step.mean" in format_report(base, new)
+    # metrics not in both results are ignored
+    new.pop("matches")
+    assert len(find_regressions(base, new, threshold=-1)) == 1
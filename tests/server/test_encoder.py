@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pytest
+
+from lpsim.bench import get_bench_decks
+from lpsim.encoder import (
+    CHARACTER_FEATURES,
+    ELEMENT_IDX,
+    EMPTY_NAME_IDX,
+    UNKNOWN_NAME_IDX,
+    ObservationEncoder,
+)
+from lpsim.runner import _get_random_state
+from lpsim.server.match import Match, MatchConfig
+from lpsim.server.struct import DIE_COLOR_IDX
+
+
+def get_matches(number: int):
+    """
+    Run a match by integer actions and collect copies of it in every step.
+    """
+    rand = random.Random(0)
+    match = Match(random_state=_get_random_state(0))
+    match.config = MatchConfig(max_round_number=3)
+    match.set_deck(get_bench_decks()[1])
+    assert match.start()[0]
+    match.step()
+    matches = []
+    while not match.is_game_end() and len(matches) < number:
+        match.apply_action(rand.choice(match.legal_actions()))
+        match.step()
+        matches.append(match.copy(deep=True))
+    return matches
+
+
+def test_encode_match():
+    matches = get_matches(40)
+    encoder = ObservationEncoder(batch_size=len(matches))
+    assert len(set(encoder.names)) == len(encoder.names) > 100
+    arrays = encoder.encode_batch(matches)
+    assert arrays["characters"].shape == (len(matches), 2, 3, len(CHARACTER_FEATURES))
+    for key, array in arrays.items():
+        assert array.dtype == np.int32
+        assert array.shape[0] == len(matches)
+    match = matches[-1]
+    assert arrays["match"][-1, 0] == match.round_number
+    for pidx, table in enumerate(match.player_tables):
+        for cidx, character in enumerate(table.characters):
+            out = arrays["characters"][-1, pidx, cidx]
+            assert out[0] == encoder.get_name_idx(character.name) > UNKNOWN_NAME_IDX
+            assert out[1] == character.hp
+            assert out[5] == character.is_alive
+            for element in character.element_application:
+                assert arrays["element_application"][-1, pidx, cidx][
+                    ELEMENT_IDX[element]
+                ]
+            assert (arrays["character_attaches"][-1, pidx, cidx, :, 0] > 0).sum() == (
+                len(character.attaches)
+            )
+        hands = arrays["hands"][-1, pidx]
+        assert list(hands[: len(table.hands)]) == [
+            encoder.get_name_idx(card.name) for card in table.hands
+        ]
+        assert (hands[len(table.hands) :] == EMPTY_NAME_IDX).all()
+        for color in table.dice.colors:
+            assert arrays["dice"][-1, pidx, DIE_COLOR_IDX[color]] > 0
+        assert arrays["dice"][-1, pidx].sum() == len(table.dice.colors)
+        assert arrays["players"][-1, pidx, 5] == len(table.hands)
+    # encoding one by one gives same results, and old values are cleared
+    single = ObservationEncoder(batch_size=1, names=encoder.names)
+    for idx, match in enumerate(matches):
+        single.encode(match)
+        for key, array in single.arrays.items():
+            assert (array[0] == arrays[key][idx]).all(), key
+    # arrays are reused
+    first = encoder.arrays["hands"]
+    encoder.encode_batch(matches[:2])
+    assert encoder.arrays["hands"] is first
+    with pytest.raises(ValueError):
+        single.encode_batch(matches[:2])
+    # unknown names
+    encoder = ObservationEncoder(names=["Nahida"])
+    encoder.encode(matches[0])
+    names = encoder.arrays["characters"][0, :, :, 0]
+    assert (names > EMPTY_NAME_IDX).all()
+    assert (names == UNKNOWN_NAME_IDX).sum() == 4
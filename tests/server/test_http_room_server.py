@@ -0,0 +1,179 @@
+import asyncio
+import json
+import threading
+
+from lpsim.bench import get_bench_decks
+from lpsim.network.http_room_server import HTTPRoomServer
+
+
+async def asgi_request(app, method: str, path: str, query: str = "", body=b""):
+    """
+    Send one HTTP request to an ASGI app, and return status and decoded body.
+    """
+    headers = [(b"host", b"testserver")]
+    if body:
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": headers,
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    data = b"".join(x.get("body", b"") for x in sent[1:])
+    return sent[0]["status"], json.loads(data)
+
+
+def test_single_process_rooms(tmp_path):
+    server = HTTPRoomServer(
+        max_rooms=2,
+        port=7999,
+        admin_password="foobar",
+        init_args={
+            "decks": get_bench_decks()[0],
+            "reset_log_save_path": str(tmp_path),
+        },
+        single_process=True,
+    )
+    app = server.app
+
+    async def run():
+        status, data = await asgi_request(app, "POST", "/room/a")
+        assert data == {"port": 7999, "status": "created"}
+        # same room created by concurrent requests
+        results = await asyncio.gather(
+            asgi_request(app, "POST", "/room/b"), asgi_request(app, "POST", "/room/b")
+        )
+        assert sorted(x[1]["status"] for x in results) == ["created", "exist"]
+        assert (await asgi_request(app, "POST", "/room/c"))[1] == {"status": "full"}
+        assert set(server.rooms) == {"a", "b"}
+
+        # requests with room are dispatched to rooms
+        room = server.rooms["a"]
+        status, frames = await asgi_request(app, "GET", "/state/after/0/-1", "room=a")
+        assert status == 200 and frames[0]["uuid"] == room.uuid
+        status, _ = await asgi_request(app, "GET", "/state/after/0/-1", "room=c")
+        assert status == 404
+        status, data = await asgi_request(app, "GET", "/version")
+        assert data["info"]["class"] == "HTTPRoomServer"
+        status, data = await asgi_request(app, "GET", "/version", "room=b")
+        assert data["info"]["class"] == "HTTPServer"
+
+        # POST to room refreshes its active time
+        server.room_active_times_local["a"] = 0
+        body = {"player_idx": 0, "command": "sw_card", "uuid": room.uuid}
+        status, _ = await asgi_request(
+            app, "POST", "/respond", "room=a", json.dumps(body).encode()
+        )
+        assert status == 200 and server.room_active_times_local["a"] > 0
+        status, data = await asgi_request(app, "GET", "/rooms", "password=foobar")
+        assert [x["name"] for x in data["rooms"]] == ["a", "b"]
+        assert all(x["port"] == 7999 for x in data["rooms"])
+
+        # delete and timeout
+        assert (await asgi_request(app, "DELETE", "/room/a"))[0] == 403
+        status, data = await asgi_request(app, "DELETE", "/room/a", "password=foobar")
+        assert data == {"status": "deleted"} and "a" not in server.rooms
+        assert room._closed
+        status, _ = await asgi_request(app, "GET", "/state/after/0/-1", "room=a")
+        assert status == 404
+        server.room_timeout = -1
+        server._check_time_interval = 0
+        task = asyncio.create_task(server._check_rooms_local())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        assert server.rooms == {} and server.room_active_times_local == {}
+        # logs of removed rooms are saved
+        assert len(list(tmp_path.iterdir())) == 2
+        status, data = await asgi_request(app, "POST", "/room/c")
+        assert data == {"port": 7999, "status": "created"}
+
+    asyncio.run(run())
+
+
+def test_single_process_busy_room():
+    server = HTTPRoomServer(
+        max_rooms=2,
+        port=7999,
+        init_args={"decks": get_bench_decks()[0]},
+        single_process=True,
+        max_workers=2,
+    )
+    app = server.app
+    started = threading.Event()
+    finished = threading.Event()
+
+    async def run():
+        await asgi_request(app, "POST", "/room/a")
+        await asgi_request(app, "POST", "/room/b")
+        busy, other = server.rooms["a"], server.rooms["b"]
+        respond = busy._respond
+
+        def busy_respond(resp):
+            # keeps the engine thread of room a running on CPU
+            started.set()
+            while not finished.is_set():
+                sum(range(1000))
+            respond(resp)
+
+        busy._respond = busy_respond
+        try:
+            body = {"player_idx": 0, "command": "sw_card", "uuid": busy.uuid}
+            task = asyncio.create_task(
+                asgi_request(
+                    app, "POST", "/respond", "room=a", json.dumps(body).encode()
+                )
+            )
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+
+            # room b is served and runs its match while room a is busy
+            status, frames = await asyncio.wait_for(
+                asgi_request(app, "GET", "/state/after/0/-1", "room=b"), 10
+            )
+            assert status == 200 and frames[0]["uuid"] == other.uuid
+            status, reqs = await asyncio.wait_for(
+                asgi_request(app, "GET", "/request/0", "room=b"), 10
+            )
+            assert status == 200 and len(reqs) > 0
+            body = {"player_idx": 0, "command": "sw_card", "uuid": other.uuid}
+            status, _ = await asyncio.wait_for(
+                asgi_request(
+                    app, "POST", "/respond", "room=b", json.dumps(body).encode()
+                ),
+                10,
+            )
+            assert status == 200 and not task.done()
+        finally:
+            finished.set()
+        status, _ = await task
+        assert status == 200
+        await server._delete_room_local("a")
+        await server._delete_room_local("b")
+
+    try:
+        asyncio.run(run())
+    finally:
+        finished.set()
+        assert server._executor is not None
+        server._executor.shutdown()
@@ -0,0 +1,407 @@
+import asyncio
+import json
+import threading
+import time
+
+import dictdiffer
+import pytest
+from fastapi import HTTPException
+
+from lpsim.bench import get_bench_decks
+from lpsim.network.http_server import HTTPServer, RespondData, ResetData
+from lpsim.agents.random_agent import RandomAgent
+from lpsim.network.player_view import (
+    HIDDEN_CARD,
+    PlayerViewRecorder,
+    get_player_view,
+)
+from lpsim.network.utils import get_new_match
+from lpsim.server.action import CreateObjectAction, RemoveDiceAction
+from lpsim.server.consts import ObjectPositionType
+from lpsim.server.event_controller import EventFrame
+from lpsim.server.snapshot import snapshot_to_dict
+from lpsim.server.struct import ObjectPosition
+
+
+def get_endpoint(server: HTTPServer, path: str):
+    for route in server.app.routes:
+        if getattr(route, "path", None) == path:
+            return getattr(route, "endpoint")
+    raise AssertionError(f"Route {path} not found")
+
+
+def get_server(**kwargs) -> HTTPServer:
+    return HTTPServer(decks=get_bench_decks()[0], **kwargs)
+
+
+def parse_sse(message: bytes):
+    """
+    Parse one message of Server-Sent Events into event name and data.
+    """
+    event, data = "message", None
+    for line in message.decode().strip().split("\n"):
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            data = json.loads(line[6:])
+    return event, data
+
+
+def test_state_wait_and_stream():
+    server = get_server()
+    get_state = get_endpoint(server, "/state/{mode}/{state_idx}/{player_idx}")
+    get_stream = get_endpoint(server, "/state_stream/{player_idx}")
+    respond = get_endpoint(server, "/respond")
+    reset = get_endpoint(server, "/reset")
+
+    async def run():
+        match = server.match
+        number = len(match._history_diff)
+        frames = json.loads((await get_state("after", 0, -1)).body)
+        assert [x["idx"] for x in frames] == list(range(number))
+        assert frames[0]["type"] == "FULL" and frames[-1]["type"] == "DIFF"
+        assert json.loads((await get_state("one", 0, -1)).body) == frames[:1]
+        if number > 1:
+            one = json.loads((await get_state("one", 1, -1, server.uuid)).body)
+            assert one == frames[1:2]
+
+        stream = (await get_stream(-1)).body_iterator
+        for idx in range(number):
+            event, data = parse_sse(await stream.__anext__())
+            assert event == "message" and data == frames[idx]
+        next_message = asyncio.ensure_future(stream.__anext__())
+
+        # waiting clients are woken up by respond, not by timeout
+        waiting = asyncio.ensure_future(get_state("after", number, -1, server.uuid))
+        await asyncio.sleep(0.05)
+        assert not waiting.done() and not next_message.done()
+        start_time = time.time()
+        await respond(RespondData(player_idx=0, command="sw_card", uuid=server.uuid))
+        # no new state until both players switched cards
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        await respond(RespondData(player_idx=1, command="sw_card", uuid=server.uuid))
+        frames = json.loads((await asyncio.wait_for(waiting, 5)).body)
+        assert time.time() - start_time < server.get_state_timeout
+        assert len(frames) > 0
+        assert frames[0]["idx"] == number and frames[0]["type"] == "DIFF"
+        event, data = parse_sse(await asyncio.wait_for(next_message, 5))
+        assert data == frames[0]
+
+        # reset ends waiting and streaming
+        number = len(match._history_diff)
+        while True:
+            message = await stream.__anext__()
+            if parse_sse(message)[1]["idx"] == number - 1:
+                break
+        next_message = asyncio.ensure_future(stream.__anext__())
+        old_uuid = server.uuid
+        waiting = asyncio.ensure_future(get_state("after", number, -1, old_uuid))
+        await asyncio.sleep(0.05)
+        await reset(ResetData())
+        assert json.loads((await asyncio.wait_for(waiting, 5)).body) == []
+        event, data = parse_sse(await asyncio.wait_for(next_message, 5))
+        assert event == "reset" and data == {"uuid": server.uuid} != old_uuid
+
+        # keep-alive message when no new state
+        server.get_state_timeout = 0.05
+        stream = await get_stream(-1, len(server.match._history_diff), server.uuid)
+        message = await asyncio.wait_for(stream.body_iterator.__anext__(), 5)
+        assert message.startswith(b":")
+        number = len(server.match._history_diff)
+        state = await get_state("after", number, -1, server.uuid)
+        assert json.loads(state.body) == []
+
+    asyncio.run(run())
+
+
+def test_frame_cache():
+    server = get_server()
+    get_state = get_endpoint(server, "/state/{mode}/{state_idx}/{player_idx}")
+    respond = get_endpoint(server, "/respond")
+    reset = get_endpoint(server, "/reset")
+
+    async def run():
+        body = (await get_state("after", 0, -1)).body
+        assert json.loads(body) == json.loads(json.dumps(server._get_frames(0)))
+        frames = server._get_frame_bytes(0)
+        assert len(frames) == len(server.match._history_diff)
+        # encoded states are reused
+        assert all(x is y for x, y in zip(server._get_frame_bytes(0), frames))
+        assert (await get_state("after", 0, -1)).body == body
+        for player_idx in range(2):
+            data = RespondData(
+                player_idx=player_idx, command="sw_card", uuid=server.uuid
+            )
+            response = await respond(data)
+        new_frames = server._get_frame_bytes(0)
+        assert len(new_frames) > len(frames)
+        assert all(x is y for x, y in zip(new_frames, frames))
+        assert json.loads(response.body) == [
+            json.loads(x) for x in new_frames[len(frames) :]
+        ]
+        # cache is cleared when states are dropped without changing uuid
+        server.match = server.match.new_match_from_history(1)
+        server._state_number = len(server.match._history_diff)
+        assert len(server._get_frame_bytes(0)) == 2
+        assert server._get_frame_bytes(0)[0] is not frames[0]
+        # cache is cleared after reset
+        await reset(ResetData())
+        body = (await get_state("after", 0, -1)).body
+        assert json.loads(body)[0]["uuid"] == server.uuid
+        assert server._get_frame_bytes(0)[0] is not frames[0]
+
+    asyncio.run(run())
+
+
+def test_player_view():
+    server = get_server()
+    get_state = get_endpoint(server, "/state/{mode}/{state_idx}/{player_idx}")
+    get_stream = get_endpoint(server, "/state_stream/{player_idx}")
+    respond = get_endpoint(server, "/respond")
+    reset = get_endpoint(server, "/reset")
+
+    def check_views(frames, player_idx):
+        # applying diffs of views gets views of histories
+        match = server.match
+        assert len(frames) == len(match._history_diff)
+        state = frames[0]["match"]
+        for idx, frame in enumerate(frames):
+            if idx > 0:
+                state = dictdiffer.patch(frame["match_diff"], state)
+            if idx == len(frames) - 1:
+                target = get_player_view(match._history[-1], player_idx)
+                assert state == json.loads(json.dumps(snapshot_to_dict(target)))
+        opponent = state["player_tables"][1 - player_idx]
+        assert len(opponent["hands"]) > 0
+        assert all(x == HIDDEN_CARD for x in opponent["hands"])
+        assert all(x == HIDDEN_CARD for x in opponent["table_deck"])
+        assert (
+            state["player_tables"][player_idx]["hands"]
+            == (match.player_tables[player_idx].dict()["hands"])
+        )
+        assert state["random_state"] == []
+        for request in state["requests"]:
+            if request["player_idx"] != player_idx:
+                assert set(request.keys()) == {"name", "player_idx"}
+
+    async def run():
+        for player_idx in range(2):
+            data = RespondData(
+                player_idx=player_idx, command="sw_card", uuid=server.uuid
+            )
+            await respond(data)
+        for player_idx in range(2):
+            frames = json.loads((await get_state("after", 0, player_idx)).body)
+            check_views(frames, player_idx)
+            stream = (await get_stream(player_idx)).body_iterator
+            for frame in frames:
+                assert parse_sse(await stream.__anext__())[1] == frame
+        # views are kept after reset to a history, and continue recording
+        await reset(ResetData(match_state_idx=len(frames) - 3))
+        for player_idx in range(2):
+            frames = json.loads((await get_state("after", 0, player_idx)).body)
+            check_views(frames, player_idx)
+        # views are recorded again when reset by match state
+        data = ResetData.parse_obj({"match_state": server.match.dict()})
+        await reset(data)
+        assert server.match is data.match_state
+        frames = json.loads((await get_state("after", 0, 0)).body)
+        check_views(frames, 0)
+
+    asyncio.run(run())
+
+
+def test_player_view_hides_predictions():
+    decks = get_bench_decks()[0]
+    hidden_table_fields = ["hands", "table_deck", "player_deck_information"]
+
+    def check_prediction(prediction, player_idx):
+        assert prediction["player_idx"] == player_idx
+        assert "random_state" not in json.dumps(prediction)
+        for action, path, values in prediction["diff"]:
+            if isinstance(path, str):
+                path = path.split(".") if path else []
+            paths = [path]
+            if action != "change":
+                paths = [list(path) + [x[0]] for x in values]
+            for path in paths:
+                assert path[0] != "random_state"
+                if path[0] == "player_tables" and path[1] != player_idx:
+                    assert path[2] not in hidden_table_fields
+
+    prediction_number = 0
+    for seed in range(2):
+        views = [PlayerViewRecorder(idx) for idx in range(2)]
+        match, _ = get_new_match(decks, history_hooks=views)
+        agents = [RandomAgent(player_idx=idx, random_seed=seed) for idx in range(2)]
+        for _ in range(20):
+            if match.is_game_end():
+                break
+            for agent in agents:
+                while match.need_respond(agent.player_idx):
+                    match.respond(agent.generate_response(match))
+                    match.step()
+        for view in views:
+            state = view.get_full()
+            assert state["random_state"] == []
+            first = {k: v for k, v in state.items() if k != "random_state"}
+            assert "random_state" not in json.dumps(first)
+            for diff in view.diffs[1:]:
+                assert "random_state" not in json.dumps(diff)
+                state = dictdiffer.patch(diff, state)
+                for prediction in state["skill_predictions"]:
+                    check_prediction(prediction, view.player_idx)
+                    prediction_number += 1
+    assert prediction_number > 0
+
+
+def test_player_view_hides_created_cards():
+    match = get_server().match
+    # player 0 creates a card in hands of player 1
+    position = ObjectPosition(player_idx=1, area=ObjectPositionType.HAND, id=-1)
+    action = CreateObjectAction(
+        object_name="Lightning Stiletto", object_position=position, object_arguments={}
+    )
+    events = match._act(action)
+    match.event_controller.append(EventFrame(events=events, processing_event=events[0]))
+    match.event_controller.append(EventFrame(events=[], triggered_actions=[action]))
+    match.trashbin.append(match.player_tables[1].hands[-1])
+
+    def view_json(player_idx):
+        view = get_player_view(match.snapshot(), player_idx)
+        return json.dumps(snapshot_to_dict(view))
+
+    assert "Lightning Stiletto" in view_json(1)
+    view = json.loads(view_json(0))
+    assert "Lightning Stiletto" not in json.dumps(view)
+    assert view["last_action"] == {"type": "CREATE_OBJECT"}
+    assert view["action_info"] == {}
+    assert view["trashbin"] == [HIDDEN_CARD]
+    # views without hidden information are not changed
+    match.last_action = RemoveDiceAction(player_idx=1, dice_idxs=[])
+    match.event_controller.frame_list.clear()
+    match.trashbin.clear()
+    view = json.loads(view_json(0))
+    assert view["last_action"] == match.last_action.dict()
+    assert view["event_controller"] == match.event_controller.dict()
+
+
+def test_respond_in_executor():
+    server = get_server()
+    get_state = get_endpoint(server, "/state/{mode}/{state_idx}/{player_idx}")
+    get_request = get_endpoint(server, "/request/{player_idx}")
+    respond = get_endpoint(server, "/respond")
+    started = threading.Event()
+    release = threading.Event()
+    server_respond = server._respond
+
+    def blocked_respond(resp):
+        started.set()
+        assert release.wait(5)
+        server_respond(resp)
+
+    server._respond = blocked_respond
+
+    async def run():
+        number = len(server.match._history_diff)
+        responds = [
+            asyncio.ensure_future(
+                respond(
+                    RespondData(player_idx=idx, command="sw_card", uuid=server.uuid)
+                )
+            )
+            for idx in range(2)
+        ]
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        # states are served when the match is running
+        frames = json.loads((await get_state("after", 0, -1)).body)
+        assert len(frames) == number
+        # committed requests are served, and other responds wait for the
+        # running respond
+        requests = json.loads((await get_request(-1)).body)
+        assert [x["name"] for x in requests] == ["SwitchCardRequest"] * 2
+        await asyncio.sleep(0.05)
+        assert not any(x.done() for x in responds)
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*responds), 5)
+        requests = json.loads((await get_request(-1)).body)
+        assert all(x["name"] != "SwitchCardRequest" for x in requests)
+        assert len(server.match._history_diff) > number
+        assert [len(x) for x in server.command_history] == [1, 1]
+        # invalid responds are rejected before running the match
+        started.clear()
+        for idx, command in [(0, "sw_card"), (2, "sw_card"), (0, "unknown")]:
+            data = RespondData(player_idx=idx, command=command, uuid=server.uuid)
+            with pytest.raises(HTTPException):
+                await respond(data)
+        assert not started.is_set()
+
+    asyncio.run(run())
+
+
+def test_state_during_respond():
+    server = get_server()
+    get_state = get_endpoint(server, "/state/{mode}/{state_idx}/{player_idx}")
+    respond = get_endpoint(server, "/respond")
+    ran = threading.Semaphore(0)
+    release = threading.Semaphore(0)
+    server_respond = server._respond
+
+    def paused_respond(resp):
+        server_respond(resp)
+        # match has run, but the respond is not finished
+        ran.release()
+        assert release.acquire(timeout=5)
+
+    server._respond = paused_respond
+
+    def check_frames(frames):
+        assert [x["idx"] for x in frames] == list(range(len(frames)))
+        assert all(len(x["match_diff"]) > 0 for x in frames[1:])
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        number = len(server.match._history_diff)
+        waiting = asyncio.ensure_future(get_state("after", number, -1, server.uuid))
+        for idx in range(2):
+            task = asyncio.ensure_future(
+                respond(
+                    RespondData(player_idx=idx, command="sw_card", uuid=server.uuid)
+                )
+            )
+            assert await loop.run_in_executor(None, ran.acquire, True, 5)
+            # states recorded by the running respond are not served
+            for player_idx in range(-1, 2):
+                frames = json.loads((await get_state("after", 0, player_idx)).body)
+                check_frames(frames)
+                assert len(frames) == number
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+            release.release()
+            await asyncio.wait_for(task, 5)
+        assert len(server.match._history_diff) > number
+        frames = json.loads((await asyncio.wait_for(waiting, 5)).body)
+        assert frames[0]["idx"] == number
+        assert len(json.loads((await get_state("after", 0, -1)).body)) == len(
+            server.match._history_diff
+        )
+
+        # poll states when responds are running
+        server._respond = server_respond
+        for idx in range(2):
+            task = asyncio.ensure_future(
+                respond(
+                    RespondData(player_idx=idx, command="choose 0", uuid=server.uuid)
+                )
+            )
+            while not task.done():
+                frames = json.loads((await get_state("after", 0, -1)).body)
+                check_frames(frames)
+                await asyncio.sleep(0)
+            await task
+        frames = json.loads((await get_state("after", 0, -1)).body)
+        check_frames(frames)
+        assert len(frames) == len(server.match._history_diff)
+
+    asyncio.run(run())
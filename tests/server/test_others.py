@@ -1,3 +1,4 @@
+import random
 from typing import Dict, Literal
 import pytest
 from lpsim.utils.desc_registry import DescDictType
@@ -11,11 +12,18 @@ from lpsim.utils.class_registry import get_instance, register_class
 from lpsim.agents.random_agent import RandomAgent
 from lpsim.agents.nothing_agent import NothingAgent
 from lpsim.server.action import CreateDiceAction, DrawCardAction, MoveObjectAction
-from lpsim.server.consts import DamageElementalType, ObjectPositionType
+from lpsim.server.consts import DamageElementalType, DieColor, ObjectPositionType
+from lpsim.server.dice import Dice
 from lpsim.server.deck import Deck
 from lpsim.server.interaction import SwitchCardResponse
 from lpsim.server.object_base import ObjectBase
-from lpsim.server.struct import ObjectPosition
+from lpsim.server.struct import (
+    DIE_COLOR_IDX,
+    OMNI_IDX,
+    Cost,
+    ObjectPosition,
+    count_dice_colors,
+)
 from lpsim.server.match import Match, MatchConfig
 
 
@@ -249,6 +257,56 @@ def test_create_dice():
         match.player_tables[0].dice.colors.clear()
 
 
+def test_dice_counts_and_select_dice():
+    rand = random.Random(0)
+    colors = list(DieColor)
+    costs = [Cost(any_dice_number=3), Cost(same_dice_number=3)]
+    for color in colors[:-1]:
+        costs.append(Cost(elemental_dice_number=3, elemental_dice_color=color))
+        costs.append(
+            Cost(elemental_dice_number=1, elemental_dice_color=color, any_dice_number=2)
+        )
+    for _ in range(300):
+        dice = Dice(colors=[rand.choice(colors) for _ in range(rand.randint(0, 8))])
+        counts = dice.counts
+        assert counts == count_dice_colors(dice.colors)
+        for cost in costs:
+            valid = cost.is_valid(dice.colors, 0, False, strict=False)
+            assert cost.is_valid_counts(counts, 0, False, strict=False) == valid
+            selected = cost.select_dice(counts)
+            assert (selected is not None) == valid
+            if selected is None:
+                continue
+            idxs = dice.counts_to_idx(selected)
+            assert idxs == sorted(set(idxs))
+            assert cost.is_valid([dice.colors[x] for x in idxs], 0, False)
+            if cost.elemental_dice_number > 0 and cost.any_dice_number == 0:
+                # omni is only used when elemental dice are not enough
+                ele_idx = DIE_COLOR_IDX[cost.elemental_dice_color]
+                assert selected[OMNI_IDX] == max(
+                    cost.elemental_dice_number - counts[ele_idx], 0
+                )
+    # counts are kept in sync when dice change
+    dice = Dice(colors=[DieColor.PYRO, DieColor.OMNI])
+    assert dice.counts[DIE_COLOR_IDX[DieColor.PYRO]] == 1
+    dice.add([DieColor.CRYO, DieColor.PYRO])
+    assert dice.counts == count_dice_colors(dice.colors)
+    assert dice.remove([0, 2]) == [DieColor.CRYO, DieColor.PYRO]
+    assert dice.counts == count_dice_colors(dice.colors)
+    dice.sort([DieColor.OMNI] + colors[:-1])
+    assert dice.colors == [DieColor.OMNI, DieColor.PYRO]
+    dice.colors = [DieColor.GEO]
+    assert dice.counts == count_dice_colors([DieColor.GEO])
+    # modified in place without changing the number of dice
+    dice.colors[0] = DieColor.PYRO
+    assert dice.counts == count_dice_colors([DieColor.PYRO])
+    dice.colors[0] = DieColor.GEO
+    copied = dice.copy(deep=True)
+    dice.clear()
+    assert sum(dice.counts) == 0
+    assert copied.counts == count_dice_colors([DieColor.GEO])
+
+
 @pytest.mark.slowtest
 def test_id_wont_duplicate():
     s = set()
@@ -1,3 +1,5 @@
+import copy
+import re
 import time
 import json
 from typing import Literal
@@ -6,13 +8,20 @@ import pytest
 
 from lpsim.server.struct import Cost, ObjectPosition
 from lpsim.server.event import UseCardEventArguments
-from lpsim.server.action import ActionTypes, UseCardAction
+from lpsim.server.action import (
+    ActionBase,
+    ActionTypes,
+    CreateObjectAction,
+    DrawCardAction,
+    UseCardAction,
+)
 from lpsim.utils.class_registry import get_instance
 from lpsim.server.summon.base import SummonBase
 from lpsim.server.consts import ObjectPositionType, ObjectType
 from lpsim.agents.nothing_agent import NothingAgent
 from lpsim.server.event_handler import OmnipotentGuideEventHandler_3_3
 from lpsim.server.match import Match, MatchState
+from lpsim.server.counter_random import CounterRandom, get_counter_random_state
 from lpsim.server.deck import Deck
 from lpsim.agents.random_agent import RandomAgent
 from lpsim.agents.interaction_agent import InteractionAgent
@@ -228,6 +237,12 @@ def test_copy_speed():
     endtime = time.time()
     print("not json speed", (endtime - starttime) / run_time)
 
+    starttime = time.time()
+    for i in range(run_time):
+        _ = match.fast_clone()
+    endtime = time.time()
+    print("fast clone speed", (endtime - starttime) / run_time)
+
     match = Match()
     match.config.max_same_card_number = 30
     match.set_deck([deck, deck])
@@ -242,6 +257,68 @@ def test_copy_speed():
     assert True
 
 
+def test_fast_clone():
+    agent_0 = RandomAgent(player_idx=0, random_seed=42)
+    agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
+    match = Match(random_state=get_random_state(100))
+    deck = Deck.from_str(
+        """
+        default_version:4.0
+        character:Fischl
+        character:Rhodeia of Loch
+        character:Noelle
+        Paimon*5
+        Liben*5
+        Sweet Madame*5
+        Strategize*5
+        Toss-Up*5
+        Changing Shifts*5
+        """
+    )
+    match.set_deck([deck, deck])
+    match.config.max_same_card_number = 30
+    match.config.card_number = None
+    match.config.character_number = None
+    match.config.check_deck_restriction = False
+    match.config.history_level = 10
+    assert match.start()[0]
+    match.step()
+    for _ in range(10):
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+    new_match = match.fast_clone()
+    assert new_match.json() == match.json()
+    assert new_match._history == match._history
+    # no object is shared
+    new_match.player_tables[0].characters[0].hp -= 1
+    assert new_match.player_tables[0].characters[0].hp != (
+        match.player_tables[0].characters[0].hp
+    )
+    new_match.player_tables[0].characters[0].hp += 1
+    # object clones keep ids
+    character = match.player_tables[1].characters[1]
+    new_character = character.fast_clone()
+    assert new_character is not character
+    assert new_character.dict() == character.dict()
+    # run both matches with same agents, and they should be same
+    new_agent_0 = copy.deepcopy(agent_0)
+    new_agent_1 = copy.deepcopy(agent_1)
+    for _ in range(20):
+        if match.is_game_end():
+            break
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+        make_respond(new_agent_0, new_match, assertion=False)
+        make_respond(new_agent_1, new_match, assertion=False)
+        # ids of newly created objects are different
+        assert (
+            remove_ids(new_match.fast_clone()).json()
+            == remove_ids(match.fast_clone()).json()
+        )
+    assert new_match.state != MatchState.ERROR
+    assert len(new_match._history_diff) == len(match._history_diff)
+
+
 @pytest.mark.slowtest
 def test_random_same_after_load():
     agent_0 = RandomAgent(player_idx=0, random_seed=42)
@@ -317,6 +394,71 @@ def test_random_same_after_load():
     assert match.state != MatchState.ERROR
 
 
+def test_counter_random_state():
+    generator = CounterRandom(42)
+    numbers = [generator.random() for _ in range(100)]
+    assert all(0 <= x < 1 for x in numbers)
+    assert generator.get_state() == ["COUNTER", 42, 100]
+    # decided by seed and counter
+    generator = CounterRandom(42, 50)
+    assert [generator.random() for _ in range(50)] == numbers[50:]
+    array = list(range(20))
+    generator.shuffle(array)
+    assert sorted(array) == list(range(20)) and array != list(range(20))
+
+    agent_0 = RandomAgent(player_idx=0, random_seed=42)
+    agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
+    match = Match(random_state=get_counter_random_state(7))
+    deck = Deck.from_str(
+        """
+        default_version:4.0
+        character:Rhodeia of Loch
+        character:Kamisato Ayaka
+        Traveler's Handy Sword*5
+        Gambler's Earrings*5
+        Kanten Senmyou Blessing*5
+        Sweet Madame*5
+        Abyssal Summons*5
+        Fatui Conspiracy*5
+        """
+    )
+    match.set_deck([deck, deck])
+    match.config.max_same_card_number = 30
+    match.config.card_number = None
+    match.config.character_number = None
+    match.config.check_deck_restriction = False
+    assert match.start()[0]
+    match.step()
+    # random state is saved lazily
+    assert match._random_state_dirty
+    assert match.random_state == ["COUNTER", 7, 0]
+    match_json = match.json()
+    assert not match._random_state_dirty
+    assert match.random_state[2] > 0
+    assert json.loads(match_json)["random_state"] == match.random_state
+    # loaded match continues with same random numbers
+    loaded = Match(**json.loads(match_json))
+    loaded_agent_0 = agent_0.copy(deep=True)
+    loaded_agent_1 = agent_1.copy(deep=True)
+    match.config.history_level = loaded.config.history_level = 10
+    for _ in range(20):
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+        make_respond(loaded_agent_0, loaded, assertion=False)
+        make_respond(loaded_agent_1, loaded, assertion=False)
+        assert remove_ids(loaded.copy(deep=True)) == remove_ids(match.copy(deep=True))
+    assert match.state != MatchState.ERROR
+    # history diffs only contain the counter of random state
+    changes = [
+        x
+        for diff in match._history_diff[1:]
+        for x in diff
+        if (x[1] if isinstance(x[1], list) else x[1].split("."))[0] == "random_state"
+    ]
+    assert len(changes) > 0
+    assert all(x[0] == "change" and x[1] == ["random_state", 2] for x in changes)
+
+
 @pytest.mark.slowtest
 def test_save_load_same():
     agent_0 = RandomAgent(player_idx=0, random_seed=42)
@@ -402,6 +544,11 @@ def test_use_card():
                 len(match.player_tables[1].table_deck)
                 == deck_numbers[len(agent_1.commands)]
             )
+            # each request has its own dice colors
+            dice_colors = [
+                x.dice_colors for x in match.requests if hasattr(x, "dice_colors")
+            ]
+            assert len(set(map(id, dice_colors))) == len(dice_colors)
         else:
             raise AssertionError("no need respond")
         make_respond(current_agent, match)
@@ -854,6 +1001,7 @@ def test_save_history_2():
     match.config.check_deck_restriction = False
     match.config.history_level = 10  # record important history
     match.config.compress_history = False
+    match._debug_check_history_diff = True
     test_step = 10
     assert match.start()[0]
     match.step()
@@ -864,6 +1012,279 @@ def test_save_history_2():
     assert match.state != MatchState.ERROR
 
 
+def test_snapshot():
+    agent_0 = RandomAgent(player_idx=0, random_seed=42)
+    agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
+    match = Match(random_state=get_random_state(100))
+    deck = Deck.from_str(
+        """
+        default_version:4.0
+        character:Rhodeia of Loch
+        character:Kamisato Ayaka
+        Toss-Up*10
+        Nature and Wisdom*10
+        """
+    )
+    match.set_deck([deck, deck])
+    match.config.max_same_card_number = 30
+    match.config.card_number = None
+    match.config.character_number = None
+    match.config.check_deck_restriction = False
+    assert match.start()[0]
+    match.step()
+    snapshots = []
+    for _ in range(10):
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+        snapshot = match.snapshot()
+        assert snapshot.dict() == match.dict()
+        snapshots.append((snapshot, snapshot.dict()))
+    # old snapshots are not affected by later changes
+    for snapshot, snapshot_dict in snapshots:
+        assert snapshot.dict() == snapshot_dict
+    # unchanged objects are shared between snapshots
+    snapshot_1 = match.snapshot()
+    snapshot_2 = match.snapshot()
+    assert snapshot_1 is snapshot_2
+    match.player_tables[0].characters[0].hp -= 1
+    snapshot_3 = match.snapshot()
+    assert snapshot_3 is not snapshot_2
+    assert snapshot_3.player_tables[1] is snapshot_2.player_tables[1]
+    assert (
+        snapshot_3.player_tables[0].characters[1]
+        is snapshot_2.player_tables[0].characters[1]
+    )
+    assert (
+        snapshot_3.player_tables[0].characters[0].hp
+        == snapshot_2.player_tables[0].characters[0].hp - 1
+    )
+    # copy of snapshot is modifiable and not affect snapshot
+    new_match = snapshot_3.copy(deep=True)
+    new_match.player_tables[1].characters[0].hp -= 1
+    assert snapshot_3.dict() == match.dict()
+
+
+def test_checkpoint_rollback():
+    agent_0 = RandomAgent(player_idx=0, random_seed=42)
+    agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
+    match = Match(random_state=get_random_state(100))
+    deck = Deck.from_str(
+        """
+        default_version:4.0
+        character:Fischl
+        character:Rhodeia of Loch
+        character:Noelle
+        Paimon*5
+        Liben*5
+        Sweet Madame*5
+        Strategize*5
+        Toss-Up*5
+        Changing Shifts*5
+        """
+    )
+    match.set_deck([deck, deck])
+    match.config.max_same_card_number = 30
+    match.config.card_number = None
+    match.config.character_number = None
+    match.config.check_deck_restriction = False
+    match.config.history_level = 10
+    assert match.start()[0]
+    match.step()
+    for _ in range(10):
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+    checkpoint = match.checkpoint()
+    assert checkpoint.root is match.snapshot()
+    match_json = match.json()
+    history_number = len(match._history_diff)
+    character = match.player_tables[0].characters[0]
+
+    def run_branch():
+        new_agent_0 = copy.deepcopy(agent_0)
+        new_agent_1 = copy.deepcopy(agent_1)
+        for _ in range(10):
+            make_respond(new_agent_0, match, assertion=False)
+            make_respond(new_agent_1, match, assertion=False)
+        assert match.state != MatchState.ERROR
+        return remove_ids(match.fast_clone()).json()
+
+    branch_json = run_branch()
+    branch_checkpoint = match.checkpoint()
+    branch_full_json = match.json()
+    assert len(match._history_diff) > history_number
+    assert branch_json != remove_ids(Match(**json.loads(match_json))).json()
+    match.rollback(checkpoint)
+    assert match.json() == match_json
+    assert len(match._history_diff) == history_number
+    assert match.player_tables[0].characters[0] is character
+    # random state is restored, so the branch is played same again
+    assert run_branch() == branch_json
+    match.rollback(checkpoint)
+    assert match.json() == match_json
+    # later checkpoints are still valid after rolling back
+    match.rollback(branch_checkpoint)
+    assert match.json() == branch_full_json
+    match.rollback(checkpoint)
+    assert match.json() == match_json
+    # history after rollback is consistent
+    make_respond(agent_0, match, assertion=False)
+    make_respond(agent_1, match, assertion=False)
+    assert match._history[-1].dict() == match.dict()
+    with pytest.raises(ValueError):
+        match.fast_clone().rollback(checkpoint)
+
+
+def test_object_indices():
+    agent_0 = RandomAgent(player_idx=0, random_seed=42)
+    agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
+    match = Match(random_state=get_random_state(100))
+    deck = Deck.from_str(
+        """
+        default_version:4.0
+        character:Fischl
+        character:Rhodeia of Loch
+        character:Noelle
+        Paimon*5
+        Liben*5
+        Sweet Madame*5
+        Strategize*5
+        Toss-Up*5
+        Changing Shifts*5
+        """
+    )
+    match.set_deck([deck, deck])
+    match.config.max_same_card_number = 30
+    match.config.card_number = None
+    match.config.character_number = None
+    match.config.check_deck_restriction = False
+    match._debug_check_index = True
+    assert match.start()[0]
+    match.step()
+    for _ in range(100):
+        if match.is_game_end():
+            break
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+        assert match.state != MatchState.ERROR
+        for name in ["event_handler_ROUND_END", "value_modifier_COST"]:
+            subscribers = match._get_subscribers(name)
+            assert all(hasattr(x, name) for x in subscribers)
+    # object index gives same results as linear scan, and follows changes
+    table = match.player_tables[0]
+    for obj in table.hands + table.table_deck + table.summons + table.supports:
+        assert match.get_object(obj.position) is obj
+    if len(table.hands) > 1:
+        card = table.hands.pop(0)
+        assert match.get_object(card.position) is None
+        assert match.get_object(table.hands[0].position) is table.hands[0]
+        table.hands.append(card)
+        assert match.get_object(card.position) is card
+    # misses are cached until objects of the area are changed
+    builds = []
+    build = match._build_object_index
+    object.__setattr__(
+        match, "_build_object_index", lambda: builds.append(1) or build()
+    )
+    position = ObjectPosition(player_idx=0, area=ObjectPositionType.HAND, id=-100)
+    assert match.get_object(position) is None
+    assert match.get_object(position) is None
+    assert len(builds) == 1
+    match._drop_subscriber_slot(0, ObjectPositionType.HAND)
+    assert match.get_object(position) is None
+    assert len(builds) == 2
+    card = match.event_handlers[0].copy(deep=True)
+    card.id = -100
+    table.hands.append(card)
+    assert match.get_object(position) is card
+    assert len(builds) == 3
+    table.hands.pop()
+    object.__delattr__(match, "_build_object_index")
+    # index is not shared with copied match
+    new_match = match.copy(deep=True)
+    new_subscribers = new_match._get_subscribers("event_handler_ROUND_END")
+    subscribers = match._get_subscribers("event_handler_ROUND_END")
+    assert len(new_subscribers) == len(subscribers)
+    assert all(x is not y for x, y in zip(new_subscribers, subscribers))
+    # actions only drop subscriber slots of objects they change
+    table = match.player_tables[1]
+    table.team_status = [x for x in table.team_status if x.name != "Catalyzing Field"]
+    match._check_subscriber_index()
+    match._get_subscribers("event_handler_ROUND_END")
+    slot = (1, ObjectPositionType.TEAM_STATUS, -1)
+    slots = set(match._subscriber_index)
+    assert slot in slots
+    match._act(
+        CreateObjectAction(
+            object_position=ObjectPosition(
+                player_idx=1, area=ObjectPositionType.TEAM_STATUS, id=-1
+            ),
+            object_name="Catalyzing Field",
+            object_arguments={},
+        )
+    )
+    assert set(match._subscriber_index) == slots - {slot}
+    match._get_subscribers("event_handler_ROUND_END")
+    assert set(match._subscriber_index) == slots
+    # modifications outside of actions are found when checking index
+    table.team_status.pop()
+    match._check_subscriber_index()
+    assert set(match._subscriber_index) == slots - {slot}
+    match._get_subscribers("event_handler_ROUND_END")
+
+
+def test_action_dispatch():
+    class DrawOneCardAction(DrawCardAction):
+        number: int = 1
+        draw_if_filtered_not_enough: bool = True
+
+    class EmptyAction(ActionBase):
+        pass
+
+    agent_0 = RandomAgent(player_idx=0, random_seed=42)
+    agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
+    match = Match(random_state=get_random_state(100))
+    deck = Deck.from_str(
+        """
+        default_version:4.0
+        character:Rhodeia of Loch
+        character:Kamisato Ayaka
+        Toss-Up*10
+        Nature and Wisdom*10
+        """
+    )
+    match.set_deck([deck, deck])
+    match.config.max_same_card_number = 30
+    match.config.card_number = None
+    match.config.character_number = None
+    match.config.check_deck_restriction = False
+    used_times = {}
+
+    def hook(m, action, used_time):
+        assert m is match
+        used_times.setdefault(action.type.name, []).append(used_time)
+
+    match._action_hooks.append(hook)
+    assert match.start()[0]
+    match.step()
+    for _ in range(10):
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+    assert match.state != MatchState.ERROR
+    assert match._action_counts["DRAW_CARD"] > 0
+    assert match._action_counts["CREATE_DICE"] > 0
+    assert {k: len(v) for k, v in used_times.items()} == match._action_counts
+    # hooks are not copied
+    assert len(match.copy(deep=True)._action_hooks) == 0
+    # subclass uses handler of parent class
+    hand_size = len(match.player_tables[0].hands)
+    match._act(DrawOneCardAction(player_idx=0))
+    assert len(match.player_tables[0].hands) == hand_size + 1
+    # unknown action
+    with pytest.raises(AssertionError):
+        match._act(EmptyAction())
+    assert match.state == MatchState.ERROR
+
+
 def test_generate_unused_cards():
     agent_0 = RandomAgent(player_idx=0, random_seed=42)
     agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
@@ -892,6 +1313,7 @@ def test_generate_unused_cards():
     match.config.character_number = None
     match.config.check_deck_restriction = False
     match.config.history_level = 10  # record important history
+    match._debug_check_history_diff = True
     test_step = 10
     assert match.start()[0]
     match.step()
@@ -1028,6 +1450,56 @@ def test_prediction():
     assert match.state != MatchState.ERROR
 
 
+def test_prediction_cache():
+    agent_0 = RandomAgent(player_idx=0, random_seed=42)
+    agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
+    match = Match(random_state=get_random_state())
+    deck = Deck.from_str(
+        """
+        character:Fischl
+        character:Mona
+        character:Nahida
+        Rana*10
+        Wine-Stained Tricorne*10
+        The Seed of Stored Knowledge*10
+        """
+    )
+    match.set_deck([deck, deck])
+    match.config.max_same_card_number = 30
+    match.config.make_skill_prediction = True
+    match.config.history_level = 10
+    # diffs of predictions are cross-checked with dictdiffer
+    match._debug_check_history_diff = True
+    set_16_omni(match)
+    assert match.start()[0]
+    match.step()
+    predicted = 0
+    for _ in range(15):
+        if len(match.skill_predictions) > 0:
+            predicted += 1
+            predictions = match.skill_predictions
+            cache = match._skill_prediction_cache
+            # state not changed, results are reused
+            match._predict_skill(match.current_player)
+            assert match._skill_prediction_cache is cache
+            assert match.skill_predictions == predictions
+            # same as predicting without cache
+            match._skill_prediction_cache = None
+            match._predict_skill(match.current_player)
+            assert match._skill_prediction_cache is not cache
+            # ids of newly created objects differ
+            assert re.sub(r"\d{10,}", "ID", json.dumps(predictions)) == re.sub(
+                r"\d{10,}", "ID", json.dumps(match.skill_predictions)
+            )
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+    assert predicted > 0
+    assert match.state != MatchState.ERROR
+    # cache is not copied
+    assert match.copy(deep=True)._skill_prediction_cache is None
+    assert match.fast_clone()._skill_prediction_cache is None
+
+
 def test_player_table_character_order():
     deck_str = """
     default_version:4.0
@@ -1238,6 +1710,47 @@ def test_new_match_from_history_compressed():
     assert len(initial_match._history_diff) == len(match._history_diff)
 
 
+def test_new_match_from_history_keyframes():
+    agent_0 = RandomAgent(player_idx=0, random_seed=42)
+    agent_1 = RandomAgent(player_idx=1, random_seed=19260817)
+    match = Match(random_state=get_random_state(100))
+    deck = Deck.from_str(
+        """
+        default_version:4.0
+        character:Rhodeia of Loch
+        character:Kamisato Ayaka
+        Toss-Up*10
+        Nature and Wisdom*10
+        """
+    )
+    match.set_deck([deck, deck])
+    match.config.max_same_card_number = 30
+    match.config.card_number = None
+    match.config.character_number = None
+    match.config.check_deck_restriction = False
+    match.config.history_level = 10  # record important history
+    match.config.history_keyframe_interval = 3
+    assert match.start()[0]
+    match.step()
+    for _ in range(10):
+        make_respond(agent_0, match, assertion=False)
+        make_respond(agent_1, match, assertion=False)
+    history_length = len(match._history_diff)
+    assert history_length > 10
+    assert len(match._history) == 2
+    assert sorted(match._history_keyframes.keys()) == list(range(3, history_length, 3))
+    match_dict = match._history[0].dict()
+    for idx in range(history_length):
+        if idx > 0:
+            diff = copy.deepcopy(match._history_diff[idx])
+            dictdiffer.patch(diff, match_dict, in_place=True)
+        new_match = match.new_match_from_history(idx)
+        assert new_match.dict() == match_dict
+        assert len(new_match._history_diff) == idx + 1
+        assert max(new_match._history_keyframes.keys(), default=0) <= idx
+    assert match._history[-1].dict() == match_dict
+
+
 def test_version_validation():
     with pytest.raises(ValueError):
         _ = get_instance(SummonBase, {"name": "Oz", "version": 3.7})
@@ -1,9 +1,11 @@
 import pytest
 
 from lpsim.server.character.character_base import SkillBase
-from lpsim.server.consts import SkillType
+from lpsim.server.consts import ObjectPositionType, SkillType
 from lpsim.server.deck import Deck
 from lpsim.server.match import Match, MatchState
+from lpsim.server.query import _compile_query, _compile_satisfy, query
+from lpsim.server.struct import ObjectPosition
 from lpsim.agents.interaction_agent import InteractionAgent
 from tests.utils_for_test import get_random_state, make_respond, set_16_omni
 
@@ -338,5 +340,29 @@ def test_query_satisfy():
     )
 
 
+def test_query_plan_cache():
+    position = ObjectPosition(
+        player_idx=0, character_idx=1, area=ObjectPositionType.CHARACTER, id=1
+    )
+    # plans are compiled once for each command
+    plan = _compile_satisfy("source pidx=0 and source cidx=1")
+    assert _compile_satisfy("source pidx=0 and source cidx=1") is plan
+    assert position.satisfy("source pidx=0 and source cidx=1")
+    assert _compile_query("both active") is _compile_query("both active")
+    # errors are raised when reaching the wrong part of command
+    assert not position.satisfy("source pidx=1 sss=1")
+    assert not position.satisfy("source pidx=1 and source pidx=x")
+    for _ in range(2):
+        with pytest.raises(ValueError, match="unknown command sss=1"):
+            position.satisfy("source pidx=0 sss=1")
+        with pytest.raises(ValueError, match="invalid literal"):
+            position.satisfy("source pidx=0 and source pidx=x")
+        with pytest.raises(AssertionError, match="command is empty"):
+            query(position, None, "and both")
+        with pytest.raises(ValueError, match="first token must be"):
+            query(position, None, "none")
+
+
 if __name__ == "__main__":
     test_query_satisfy()
+    test_query_plan_cache()
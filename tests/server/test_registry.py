@@ -1,3 +1,7 @@
+import json
+import os
+import subprocess
+import sys
 from typing import Dict, Literal
 
 import pytest
@@ -15,10 +19,16 @@ from lpsim.utils.desc_registry import (
     update_desc,
 )
 from lpsim.utils.class_registry import (
+    _handler_registered_classes,
     get_class_list_by_base_class,
     get_instance,
+    has_event_handler,
+    has_value_modifier,
     register_class,
+    register_handlers,
 )
+from lpsim.utils import registry_manifest
+from lpsim.utils.registry_manifest import build_manifest, load_manifest, save_manifest
 from lpsim.server.struct import Cost
 from lpsim.server.object_base import EventCardBase
 
@@ -343,6 +353,163 @@ def test_wrong_id():
         update_desc(right_desc)
 
 
+def test_handler_dispatch_table():
+    from lpsim.server.card.event.others import Strategize_3_3
+    from lpsim.server.event_handler import (
+        OmnipotentGuideEventHandler_3_3,
+        SystemEventHandler_3_4,
+    )
+
+    card = get_instance(EventCardBase, {"name": "Strategize", "version": "3.7"})
+    assert isinstance(card, Strategize_3_3)
+    assert Strategize_3_3 in _handler_registered_classes
+    assert has_event_handler(card, "USE_CARD")
+    assert not has_event_handler(card, "ROUND_END")
+    assert not has_value_modifier(card, "DAMAGE_INCREASE")
+    assert has_event_handler(SystemEventHandler_3_4(), "DRAW_CARD")
+    assert not has_value_modifier(SystemEventHandler_3_4(), "INITIAL_DICE_COLOR")
+    assert has_value_modifier(OmnipotentGuideEventHandler_3_3(), "INITIAL_DICE_COLOR")
+
+    # unregistered classes are registered when first instantiated
+    class Sleep_1_1(EventCardBase):
+        name: Literal["Sleep"] = "Sleep"
+        version: Literal["1.1"] = "1.1"
+        cost: Cost = Cost()
+
+        def value_modifier_COST(self, value, match, mode):
+            return value  # pragma: no cover
+
+    assert Sleep_1_1 not in _handler_registered_classes
+    sleep = Sleep_1_1()
+    assert Sleep_1_1 in _handler_registered_classes
+    assert has_value_modifier(sleep, "COST")
+    assert has_event_handler(sleep, "USE_CARD")
+    # handler names are saved in class
+    assert Sleep_1_1._event_handler_names == Strategize_3_3._event_handler_names
+    assert Sleep_1_1._value_modifier_names == frozenset(["COST"])
+
+    # invalid handler names
+    class WrongSleep_1_1(Sleep_1_1):
+        name: Literal["WrongSleep"] = "WrongSleep"
+
+        def value_modifier_SLEEP(self, value, match, mode):
+            return value  # pragma: no cover
+
+    class WrongSleep_1_2(Sleep_1_1):
+        name: Literal["WrongSleep"] = "WrongSleep"
+        version: Literal["1.2"] = "1.2"
+
+        def event_handler_SLEEP(self, event, match):
+            return []  # pragma: no cover
+
+    with pytest.raises(ValueError, match="Invalid value modifier name: SLEEP"):
+        register_handlers(WrongSleep_1_1)
+    with pytest.raises(ValueError, match="Invalid event handler name: SLEEP"):
+        WrongSleep_1_2()
+
+
+LAZY_IMPORT_SCRIPT = """
+import json
+import sys
+from lpsim.server.character.character_base import CharacterBase
+from lpsim.server.deck import Deck
+from lpsim.server.match import MatchConfig
+from lpsim.runner import MatchTask, run_match
+from lpsim.utils.class_registry import get_class_list_by_base_class
+from lpsim.utils.desc_registry import get_desc_patch
+from lpsim.utils.registry_manifest import lazy_import_enabled
+
+module = "lpsim.server.character.cryo.kamisato_ayaka_3_3"
+res = {"lazy": lazy_import_enabled(), "imported": [module in sys.modules]}
+res["characters"] = get_class_list_by_base_class(CharacterBase)
+res["desc_number"] = len(get_desc_patch())
+deck = Deck.from_str(
+    "character:Kamisato Ayaka*3\\nKanten Senmyou Blessing*15\\nSweet Madame*15"
+)
+result = run_match(
+    MatchTask(
+        decks=[deck, deck],
+        seed=42,
+        config=MatchConfig(
+            check_deck_restriction=False,
+            max_same_card_number=30,
+            max_round_number=2,
+        ),
+    )
+)
+res["error"] = result.error
+res["imported"].append(module in sys.modules)
+print(json.dumps(res))
+"""
+
+
+def run_lazy_import_script(manifest_path: str) -> Dict:
+    env = dict(os.environ)
+    env["LPSIM_LAZY_IMPORT"] = "1"
+    env["LPSIM_REGISTRY_MANIFEST"] = manifest_path
+    output = subprocess.run(
+        [sys.executable, "-c", LAZY_IMPORT_SCRIPT],
+        env=env,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().split("\n")[-1])
+
+
+def test_registry_manifest(tmp_path, monkeypatch):
+    manifest = build_manifest()
+    key = "CHARACTER+Kamisato Ayaka+3.3"
+    module = manifest["classes"][key]["module"]
+    assert module == "lpsim.server.character.cryo.kamisato_ayaka_3_3"
+    mro = manifest["classes"][key]["mro"]
+    assert "lpsim.server.character.character_base.CharacterBase" in mro
+    skill_desc = "SKILL_Kamisato Ayaka_NORMAL_ATTACK/Kamisato Art: Kabuki"
+    assert "cost" in manifest["descs"][skill_desc]
+    # classes outside lpsim are not recorded
+    for value in manifest["classes"].values():
+        assert value["module"].startswith("lpsim.")
+    path = str(tmp_path / "manifest.json")
+    assert load_manifest(path) is None
+    save_manifest(path)
+    assert load_manifest(path) == json.loads(json.dumps(build_manifest()))
+    # source files are not hashed when their stats are not changed
+    manifest = json.loads(json.dumps(build_manifest()))
+    monkeypatch.setattr(registry_manifest, "get_source_hash", lambda: "0")
+    assert load_manifest(path) == manifest
+    monkeypatch.undo()
+    # files are touched but not changed, checked by source hash
+    manifest["source_stats"] = {}
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+    assert load_manifest(path) == manifest
+    # outdated manifest is ignored
+    manifest["source_hash"] = "0"
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+    assert load_manifest(path) is None
+
+
+def test_lazy_import(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    save_manifest(path)
+    res = run_lazy_import_script(path)
+    assert res["lazy"]
+    # module is imported only when used
+    assert res["imported"] == [False, True]
+    assert res["error"] is None
+    assert res["characters"] == get_class_list_by_base_class(CharacterBase)
+    with open(path) as f:
+        assert res["desc_number"] == len(json.load(f)["descs"])
+    # when manifest is outdated, all modules are imported
+    with open(path, "w") as f:
+        json.dump({"version": 1, "source_hash": "0"}, f)
+    res = run_lazy_import_script(path)
+    assert not res["lazy"]
+    assert res["imported"] == [True, True]
+    assert res["error"] is None
+
+
 if __name__ == "__main__":
     test_class_registry()
     test_desc_registry()
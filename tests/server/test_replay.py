@@ -0,0 +1,79 @@
+import json
+import os
+
+from lpsim.replay import (
+    compare_replays,
+    find_divergence,
+    find_log_paths,
+    load_results,
+    main,
+    replay_log,
+    replay_log_file,
+    replay_logs,
+)
+
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), "bugfix", "jsons")
+LOG_VERSION = "0.0.4"
+
+
+def get_log_paths():
+    paths = find_log_paths([LOG_DIR])
+    return [
+        x
+        for x in paths
+        if os.path.basename(x)
+        in ["test_dunyarzad_no_draw.json", "test_kazuha_attack_by_baizhu_q.json"]
+    ]
+
+
+def test_replay_fingerprints():
+    path = get_log_paths()[0]
+    result = replay_log_file(path, LOG_VERSION)
+    assert result.error is None
+    assert result.command_number > 0
+    assert len(result.fingerprints) == result.command_number + 1
+    assert len(set(result.fingerprints)) == len(result.fingerprints)
+    # replay is deterministic
+    again = replay_log_file(path, LOG_VERSION)
+    assert again.fingerprints == result.fingerprints
+    assert find_divergence(result, again) is None
+
+    # change one command, and states diverge from the step it is used
+    with open(path, "r", encoding="utf8") as f:
+        data = json.load(f)
+    data["command_history"][0][5] = "choose 2"
+    changed = replay_log(json.dumps(data), path, LOG_VERSION)
+    step = find_divergence(result, changed)
+    assert step is not None and step > 0
+    assert changed.fingerprints[:step] == result.fingerprints[:step]
+    assert compare_replays([result], [changed]) == {path: step}
+
+    # invalid command stops replay with error
+    data["command_history"][0][2] = "not_a_command"
+    error = replay_log(json.dumps(data), path, LOG_VERSION)
+    assert error.error is not None
+    step = find_divergence(result, error)
+    assert step == len(error.fingerprints) < len(result.fingerprints)
+    assert error.fingerprints == result.fingerprints[:step]
+
+
+def test_replay_logs_in_pool(tmp_path):
+    paths = get_log_paths()
+    assert len(paths) == 2
+    single = {x.path: x for x in replay_logs(paths, LOG_VERSION, processes=0)}
+    pool = {x.path: x for x in replay_logs(paths, LOG_VERSION, processes=2)}
+    assert single.keys() == pool.keys() == set(paths)
+    assert compare_replays(single.values(), pool.values()) == {}
+
+    # command line saves results and compares with base
+    base = str(tmp_path / "base.jsonl")
+    args = [*paths, "--match-version", LOG_VERSION, "--processes", "0"]
+    assert main([*args, "-o", base]) == 0
+    assert {x.path for x in load_results(base)} == set(paths)
+    assert main([*args, "--base", base]) == 0
+    results = load_results(base)
+    results[0].fingerprints[-1] = "0" * 16
+    with open(base, "w", encoding="utf8") as f:
+        f.write("".join(x.json() + "\n" for x in results))
+    assert main([*args, "--base", base]) == 1
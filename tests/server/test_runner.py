@@ -0,0 +1,64 @@
+import logging
+
+from lpsim.agents.nothing_agent import NothingAgent
+from lpsim.runner import MatchResult, MatchTask, make_tasks, run_match, run_matches
+from lpsim.server.deck import Deck
+from lpsim.server.match import MatchConfig
+
+
+DECK = Deck.from_str(
+    """
+    default_version:4.0
+    character:Fischl
+    character:Rhodeia of Loch
+    character:Noelle
+    Paimon*10
+    Sweet Madame*10
+    Strategize*10
+    """
+)
+
+
+class NoneAgent(NothingAgent):
+    def generate_response(self, match):
+        return None
+
+
+CONFIG = MatchConfig(
+    max_same_card_number=30,
+    check_deck_restriction=False,
+    max_round_number=5,
+)
+
+
+def test_run_match():
+    result = run_match(MatchTask(decks=[DECK, DECK], seed=42, config=CONFIG))
+    assert result.error is None
+    assert result.seed == 42
+    assert len(result.hps) == 2 and len(result.hps[0]) == 3
+    assert 1 <= result.round_number <= 5
+    # same seed results in same match
+    result_2 = run_match(MatchTask(decks=[DECK, DECK], seed=42, config=CONFIG))
+    assert result_2 == result
+    # errors are recorded in result
+    agents = [NoneAgent(player_idx=0), NoneAgent(player_idx=1)]
+    result = run_match(
+        MatchTask(decks=[DECK, DECK], seed=42, config=CONFIG, agents=agents)
+    )
+    assert result.error is not None
+    assert "no response" in result.error
+    result = run_match(MatchTask(decks=[DECK], seed=42, config=CONFIG))
+    assert result.error is not None
+
+
+def test_run_matches():
+    tasks = make_tasks([DECK, DECK], range(4), config=CONFIG)
+    assert [x.task_idx for x in tasks] == [0, 1, 2, 3]
+    assert len(make_tasks([[DECK, DECK], [DECK, DECK]], range(3))) == 6
+    results = list(run_matches(tasks))
+    assert [x.task_idx for x in results] == [0, 1, 2, 3]
+    assert all(x.error is None for x in results)
+    pool_results = list(run_matches(tasks, processes=2, log_level=logging.ERROR))
+    pool_results.sort(key=lambda x: x.task_idx)
+    assert pool_results == results
+    assert all(isinstance(x, MatchResult) for x in pool_results)